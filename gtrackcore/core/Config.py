@@ -57,7 +57,9 @@ class Config(object):
                  ('RESOURCE_DIR', os.sep.join([data_dir, 'tmp/resources'])), \
                  ('MAX_CONCAT_LEN_FOR_OVERLAPPING_ELS', '20'), \
                  ('OUTPUT_PRECISION', '4'), \
-                 ('USE_SLOW_DEFENSIVE_ASSERTS', 'False')])
+                 ('USE_SLOW_DEFENSIVE_ASSERTS', 'False'), \
+                 ('ORIG_FILE_HASH_METHOD', 'full'), \
+                 ('BUILD_FASTA_INDEX', 'False')])
 
             configDef['Compatibility'] = OrderedDict( \
                 [('URL_PREFIX', '')])
@@ -66,6 +68,27 @@ class Config(object):
                 [('COMP_BIN_SIZE', '100000'), \
                  ('MEMMAP_BIN_SIZE', str(1024 * 1024))])
 
+            configDef['Pytables'] = OrderedDict( \
+                [('MAX_OPEN_DATABASE_FILES', '256'), \
+                 ('COLUMN_CHUNK_CACHE_SIZE', str(256 * 1024 * 1024)), \
+                 ('USE_MEMMAPPED_COLUMNS', 'False'), \
+                 ('COMPRESSION_LIB', 'none'), \
+                 ('COMPRESSION_LEVEL', '0'), \
+                 ('COMPRESSION_SHUFFLE', 'True'), \
+                 ('CHUNK_LENGTH', '0'), \
+                 ('COLUMNAR_STORAGE_ONLY', 'False'), \
+                 ('STORE_VAL_PREFIX_SUMS', 'False'), \
+                 ('STORE_SUMMARY_PYRAMIDS', 'False'), \
+                 ('SUMMARY_PYRAMID_BIN_SIZE', '1000'), \
+                 ('SUMMARY_PYRAMID_ZOOM_FACTOR', '10'), \
+                 ('SINGLE_PASS_PREPROCESSING', 'False'), \
+                 ('COLUMN_BATCH_PARSING', 'False'), \
+                 ('NO_OVERLAPS_FROM_COLUMN_ARRAYS', 'False'), \
+                 ('SORT_BUFFER_SIZE', str(64 * 1024 * 1024)), \
+                 ('PREPROCESSING_WORKERS', '1'), \
+                 ('PREPROCESSING_RETRIES', '0'), \
+                 ('CHROMOSOME_SHARD_WORKERS', '1')])
+
             cls._initConfig(configDef)
 
             if config_filename:
@@ -1,20 +1,25 @@
 from collections import OrderedDict
 from copy import copy
 
+import numpy
+
+from gtrackcore.input.core.ColumnBatches import nextColumnBatchOfElements
 from gtrackcore.input.core.GenomeElement import GenomeElement
 from gtrackcore.input.core.GenomeElementSource import BoundingRegionTuple, GenomeElementSource
 from gtrackcore.metadata.GenomeInfo import GenomeInfo
 from gtrackcore.metadata.TrackInfo import TrackInfo
 from gtrackcore.preprocess.PreProcMetaDataCollector import PreProcMetaDataCollector
 from gtrackcore.track.core.Track import Track
-from gtrackcore.track.format.TrackFormat import TrackFormatReq
+from gtrackcore.track.format.TrackFormat import TrackFormat, TrackFormatReq
 from gtrackcore.track.pytables.TrackSource import TrackSource
+from gtrackcore.track.pytables.database.IndexRetrieval import start_and_end_indices_for_regions
 
 class TrackGenomeElementSource(GenomeElementSource):
     FILE_FORMAT_NAME = 'Track'
     _VERSION = 1.0
     _hasOrigFile = False
     _addsStartElementToDenseIntervals = False
+    _COLUMN_BATCH_NUM_ROWS = 100000
 
     def __new__(cls, *args, **kwArgs):
         return object.__new__(cls)
@@ -125,8 +130,48 @@ class TrackGenomeElementSource(GenomeElementSource):
     def __iter__(self):
         geIter = copy(self)
         geIter._generator = geIter._wrappedTrackElsGenerator()
+        geIter._columnBatchGenerator = geIter._trackColumnBatchGenerator()
         return geIter
 
+    def hasColumnBatches(self):
+        # the rows of sparse tracks are read in blocks directly from the column arrays
+        return self._globalCoords and \
+            not TrackFormat.createInstanceFromPrefixList(self.getPrefixList()).reprIsDense()
+
+    def nextColumnBatch(self):
+        if not self.hasColumnBatches():
+            return nextColumnBatchOfElements(self)
+        return self._columnBatchGenerator.next()
+
+    def _trackColumnBatchGenerator(self):
+        trackData = self._getTrackData()
+        prefixList = self.getPrefixList()
+        for region in self._boundingRegions:
+            if region.genome is None:
+                region.genome = self._genome
+        trackFormat = TrackFormat.createInstanceFromPrefixList(prefixList, self.getValDataType(), self.getValDim(),
+                                                               self.getEdgeWeightDataType(), self.getEdgeWeightDim())
+        indices = start_and_end_indices_for_regions(self._boundingRegions, self._trackName, self._allowOverlaps,
+                                                    trackFormat)
+
+        for region, (startIndex, endIndex) in zip(self._boundingRegions, indices):
+            for blockStart in xrange(startIndex, endIndex, self._COLUMN_BATCH_NUM_ROWS):
+                blockEnd = min(blockStart + self._COLUMN_BATCH_NUM_ROWS, endIndex)
+                columns = dict((prefix, trackData[prefix].read_slice(blockStart, blockEnd)) for prefix in prefixList)
+                columns['chr'] = numpy.repeat(numpy.array([region.chr]), blockEnd - blockStart)
+                if 'edges' in columns:
+                    self._convertEdgesToLists(columns)
+                yield columns
+
+    @staticmethod
+    def _convertEdgesToLists(columns):
+        # as for the elements, the padding of the edges and weights is removed (see ColumnBatches)
+        for prefix in ['weights', 'edges']:
+            if prefix in columns:
+                lists = numpy.empty(len(columns['edges']), dtype=object)
+                lists[:] = [values[edges != ''] for values, edges in zip(columns[prefix], columns['edges'])]
+                columns[prefix] = lists
+
     def getBoundingRegionTuples(self):
         if self._boundingRegionTuples is None:
             track = self._getTrack()
@@ -280,6 +325,9 @@ class TrackViewListGenomeElementSource(TrackGenomeElementSource):
     def _getTrackView(self, track, region):
         return self._trackViewDict[region]
 
+    def hasColumnBatches(self):
+        return False
+
     def getBoundingRegionTuples(self):
         if self._boundingRegionTuples is None:
             self._boundingRegionTuples = [BoundingRegionTuple(tv.genomeAnchor, tv.getNumElements()) for tv in self._trackViewDict.values()]
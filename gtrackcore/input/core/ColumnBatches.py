@@ -0,0 +1,94 @@
+'''
+The column batch protocol of GenomeElementSources and their wrappers. Instead of calling next() on
+the iterator returned by __iter__(), nextColumnBatch() may be called, which returns a block of
+elements as a dict of column arrays: a 'chr' column, a column for each prefix that is set for the
+elements and a column for each extra key. A 'genome' column may be included. If not, all rows
+belong to the genome of the source.
+
+Sources and wrappers with hasColumnBatches() create the batches with vectorized code. For other
+components, nextColumnBatchOfElements() is used as a compatibility adapter, which collects the
+elements of next() into column batches.
+'''
+
+import numpy
+
+from gtrackcore.util.CommonConstants import RESERVED_PREFIXES
+
+ELEMENT_BATCH_SIZE = 10000
+
+
+def nextColumnBatchOfElements(geIter, batchSize=ELEMENT_BATCH_SIZE):
+    '''
+    Returns up to batchSize elements from the next() method of geIter as a column batch. The values
+    are taken from each element as it is returned, as some sources reuse their element objects.
+    '''
+    columnNames = None
+    values = None
+    numRows = 0
+
+    try:
+        while numRows < batchSize:
+            ge = geIter.next()
+            if columnNames is None:
+                columnNames = getColumnNamesOfElement(ge)
+                values = dict((column, []) for column in columnNames)
+
+            geDict = ge.__dict__
+            for column in columnNames:
+                values[column].append(geDict[column] if column in geDict else geDict['extra'][column])
+            numRows += 1
+    except StopIteration:
+        if numRows == 0:
+            raise
+
+    return dict((column, _convertValuesToArray(values[column])) for column in columnNames)
+
+
+def getColumnNamesOfElement(ge):
+    # the columns of the prefix list, as found from the first element by getPrefixList()
+    return ['genome', 'chr'] + [prefix for prefix in RESERVED_PREFIXES if ge.__dict__.get(prefix) is not None] + \
+        ge.orderedExtraKeys
+
+
+def _convertValuesToArray(values):
+    # list-valued columns (edges, weights and vector values) are kept as object arrays, as in ColumnSpill
+    if any(isinstance(value, (list, tuple, numpy.ndarray)) for value in values):
+        array = numpy.empty(len(values), dtype=object)
+        array[:] = [numpy.asarray(value) for value in values]
+        return array
+    return numpy.array(values)
+
+
+def getNextColumnBatch(geIter):
+    if hasattr(geIter, 'nextColumnBatch'):
+        return geIter.nextColumnBatch()
+    return nextColumnBatchOfElements(geIter)
+
+
+def iterColumnBatches(geSource):
+    geIter = geSource.__iter__()
+    while True:
+        yield getNextColumnBatch(geIter)
+
+
+def getNumRows(columns):
+    return len(columns['chr'])
+
+
+def selectRows(columns, selection):
+    return dict((column, values[selection]) for column, values in columns.iteritems())
+
+
+def concatenateColumns(columnsList):
+    return dict((column, numpy.concatenate([columns[column] for columns in columnsList]))
+                for column in columnsList[0])
+
+
+def getGenomeMask(columns, genome, getSourceGenome):
+    '''
+    Returns a boolean array of whether the rows belong to the genome. getSourceGenome is called for
+    the genome of the source if the batch has no 'genome' column.
+    '''
+    if 'genome' in columns:
+        return numpy.array([rowGenome == genome for rowGenome in columns['genome'].tolist()], dtype=bool)
+    return numpy.repeat(getSourceGenome() == genome, getNumRows(columns))
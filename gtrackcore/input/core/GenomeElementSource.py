@@ -5,7 +5,10 @@ from copy import copy
 from collections import OrderedDict
 from cStringIO import StringIO
 
+import numpy
+
 from gtrackcore.core.LogSetup import logException
+from gtrackcore.input.core.ColumnBatches import nextColumnBatchOfElements, iterColumnBatches
 from gtrackcore.input.core.GenomeElement import GenomeElement
 from gtrackcore.metadata.GenomeInfo import GenomeInfo
 from gtrackcore.util.CommonFunctions import getFileSuffix
@@ -27,6 +30,9 @@ class BoundingRegionTuple:
     def __cmp__(self, other):
         return cmp(self.region, other.region)
 
+class LineByLineParsingNeeded(Exception):
+    pass
+
 class GenomeElementSource(object):
     _VERSION = '0.0'
     FILE_SUFFIXES = []
@@ -43,6 +49,8 @@ class GenomeElementSource(object):
     _hasUndirectedEdges = False
     _inputIsOneIndexed = False
     _inputIsEndInclusive = False
+    _hasColumnBatches = False
+    _COLUMN_BATCH_READ_SIZE = 1024 * 1024
 
     def __new__(cls, fn, genome=None, trackName=None, suffix=None, forPreProcessor=False, *args, **kwArgs):
         geSourceCls = getGenomeElementSourceClass(fn, suffix=suffix, forPreProcessor=forPreProcessor)
@@ -121,48 +129,134 @@ class GenomeElementSource(object):
 
     def next(self):
         while True:
-            line = self._file.readline()
-            lineStripped = line.rstrip('\r\n')
+            ge = self._parseLine(self._file.readline())
+            if ge is not None:
+                self._genomeElement = ge
+                return self._genomeElement
+
+    def _parseLine(self, line):
+        lineStripped = line.rstrip('\r\n')
+
+        try:
+            if line == '':#End of file
+                if not self._handledEof:
+                    self._handleEndOfFile()
+                    self._checkBoundingRegionOverlap()
+                    self._handledEof = True
+                if not self._anyPendingElements():
+                    raise StopIteration
+            elif lineStripped == '': #Blank line
+                self._handleBlankLine()
+                return None
+
+            return self._next(lineStripped)
+
+        except Warning, e:
+            if self._printWarnings:
+                if not hasattr(self, '_numWarningLines'):
+                    self._numWarningLines = 0
+                self._numWarningLines +=1
+                if self._numWarningLines > 5:
+                    if self._numWarningLines == 6:
+                        print os.linesep + '5 warnings shown, skipping rest of warnings for file...'
+                else:
+                    print os.linesep + "Warning in line\n---------------\n%s\n\nInternal representation: %s\n\n-> %s. Skipping line.\n---" % (lineStripped, repr(line), str(e))
+
+            self._lastWarning = str(e)
+            return None
+
+        except StopIteration:
+            raise
+
+        except Exception, e:
+            print os.linesep + "Error in line\n-------------\n%s\n\nInternal representation: %s\n\n-> %s\n---" % (lineStripped, repr(line), str(e))
+            raise
+
+    def hasColumnBatches(self):
+        return self._hasColumnBatches
+
+    def nextColumnBatch(self):
+        '''
+        Returns the elements of the next block of lines as a dict of column arrays, with a column for
+        'chr' and for each prefix of getPrefixList() (see ColumnBatches). To be called instead of
+        next() on the iterator returned by __iter__().
+
+        For sources with hasColumnBatches(), the lines are parsed by the vectorized
+        _parseColumnBatch() of the source. Blocks that it cannot parse, e.g. blocks with errors or
+        warnings, are parsed line by line, so that errors and warnings are reported for the same
+        lines as when iterating over the elements. Other sources collect the elements of next().
+        '''
+        if not self._hasColumnBatches:
+            return nextColumnBatchOfElements(self)
+
+        while True:
+            block = self._file.read(self._COLUMN_BATCH_READ_SIZE)
+            if block == '':
+                self._parseLine(block)
+                raise StopIteration
+            if not block.endswith('\n'):
+                block += self._file.readline()
+
+            lines = block.split('\n')
+            if lines[-1] == '':
+                del lines[-1]
 
             try:
-                if line == '':#End of file
-                    if not self._handledEof:
-                        self._handleEndOfFile()
-                        self._checkBoundingRegionOverlap()
-                        self._handledEof = True
-                    if not self._anyPendingElements():
-                        raise StopIteration
-                elif lineStripped == '': #Blank line
-                    self._handleBlankLine()
-                    continue
-
-                ge = self._next(lineStripped)
-                if ge is None:
-                    continue
+                if '\r' in block or '\0' in block:
+                    raise LineByLineParsingNeeded
+                columns = self._parseColumnBatch(lines)
+            except (LineByLineParsingNeeded, ValueError, OverflowError):
+                columns = self._parseLinesToColumns(lines)
 
-                self._genomeElement = ge
-                return self._genomeElement
+            if columns is not None:
+                return columns
 
-            except Warning, e:
-                if self._printWarnings:
-                    if not hasattr(self, '_numWarningLines'):
-                        self._numWarningLines = 0
-                    self._numWarningLines +=1
-                    if self._numWarningLines > 5:
-                        if self._numWarningLines == 6:
-                            print os.linesep + '5 warnings shown, skipping rest of warnings for file...'
-                    else:
-                        print os.linesep + "Warning in line\n---------------\n%s\n\nInternal representation: %s\n\n-> %s. Skipping line.\n---" % (lineStripped, repr(line), str(e))
+    def iterColumnBatches(self):
+        return iterColumnBatches(self)
 
-                self._lastWarning = str(e)
-                continue
+    def _parseColumnBatch(self, lines):
+        raise LineByLineParsingNeeded
 
-            except StopIteration:
-                raise
+    def _parseLinesToColumns(self, lines):
+        geIter = (ge for ge in (self._parseLine(line + '\n') for line in lines) if ge is not None)
+        try:
+            return nextColumnBatchOfElements(geIter, batchSize=len(lines))
+        except StopIteration:
+            return None
+
+    @staticmethod
+    def _splitColumnBatchFields(lines):
+        '''
+        Splits the tab-separated lines into a list of columns, each a list of fields. The lines are
+        joined with an extra field between them, which must be found after every numCols fields if
+        all lines have the same number of columns.
+        '''
+        if len(lines) == 0:
+            raise LineByLineParsingNeeded
+
+        numCols = lines[0].count('\t') + 1
+        fields = '\t\0\t'.join(lines).split('\t')
+        if len(fields) != len(lines) * (numCols + 1) - 1 or \
+                fields[numCols::numCols + 1].count('\0') != len(lines) - 1:
+            raise LineByLineParsingNeeded
+        return [fields[i::numCols + 1] for i in xrange(numCols)]
+
+    @staticmethod
+    def _parseIntColumn(fields):
+        # numpy.fromstring is much faster than astype(), and is used for non-negative integers
+        joined = ' '.join(fields)
+        if joined.translate(None, '0123456789 ') == '' and max(map(len, fields)) <= 18:
+            ints = numpy.fromstring(joined, dtype='int64', sep=' ')
+            if len(ints) == len(fields):
+                return ints
+        return numpy.array(fields).astype('int64')
 
-            except Exception, e:
-                print os.linesep + "Error in line\n-------------\n%s\n\nInternal representation: %s\n\n-> %s\n---" % (lineStripped, repr(line), str(e))
-                raise
+    @classmethod
+    def _parseFloatColumn(cls, fields):
+        try:
+            return numpy.array(map(float, fields), dtype='float64')
+        except ValueError:
+            return cls._handleNanColumn(numpy.array(fields)).astype('float64')
 
     def _anyPendingElements(self):
         return False
@@ -176,6 +270,14 @@ class GenomeElementSource(object):
     def _readHeaders(self, file):
         self.headers = [file.readline() for i in xrange(self._numHeaderLines)]
 
+    def getHeaderLines(self):
+        file = self._getFile()
+        try:
+            self._readHeaders(file)
+        finally:
+            file.close()
+        return [line.rstrip('\r\n') for line in self.headers]
+
     def _getFileNoHeaders(self):
         file = self._getFile()
         self._readHeaders(file)
@@ -230,6 +332,27 @@ class GenomeElementSource(object):
 
         return end
 
+    def _checkValidChrColumn(self, chrs):
+        if self.genome and not all(GenomeInfo.isValidChr(self.genome, chr) for chr in numpy.unique(chrs)):
+            raise LineByLineParsingNeeded
+        return chrs
+
+    def _checkValidStartColumn(self, chrs, starts):
+        if (starts < 0).any() or (self.genome and (starts > self._getChrLenColumn(chrs)).any()):
+            raise LineByLineParsingNeeded
+        return starts
+
+    def _checkValidEndColumn(self, chrs, ends, starts=None):
+        if (ends < 0).any() or (self.genome and (ends - 1 > self._getChrLenColumn(chrs)).any()):
+            raise LineByLineParsingNeeded
+        if starts is not None and ((ends <= starts) & ((starts != 1) | (ends != 1))).any():
+            raise LineByLineParsingNeeded
+        return ends
+
+    def _getChrLenColumn(self, chrs):
+        uniqueChrs, chrIndexes = numpy.unique(chrs, return_inverse=True)
+        return numpy.array([GenomeInfo.getChrLen(self.genome, chr) for chr in uniqueChrs], dtype='int64')[chrIndexes]
+
     def _checkBoundingRegionOverlap(self):
         if self.hasBoundingRegionTuples():
             for i,brTuple in enumerate(sorted(self.getBoundingRegionTuples())):
@@ -250,6 +373,10 @@ class GenomeElementSource(object):
             return 'nan'
         return str
 
+    @classmethod
+    def _handleNanColumn(cls, strs):
+        return numpy.where(numpy.in1d(numpy.char.lower(strs), ['.', 'na', 'nan', 'n/a', 'none']), 'nan', strs)
+
     @classmethod
     def _getStrandFromString(cls, val):
         if val == '+':
@@ -262,6 +389,13 @@ class GenomeElementSource(object):
         else:
             raise InvalidFormatError("Error: strand must be either '+', '-' or '.'. Value: %s" % val)
 
+    @classmethod
+    def _getStrandColumnFromStrings(cls, vals):
+        isPlus, isMinus = vals == '+', vals == '-'
+        if not (isPlus | isMinus | (vals == '.')).all():
+            raise LineByLineParsingNeeded
+        return numpy.where(isPlus, 1, numpy.where(isMinus, 0, BINARY_MISSING_VAL)).astype('int8')
+
     def hasBoundingRegionTuples(self):
         return len(self.getBoundingRegionTuples()) > 0
 
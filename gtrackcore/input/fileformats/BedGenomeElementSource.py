@@ -1,6 +1,6 @@
 import numpy
 
-from gtrackcore.input.core.GenomeElementSource import GenomeElementSource
+from gtrackcore.input.core.GenomeElementSource import GenomeElementSource, LineByLineParsingNeeded
 from gtrackcore.input.core.GenomeElement import GenomeElement
 from gtrackcore.util.CustomExceptions import InvalidFormatError
 
@@ -9,6 +9,7 @@ class BedGenomeElementSource(GenomeElementSource):
     FILE_SUFFIXES = ['bed']
     FILE_FORMAT_NAME = 'BED'
     _numHeaderLines = 0
+    _hasColumnBatches = True
     
     MIN_NUM_COLS = 3
     MAX_NUM_COLS = 12
@@ -59,9 +60,40 @@ class BedGenomeElementSource(GenomeElementSource):
         
         return ge
     
+    def _parseColumnBatch(self, lines):
+        cols = self._splitColumnBatchFields([line for line in lines if line != '' and not line.startswith('#')])
+        numCols = len(cols)
+
+        if self._numCols is not None and numCols != self._numCols:
+            raise LineByLineParsingNeeded
+        if numCols < self.MIN_NUM_COLS or numCols > self.MAX_NUM_COLS:
+            raise LineByLineParsingNeeded
+
+        columns = {}
+        columns['chr'] = self._checkValidChrColumn(numpy.array(cols[0]))
+        columns['start'] = self._checkValidStartColumn(columns['chr'], self._parseIntColumn(cols[1]))
+
+        self._parseEndColumn(columns, self._checkValidEndColumn(columns['chr'], self._parseIntColumn(cols[2]),
+                                                                starts=columns['start']))
+        self._parseNameColumn(columns, cols)
+        self._parseValColumn(columns, cols)
+
+        if numCols >= 6:
+            columns['strand'] = self._getStrandColumnFromStrings(numpy.array(cols[5]))
+
+        for i,extraCol in enumerate(self.BED_EXTRA_COLUMNS):
+            if numCols >= i+7:
+                columns[extraCol] = numpy.array(cols[i+6])
+
+        self._numCols = numCols
+        return columns
+
     def _parseEnd(self, ge, end):
         ge.end = end
 
+    def _parseEndColumn(self, columns, ends):
+        columns['end'] = ends
+
     def _parseName(self, ge, cols):
         if self._numCols >= 4:
             ge.name = cols[3]
@@ -74,6 +106,17 @@ class BedGenomeElementSource(GenomeElementSource):
                                          "should use the file formats 'valued.bed' or 'gtrack'?")
             ge.val = val
 
+    def _parseNameColumn(self, columns, cols):
+        if len(cols) >= 4:
+            columns['name'] = numpy.array(cols[3])
+
+    def _parseValColumn(self, columns, cols):
+        if len(cols) >= 5:
+            vals = self._parseIntColumn(cols[4])
+            if ((vals < 0) | (vals > 1000)).any():
+                raise LineByLineParsingNeeded
+            columns['val'] = vals
+
     def getValDataType(self):
         return 'int32'
 
@@ -85,6 +128,10 @@ class PointBedGenomeElementSource(BedGenomeElementSource):
         if end != ge.start + 1:
             raise InvalidFormatError('Error: point BED files can only have segments of length 1')
 
+    def _parseEndColumn(self, columns, ends):
+        if (ends != columns['start'] + 1).any():
+            raise LineByLineParsingNeeded
+
 class BedValuedGenomeElementSource(BedGenomeElementSource):
     _VERSION = '1.1'
     FILE_SUFFIXES = ['valued.bed', 'marked.bed']
@@ -94,6 +141,9 @@ class BedValuedGenomeElementSource(BedGenomeElementSource):
     
     def _parseVal(self, ge, cols):
         ge.val = numpy.float(self._handleNan(cols[4]))
+
+    def _parseValColumn(self, columns, cols):
+        columns['val'] = self._parseFloatColumn(cols[4])
     
     def getValDataType(self):
         return 'float64'
@@ -111,8 +161,17 @@ class BedCategoryGenomeElementSource(BedGenomeElementSource):
         
         ge.val = cols[3]
         
+    def _parseValColumn(self, columns, cols):
+        if len(cols) >= 5:
+            columns['score'] = numpy.array(cols[4])
+
+        columns['val'] = numpy.array(cols[3])
+
     def _parseName(self, ge, cols):
         pass
+
+    def _parseNameColumn(self, columns, cols):
+        pass
         
     def getValDataType(self):
         return 'S'
@@ -1,7 +1,7 @@
 import numpy
 
 from gtrackcore.input.core.GenomeElement import GenomeElement
-from gtrackcore.input.core.GenomeElementSource import GenomeElementSource
+from gtrackcore.input.core.GenomeElementSource import GenomeElementSource, LineByLineParsingNeeded
 from gtrackcore.util.CommonConstants import BINARY_MISSING_VAL
 from gtrackcore.util.CustomExceptions import InvalidFormatError
 
@@ -11,6 +11,7 @@ class BedGraphGenomeElementSource(GenomeElementSource):
     FILE_FORMAT_NAME = 'bedGraph'
 
     _numHeaderLines = 0
+    _hasColumnBatches = True
         
     def __new__(cls, *args, **kwArgs):
         return object.__new__(cls)
@@ -43,9 +44,25 @@ class BedGraphGenomeElementSource(GenomeElementSource):
         
         return ge
     
+    def _parseColumnBatch(self, lines):
+        cols = self._splitColumnBatchFields([line for line in lines if line != ''])
+        if len(cols) < 4:
+            raise LineByLineParsingNeeded
+
+        columns = {}
+        columns['chr'] = self._checkValidChrColumn(numpy.array(cols[0]))
+        columns['start'] = self._parseIntColumn(cols[1])
+        columns['end'] = self._parseIntColumn(cols[2])
+        self._parseValColumn(columns, cols[3])
+
+        return columns
+
     def _parseVal(self, ge, valStr):
         ge.val = numpy.float(self._handleNan(valStr))
 
+    def _parseValColumn(self, columns, valStrs):
+        columns['val'] = self._parseFloatColumn(valStrs)
+
 class BedGraphTargetControlGenomeElementSource(BedGraphGenomeElementSource):
     _VERSION = '1.6'
     FILE_SUFFIXES = ['targetcontrol.bedgraph']
@@ -63,6 +80,14 @@ class BedGraphTargetControlGenomeElementSource(BedGraphGenomeElementSource):
             ge.val = True
         else:
             raise InvalidFormatError('Could not parse value: ' + valStr + ' as target/control.') 
+
+    def _parseValColumn(self, columns, valStrs):
+        valStrs = numpy.array(valStrs)
+        isMissing = self._handleNanColumn(valStrs) == 'nan'
+        isTarget = valStrs == '1'
+        if not (isMissing | isTarget | (valStrs == '0')).all():
+            raise LineByLineParsingNeeded
+        columns['val'] = numpy.where(isMissing, BINARY_MISSING_VAL, isTarget).astype('int8')
         
     def getValDataType(self):
         return 'int8'
@@ -1,13 +1,38 @@
 import os
+from collections import OrderedDict, namedtuple
+
 import numpy as np
 
+from gtrackcore.core.Config import Config
 from gtrackcore.input.core.GenomeElementSource import GenomeElementSource, BoundingRegionTuple
 from gtrackcore.track.core.GenomeRegion import GenomeRegion
 from gtrackcore.input.core.GenomeElement import GenomeElement
-from gtrackcore.util.CustomExceptions import InvalidFormatError
+from gtrackcore.util.CustomExceptions import InvalidFormatError, InvalidFormatWarning
+
+READ_BLOCK_SIZE = 16 * 1024 * 1024
+NEWLINE_BYTES = [ord('\n'), ord('\r')]
+INDEX_HEADER_PREFIX = '#'
+
+# As the lines of a .fai index, which starts with a header line holding the size and modification time
+# of the FASTA file. lineBases and lineWidth are None if the lines of the sequence do not
+# all have the same length, in which case the offsets of positions can not be calculated.
+FastaIndexEntry = namedtuple('FastaIndexEntry', ['name', 'length', 'offset', 'lineBases', 'lineWidth'])
+
 
 class FastaGenomeElementSource(GenomeElementSource):
-    _VERSION = '1.1'
+    '''
+    Returns one element per sequence of the file, with the whole sequence as an S1 array (the bytes
+    are also available as uint8 by val.view('uint8')). The file is read in large blocks. A first pass
+    finds the length and byte offset of each sequence, so that the array of each sequence can be
+    preallocated and filled block by block, with the newlines removed by numpy.
+
+    The lengths and offsets are kept in a FastaIndex. If Config.BUILD_FASTA_INDEX is set, the index
+    is stored in a hidden .fai file next to the FASTA file, which is used instead of the first pass
+    as long as the size and modification time of the FASTA file are those stored in the index. The
+    index also lets readRegion() seek directly to the sequence of a region.
+    '''
+
+    _VERSION = '1.2'
     FILE_SUFFIXES = ['fasta', 'fas', 'fa']
     FILE_FORMAT_NAME = 'FASTA'
 
@@ -20,56 +45,68 @@ class FastaGenomeElementSource(GenomeElementSource):
     def __init__(self, *args, **kwArgs):
         GenomeElementSource.__init__(self, *args, **kwArgs)
         self._boundingRegionTuples = []
-        self._chr = None
+        self._fastaIndex = None
+
+    def _getFile(self):
+        # opened in binary mode, as the index holds byte offsets
+        if self._strToUseInsteadOfFn != '':
+            return GenomeElementSource._getFile(self)
+        return open(self._fn, 'rb')
 
     def _iter(self):
-        self._elCount = 0
         self._boundingRegionTuples = []
-        self._genomeElement.chr = None
+        self._entryIter = iter(self.getFastaIndex(self._file).entries.values())
         return self
 
-    def _next(self, line):
-        if line.startswith('>'):
-            self._appendBoundingRegionTuple()
-            self._elCount = 0
-            self._chr = self._checkValidChr(line[1:].split()[0])
-        else:
-            if self._chr is None:
-                raise InvalidFormatError('FASTA file does not start with the ">" character.')
-
-            self._elCount += len(line)
-            ge = GenomeElement(self._genome, self._chr)
-            ge.val = np.fromstring(line, dtype='S1')
-            return ge
-
-    def _handleEndOfFile(self):
-        self._appendBoundingRegionTuple()
-
-    #def next(self):
-    #    while True:
-    #        bp = self._file.read(1)
-    #
-    #        if bp == '>':
-    #            self._appendBoundingRegionTuple()
-    #            self._elCount = 0
-    #            line = self._file.readline().rstrip()
-    #            self._genomeElement.chr = self._checkValidChr(line.split()[0])
-    #
-    #        elif bp == '':
-    #            self._appendBoundingRegionTuple()
-    #            raise StopIteration
-    #
-    #        elif bp not in '\r\n':
-    #            self._elCount += 1
-    #            self._genomeElement.val = bp
-    #            return self._genomeElement
-
-    def _appendBoundingRegionTuple(self):
-        #if self._genomeElement.chr is not None:
-        #    brRegion = GenomeRegion(self._genome, self._genomeElement.chr, 0, self._elCount)
-        if self._chr is not None:
-            brRegion = GenomeRegion(self._genome, self._chr, 0, self._elCount)
-            self._boundingRegionTuples.append(BoundingRegionTuple(brRegion, self._elCount))
+    def next(self):
+        while True:
+            try:
+                entry = self._entryIter.next()
+            except StopIteration:
+                self._checkBoundingRegionOverlap()
+                raise
+
+            try:
+                chr = self._checkValidChr(entry.name)
+            except InvalidFormatWarning, e:
+                if self._printWarnings:
+                    print os.linesep + 'Warning in FASTA file: %s. Skipping sequence.' % e
+                self._lastWarning = str(e)
+                continue
+
+            brRegion = GenomeRegion(self._genome, chr, 0, entry.length)
+            self._boundingRegionTuples.append(BoundingRegionTuple(brRegion, entry.length))
+            if entry.length > 0:
+                return GenomeElement(self._genome, chr, val=readSequence(self._file, entry))
+
+    def getFastaIndex(self, fastaFile=None):
+        '''
+        Returns the FastaIndex of the file, which is read from the index file if it is up to date,
+        and else found by scanning fastaFile or the FASTA file.
+        '''
+        if self._fastaIndex is None:
+            # stated before scanning, so that the index of a file modified meanwhile is not up to date
+            fastaStat = os.stat(self._fn) if self._strToUseInsteadOfFn == '' else None
+            if fastaStat is not None and isFastaIndexUpToDate(self._fn, fastaStat):
+                self._fastaIndex = FastaIndex.read(getFastaIndexFilename(self._fn))
+            elif fastaFile is not None:
+                self._fastaIndex = FastaIndex.createFromFile(fastaFile)
+            else:
+                with self._getFile() as fastaFile:
+                    self._fastaIndex = FastaIndex.createFromFile(fastaFile)
+
+            if fastaStat is not None and Config.BUILD_FASTA_INDEX and \
+                    self._fastaIndex.isSeekable() and not isFastaIndexUpToDate(self._fn, fastaStat):
+                self._fastaIndex.write(getFastaIndexFilename(self._fn), fastaStat)
+        return self._fastaIndex
+
+    def readRegion(self, chr, start, end):
+        '''
+        Returns the sequence of chr from start to end as an S1 array, seeking directly to the start
+        position by the index of the file.
+        '''
+        with self._getFile() as fastaFile:
+            return self.getFastaIndex(fastaFile).readRegion(fastaFile, chr, start, end)
 
     def getValDataType(self):
         return 'S1'
@@ -79,3 +116,196 @@ class FastaGenomeElementSource(GenomeElementSource):
 
     def getBoundingRegionTuples(self):
         return self._boundingRegionTuples
+
+
+class FastaIndex(object):
+    def __init__(self, entries):
+        self.entries = OrderedDict((entry.name, entry) for entry in entries)
+
+    @classmethod
+    def createFromFile(cls, fastaFile):
+        '''
+        Scans the FASTA file in blocks ending at line ends, handling the sequence lines between
+        the headers of each block with numpy.
+        '''
+        scanner = _FastaScanner()
+        fileOffset = 0
+        while True:
+            block = fastaFile.read(READ_BLOCK_SIZE)
+            if block == '':
+                break
+            if not block.endswith('\n'):
+                block += fastaFile.readline()
+
+            blockPos = 0
+            while blockPos < len(block):
+                if block[blockPos] == '>':
+                    headerEnd = block.find('\n', blockPos)
+                    headerEnd = len(block) if headerEnd == -1 else headerEnd + 1
+                    scanner.addHeader(block[blockPos + 1:headerEnd], fileOffset + headerEnd)
+                else:
+                    headerStart = block.find('\n>', blockPos)
+                    headerEnd = len(block) if headerStart == -1 else headerStart + 1
+                    scanner.addLines(np.frombuffer(block, dtype='uint8', count=headerEnd - blockPos,
+                                                   offset=blockPos))
+                blockPos = headerEnd
+            fileOffset += len(block)
+
+        return cls(scanner.getEntries())
+
+    @classmethod
+    def read(cls, indexFn):
+        entries = []
+        with open(indexFn) as indexFile:
+            for line in indexFile:
+                if line.startswith(INDEX_HEADER_PREFIX):
+                    continue
+                name, length, offset, lineBases, lineWidth = line.rstrip('\r\n').split('\t')[:5]
+                entries.append(FastaIndexEntry(name, int(length), int(offset), int(lineBases), int(lineWidth)))
+        return cls(entries)
+
+    def write(self, indexFn, fastaStat):
+        assert self.isSeekable()
+        with open(indexFn, 'w') as indexFile:
+            indexFile.write(_getIndexHeader(fastaStat))
+            for entry in self.entries.values():
+                indexFile.write('\t'.join(str(x) for x in entry) + '\n')
+
+    def isSeekable(self):
+        return all(entry.lineBases is not None for entry in self.entries.values())
+
+    def readRegion(self, fastaFile, chr, start, end):
+        if chr not in self.entries:
+            raise InvalidFormatError('Error: sequence "%s" is not found in the FASTA file.' % chr)
+
+        entry = self.entries[chr]
+        if not 0 <= start <= end <= entry.length:
+            raise InvalidFormatError('Error: region %s-%s is outside sequence "%s" of length %s.' %
+                                     (start, end, chr, entry.length))
+        if entry.lineBases is None and start > 0:
+            raise InvalidFormatError('Error: the lines of sequence "%s" do not have the same length.' % chr)
+
+        return readSequence(fastaFile, entry, start, end)
+
+    def getByteOffset(self, chr, pos):
+        return _getByteOffset(self.entries[chr], pos)
+
+
+def getFastaIndexFilename(fn):
+    # hidden, so that the index is not taken as a track file when preprocessing
+    dirName, baseName = os.path.split(fn)
+    return os.path.join(dirName, '.' + baseName + '.fai')
+
+
+def isFastaIndexUpToDate(fn, fastaStat):
+    # The size and modification time of the FASTA file are compared, as a file replaced by a copy with
+    # preserved timestamps may be older than the index
+    indexFn = getFastaIndexFilename(fn)
+    if not os.path.exists(indexFn):
+        return False
+    with open(indexFn) as indexFile:
+        return indexFile.readline() == _getIndexHeader(fastaStat)
+
+
+def _getIndexHeader(fastaStat):
+    return '%ssize=%d\tmtime=%r\n' % (INDEX_HEADER_PREFIX, fastaStat.st_size, fastaStat.st_mtime)
+
+
+def readSequence(fastaFile, entry, start=0, end=None):
+    '''
+    Reads positions start to end of the sequence of the index entry into a preallocated S1 array,
+    removing the newlines of each block with numpy. Seeking to other start positions than 0 requires
+    lines of the same length.
+    '''
+    end = entry.length if end is None else end
+    sequence = np.empty(end - start, dtype='S1')
+    sequenceBytes = sequence.view('uint8')
+
+    fastaFile.seek(entry.offset if start == 0 else _getByteOffset(entry, start))
+
+    numFilled = 0
+    while numFilled < len(sequence):
+        block = fastaFile.read(min(READ_BLOCK_SIZE, _getNumBytesOfBases(entry, len(sequence) - numFilled)))
+        if block == '':
+            raise InvalidFormatError('Error: the FASTA file ends within sequence "%s".' % entry.name)
+
+        blockBytes = np.frombuffer(block, dtype='uint8')
+        blockBytes = blockBytes[(blockBytes != NEWLINE_BYTES[0]) & (blockBytes != NEWLINE_BYTES[1])]
+        numBytes = min(len(blockBytes), len(sequence) - numFilled)
+        sequenceBytes[numFilled:numFilled + numBytes] = blockBytes[:numBytes]
+        numFilled += numBytes
+
+    return sequence
+
+
+def _getByteOffset(entry, pos):
+    return entry.offset + (pos // entry.lineBases) * entry.lineWidth + pos % entry.lineBases
+
+
+def _getNumBytesOfBases(entry, numBases):
+    # including the newlines within the bases, or an estimate if the lines are not uniform
+    if entry.lineBases is None:
+        return numBases + numBases // 16 + 2
+    return numBases + (numBases // entry.lineBases + 1) * (entry.lineWidth - entry.lineBases)
+
+
+class _FastaScanner(object):
+    # Collects the index entries of the sequences, from headers and blocks of whole sequence lines
+    def __init__(self):
+        self._entries = []
+        self._cur = None
+
+    def addHeader(self, header, offset):
+        self._finishSequence()
+        fields = header.split()
+        if len(fields) == 0:
+            raise InvalidFormatError('Error: FASTA header without sequence name.')
+        self._cur = dict(name=fields[0], length=0, offset=offset, lineBases=None, lineWidth=None,
+                         isUniform=True, lastLineBases=None)
+
+    def addLines(self, lineBytes):
+        if self._cur is None:
+            if np.in1d(lineBytes, NEWLINE_BYTES).all():
+                return
+            raise InvalidFormatError('FASTA file does not start with the ">" character.')
+
+        cur = self._cur
+        isNewline = lineBytes == NEWLINE_BYTES[0]
+        numBases = len(lineBytes) - int(isNewline.sum()) - int((lineBytes == NEWLINE_BYTES[1]).sum())
+        cur['length'] += numBases
+        if not cur['isUniform']:
+            return
+
+        # the number of bases and bytes of each line, the last line possibly lacking a newline
+        lineEnds = np.flatnonzero(isNewline) + 1
+        if len(lineEnds) == 0 or lineEnds[-1] != len(lineBytes):
+            lineEnds = np.append(lineEnds, len(lineBytes))
+        lineWidths = np.diff(np.append(0, lineEnds))
+        hasNewline = isNewline[lineEnds - 1]
+        hasCarriageReturn = hasNewline & (lineWidths >= 2) & (lineBytes[np.maximum(lineEnds - 2, 0)] == NEWLINE_BYTES[1])
+        lineBases = lineWidths - hasNewline - hasCarriageReturn
+
+        if cur['lineBases'] is None:
+            cur['lineBases'], cur['lineWidth'] = int(lineBases[0]), int(lineWidths[0])
+
+        # All lines but the last of the sequence must be as the first, and the last line can not be longer
+        fullLines = slice(None, -1) if hasNewline[-1] else slice(None, -2)
+        cur['isUniform'] = lineBases.sum() == numBases and \
+            (cur['lastLineBases'] is None or cur['lastLineBases'] == cur['lineBases']) and \
+            (lineBases[:-1] == cur['lineBases']).all() and \
+            (lineWidths[fullLines] == cur['lineWidth']).all() and \
+            0 < lineBases[-1] <= cur['lineBases']
+        cur['lastLineBases'] = int(lineBases[-1])
+
+    def _finishSequence(self):
+        if self._cur is not None:
+            cur = self._cur
+            isSeekable = cur['isUniform'] and cur['lineBases'] is not None
+            self._entries.append(FastaIndexEntry(cur['name'], cur['length'], cur['offset'],
+                                                 cur['lineBases'] if isSeekable else None,
+                                                 cur['lineWidth'] if isSeekable else None))
+
+    def getEntries(self):
+        self._finishSequence()
+        self._cur = None
+        return self._entries
@@ -1,7 +1,10 @@
+from gtrackcore.input.core.ColumnBatches import getNextColumnBatch, getNumRows, selectRows, getGenomeMask
 from gtrackcore.input.wrappers.GESourceWrapper import GESourceWrapper
 from gtrackcore.util.CustomExceptions import ShouldNotOccurError
 
 class GEBoundingRegionElementCounter(GESourceWrapper):    
+    _supportsColumnBatches = True
+
     def __init__(self, geSource, boundingRegionTuples):
         GESourceWrapper.__init__(self, geSource)
         self._brTuples = boundingRegionTuples
@@ -32,15 +35,49 @@ class GEBoundingRegionElementCounter(GESourceWrapper):
             return el
         
         except StopIteration:
+            self._handleEndOfIteration()
+            raise
+
+    def nextColumnBatch(self):
+        try:
+            columns = getNextColumnBatch(self._geIter)
+        except StopIteration:
+            self._handleEndOfIteration()
+            raise
+
+        # The rows contained in the current bounding region are found in windows of growing size,
+        # so that batches spanning many bounding regions are not scanned once per region
+        numRows = getNumRows(columns)
+        rowIdx = 0
+        windowSize = 16
+        while rowIdx < numRows:
+            if len(self._brTuples) > 0:
+                window = selectRows(columns, slice(rowIdx, rowIdx + windowSize))
+                contained = self._containsRows(self._brTuples[-1].region, window)
+                numContained = len(contained) if contained.all() else int(contained.argmin())
+                self._brTuples[-1].elCount += numContained
+                rowIdx += numContained
+                if numContained == len(contained):
+                    windowSize *= 2
+                    continue
+
             try:
-                while True:    
-                    self._getNextBrTuple()
+                self._getNextBrTuple()
             except StopIteration:
-                pass
-            
-            self._finishedCounting = True
-            raise
-            
+                raise ShouldNotOccurError
+            windowSize = 16
+
+        return columns
+
+    def _handleEndOfIteration(self):
+        try:
+            while True:
+                self._getNextBrTuple()
+        except StopIteration:
+            pass
+
+        self._finishedCounting = True
+
     def _getNextBrTuple(self):
         self._brTuples.append( self._brIter.next() )
         self._brTuples[-1].elCount = 0
@@ -52,6 +89,14 @@ class GEBoundingRegionElementCounter(GESourceWrapper):
         return False if (el.start is not None and br.start > el.start) or \
                         (el.end is not None and br.end < el.end) else True
         
+    def _containsRows(self, br, columns):
+        contained = (columns['chr'] == br.chr) & getGenomeMask(columns, br.genome, self.getGenome)
+        if 'start' in columns:
+            contained &= columns['start'] >= br.start
+        if 'end' in columns:
+            contained &= columns['end'] <= br.end
+        return contained
+
     def getBoundingRegionTuples(self):
         assert self._finishedCounting
         return self._brTuples
@@ -1,3 +1,6 @@
+import numpy
+
+from gtrackcore.input.core.ColumnBatches import selectRows
 from gtrackcore.input.wrappers.GEFilter import GEFilter
 
 class GECategoryFilter(GEFilter):
@@ -12,4 +15,17 @@ class GECategoryFilter(GEFilter):
             (not self._strict and not any(x in nextEl.val for x in self._filterSet)):
             nextEl = self._geIter.next()
         return nextEl
-    
\ No newline at end of file
+
+    def _filterColumnBatch(self, columns):
+        vals = columns['val']
+        if vals.dtype.kind == 'S' and vals.ndim == 1:
+            if self._strict:
+                keep = numpy.in1d(vals, list(self._filterSet))
+            else:
+                keep = numpy.zeros(len(vals), dtype=bool)
+                for category in self._filterSet:
+                    keep |= numpy.char.find(vals, category) != -1
+        else:
+            keep = numpy.array([(val in self._filterSet) if self._strict else any(x in val for x in self._filterSet)
+                                for val in vals.tolist()], dtype=bool)
+        return selectRows(columns, keep)
@@ -1,7 +1,10 @@
+from gtrackcore.input.core.ColumnBatches import getNextColumnBatch
 from gtrackcore.input.wrappers.GESourceWrapper import GESourceWrapper, PausedAtCountsGESourceWrapper
 from gtrackcore.util.CustomExceptions import InvalidFormatError, NotIteratedYetError
 
 class GEDependentAttributesHolder(GESourceWrapper):    
+    _supportsColumnBatches = True
+
     def __init__(self, geSource):
         GESourceWrapper.__init__(self, geSource)
         self._geIter = None
@@ -19,16 +22,26 @@ class GEDependentAttributesHolder(GESourceWrapper):
         try:
             return self._geIter.next()
         except StopIteration:
-            self._storeOtherDependentAttrs()
-
-            if self._valDim is None:
-                raise InvalidFormatError('Error: unable to determine value dimension.')
-            if self._edgeWeightDim is None:
-                raise InvalidFormatError('Error: unable to determine edge weight dimension.')
+            self._handleEndOfIteration()
+            raise
 
-            self._boundingRegionTuples = self._geIter.getBoundingRegionTuples()
+    def nextColumnBatch(self):
+        try:
+            return getNextColumnBatch(self._geIter)
+        except StopIteration:
+            self._handleEndOfIteration()
             raise
 
+    def _handleEndOfIteration(self):
+        self._storeOtherDependentAttrs()
+
+        if self._valDim is None:
+            raise InvalidFormatError('Error: unable to determine value dimension.')
+        if self._edgeWeightDim is None:
+            raise InvalidFormatError('Error: unable to determine edge weight dimension.')
+
+        self._boundingRegionTuples = self._geIter.getBoundingRegionTuples()
+
     def getBoundingRegionTuples(self):
         if self._boundingRegionTuples is None:
             raise NotIteratedYetError
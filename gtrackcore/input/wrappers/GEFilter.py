@@ -1,10 +1,13 @@
 from copy import copy
 
+from gtrackcore.input.core.ColumnBatches import getNextColumnBatch, getNumRows
 from gtrackcore.input.wrappers.GESourceWrapper import GESourceWrapper
 from gtrackcore.track.format.TrackFormat import TrackFormat
-from gtrackcore.util.CustomExceptions import NotSupportedError
+from gtrackcore.util.CustomExceptions import NotSupportedError, AbstractClassError
 
 class GEFilter(GESourceWrapper):
+    _supportsColumnBatches = True
+
     def __init__(self, geSource):
         GESourceWrapper.__init__(self, geSource)
         self._geIter = None    
@@ -25,4 +28,13 @@ class GEFilter(GESourceWrapper):
         return self
 
     def  __len__(self):
-        return sum(1 for i in self)
\ No newline at end of file
+        return sum(1 for i in self)
+
+    def nextColumnBatch(self):
+        while True:
+            columns = self._filterColumnBatch(getNextColumnBatch(self._geIter))
+            if getNumRows(columns) > 0:
+                return columns
+
+    def _filterColumnBatch(self, columns):
+        raise AbstractClassError
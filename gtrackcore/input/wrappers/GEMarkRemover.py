@@ -13,3 +13,6 @@ class GEMarkRemover(GEFilter):
     
     def getValDataType(self):
         return None
+
+    def _filterColumnBatch(self, columns):
+        return dict((column, values) for column, values in columns.iteritems() if column != 'val')
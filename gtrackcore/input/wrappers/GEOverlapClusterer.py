@@ -4,8 +4,9 @@ from copy import copy
 from bisect import insort
 
 from gtrackcore.core.Config import Config
+from gtrackcore.input.core.ColumnBatches import getNextColumnBatch, getNumRows, selectRows, concatenateColumns
 from gtrackcore.input.wrappers.GESourceWrapper import GESourceWrapper
-from gtrackcore.util.CommonConstants import BINARY_MISSING_VAL
+from gtrackcore.util.CommonConstants import BINARY_MISSING_VAL, RESERVED_PREFIXES
 from gtrackcore.util.CustomExceptions import ShouldNotOccurError
 from gtrackcore.util.CommonFunctions import isIter
 from gtrackcore.track.format.TrackFormat import TrackFormat
@@ -26,6 +27,8 @@ class GEOverlapClusterer(object):
             raise ShouldNotOccurError()
 
 class GEOverlapClustererBase(GESourceWrapper):    
+    _supportsColumnBatches = True
+
     def __init__(self, sortedGeSource):
         GESourceWrapper.__init__(self, sortedGeSource)
         self._geIter = None
@@ -34,16 +37,17 @@ class GEOverlapClustererBase(GESourceWrapper):
         self = copy(self)
         self._curValsDict = {}
         self._geIter = self._geSource.__iter__()
-        
-        try:
-            self._prevEl = None
-            self._prevEl = self._geIter.next()
-        except StopIteration:
-            pass
+        self._prevEl = None
+        self._isFirst = True
+        self._pendingColumns = None
         return self
     
     def next(self):
         try:
+            if self._isFirst:
+                self._isFirst = False
+                self._prevEl = self._geIter.next()
+
             while True:
                 el = self._geIter.next()
                 
@@ -67,6 +71,121 @@ class GEOverlapClustererBase(GESourceWrapper):
                 
             raise StopIteration
     
+    def nextColumnBatch(self):
+        '''
+        Returns the clusters of the next column batch. The rows of the last cluster of a batch are
+        held back, as the cluster may continue in the next batch.
+        '''
+        while True:
+            try:
+                columns = getNextColumnBatch(self._geIter)
+            except StopIteration:
+                if self._pendingColumns is None:
+                    raise
+                columns, self._pendingColumns = self._pendingColumns, None
+                return self._clusterColumns(columns, self._findClusterStarts(columns))
+
+            if self._pendingColumns is not None:
+                columns = concatenateColumns([self._pendingColumns, columns])
+
+            clusterStarts = self._findClusterStarts(columns)
+            lastStart = clusterStarts[-1]
+            self._pendingColumns = selectRows(columns, slice(lastStart, None))
+            if lastStart > 0:
+                return self._clusterColumns(selectRows(columns, slice(None, lastStart)), clusterStarts[:-1])
+
+    def _findClusterStarts(self, columns):
+        return numpy.flatnonzero(self._findNewClusterMask(columns, self._findNewRunMask(columns)))
+
+    def _findNewRunMask(self, columns):
+        # rows starting a new run of rows of the same genome and chromosome
+        newRun = numpy.zeros(getNumRows(columns), dtype=bool)
+        newRun[:1] = True
+        for column in ['genome', 'chr']:
+            if column in columns:
+                newRun[1:] |= columns[column][1:] != columns[column][:-1]
+        return newRun
+
+    def _clusterColumns(self, columns, clusterStarts):
+        clustered = {}
+        for column, values in columns.iteritems():
+            if column in ['genome', 'chr', 'start']:
+                clustered[column] = values[clusterStarts]
+            elif column == 'end':
+                clustered[column] = numpy.maximum.reduceat(values, clusterStarts)
+            elif column in ['edges', 'weights']:
+                clustered[column] = numpy.empty(len(clusterStarts), dtype=object)
+                clustered[column][:] = [numpy.array([]) for i in xrange(len(clusterStarts))]
+            else:
+                clustered[column] = self._getClusteredContents(values, clusterStarts, column)
+        return clustered
+
+    def _getClusteredContents(self, values, clusterStarts, prefix):
+        firsts = values[clusterStarts]
+        if len(values) == len(clusterStarts):
+            return firsts
+
+        if values.dtype == object:
+            return self._getClusteredContentsOfElements(values, clusterStarts, prefix)
+
+        firstRows = clusterStarts[numpy.cumsum(self._getStartMask(len(values), clusterStarts)) - 1]
+        differs = values != values[firstRows]
+        if values.ndim > 1:
+            differs = differs.any(axis=tuple(range(1, values.ndim)))
+        clusterDiffers = numpy.logical_or.reduceat(differs, clusterStarts)
+        if not clusterDiffers.any():
+            return firsts
+
+        if self._isConcatPrefix(prefix) and values.ndim == 1:
+            return self._getConcatContentsOfClusters(values, clusterStarts, clusterDiffers, firsts,
+                                                     sorted=(prefix == 'val'))
+
+        missing = self._getMissingValue(prefix)
+        if missing is None:
+            return firsts
+        missing = numpy.array(missing, dtype=numpy.result_type(values.dtype, numpy.asarray(missing).dtype))
+        clusterDiffers = clusterDiffers.reshape(clusterDiffers.shape + (1,) * (values.ndim - 1))
+        return numpy.where(clusterDiffers, missing, firsts)
+
+    def _getStartMask(self, numRows, clusterStarts):
+        startMask = numpy.zeros(numRows, dtype=bool)
+        startMask[clusterStarts] = True
+        return startMask
+
+    def _isConcatPrefix(self, prefix):
+        if prefix == 'val':
+            valDataType = self._geSource.getValDataType()
+            return valDataType[0] == 'S' and valDataType != 'S1'
+        return prefix == 'id' or prefix not in RESERVED_PREFIXES
+
+    def _getConcatContentsOfClusters(self, values, clusterStarts, clusterDiffers, firsts, sorted):
+        clusterEnds = numpy.append(clusterStarts[1:], len(values))
+        contents = firsts.tolist()
+        for i in numpy.flatnonzero(clusterDiffers):
+            curValsList = values[clusterStarts[i]:clusterEnds[i]].tolist()
+            if sorted:
+                curValsList.sort()
+            if len(curValsList) < Config.MAX_CONCAT_LEN_FOR_OVERLAPPING_ELS:
+                contents[i] = '|'.join(curValsList)
+            else:
+                contents[i] = curValsList[0] + '|...'
+        return numpy.array(contents)
+
+    def _getClusteredContentsOfElements(self, values, clusterStarts, prefix):
+        # values that are lists or arrays are clustered element by element, as by next()
+        clusterEnds = numpy.append(clusterStarts[1:], len(values))
+        contents = numpy.empty(len(clusterStarts), dtype=object)
+        for i, (start, end) in enumerate(zip(clusterStarts, clusterEnds)):
+            self._curValsDict = {}
+            content = values[start]
+            for value in values[start+1:end]:
+                newContent = self._getNewContentsOfPrev(content, value, prefix)
+                if newContent is not None:
+                    content = newContent
+            contents[i] = numpy.asarray(content) if isIter(content) else content
+        self._curValsDict = {}
+        return contents
+
     def _removeEdges(self, el):
         #el = deepcopy(el)
         el = el.getCopy()
@@ -97,7 +216,7 @@ class GEOverlapClustererBase(GESourceWrapper):
                 valDataType = self._geSource.getValDataType()
                 if prefix == 'val' and valDataType[0] == 'S' and valDataType != 'S1':
                     return self._getConcatContent(x, y, prefix, sorted=True)
-                elif prefix in ['id'] + self._prevEl.orderedExtraKeys:
+                elif prefix == 'id' or prefix not in RESERVED_PREFIXES:
                     return self._getConcatContent(x, y, prefix, sorted=False)
                 else:
                     if x != y:
@@ -145,6 +264,31 @@ class GEOverlapClusterer_Segment(GEOverlapClustererBase):
     def _overlapsPrev(self, el):
         return el.start < self._prevEl.end
 
+    def _findNewClusterMask(self, columns, newRun):
+        starts, ends = columns['start'].astype('int64'), columns['end'].astype('int64')
+        if len(starts) == 0:
+            return newRun
+
+        if (newRun[1:] | (starts[1:] >= starts[:-1])).all() and (ends >= starts).all():
+            # With sorted starts, the running maximum of the ends of a chromosome run is the end of
+            # the current cluster. The runs are offset from each other, so that the maximum does not
+            # carry over from one run to the next.
+            offsets = numpy.cumsum(newRun) * (ends.max() - min(starts.min(), ends.min()) + 1)
+            maxEnds = numpy.maximum.accumulate(ends + offsets)
+            newCluster = newRun.copy()
+            newCluster[1:] |= starts[1:] + offsets[1:] >= maxEnds[:-1]
+            return newCluster
+
+        newCluster = newRun.copy()
+        clusterEnd = None
+        for i in xrange(len(starts)):
+            if newCluster[i] or starts[i] >= clusterEnd:
+                newCluster[i] = True
+                clusterEnd = ends[i]
+            else:
+                clusterEnd = max(clusterEnd, ends[i])
+        return newCluster
+
     def _extendPrev(self, el):
         #self._prevEl = deepcopy(self._prevEl)
         self._prevEl = self._prevEl.getCopy()
@@ -154,6 +298,12 @@ class GEOverlapClusterer_Point(GEOverlapClustererBase):
     def _overlapsPrev(self, el):
         return el.start == self._prevEl.start
 
+    def _findNewClusterMask(self, columns, newRun):
+        starts = columns['start']
+        newCluster = newRun.copy()
+        newCluster[1:] |= starts[1:] != starts[:-1]
+        return newCluster
+
     def _extendPrev(self, el):
         #self._prevEl = deepcopy(self._prevEl)
         self._prevEl = self._prevEl.getCopy()
@@ -1,3 +1,6 @@
+import numpy
+
+from gtrackcore.input.core.ColumnBatches import selectRows, getGenomeMask
 from gtrackcore.input.wrappers.GEFilter import GEFilter
 
 class GERegionBoundaryFilter(GEFilter):
@@ -15,3 +18,17 @@ class GERegionBoundaryFilter(GEFilter):
             not True in [r.contains(nextEl) for r in self._boundaryRegions[nextEl.chr]]:
             nextEl = self._geIter.next()
         return nextEl
+
+    def _filterColumnBatch(self, columns):
+        chrs, starts, ends = columns['chr'], columns['start'], columns['end']
+        keep = numpy.zeros(len(chrs), dtype=bool)
+        genomeMasks = {}
+        for chr in numpy.unique(chrs).tolist():
+            if chr not in self._boundaryRegions:
+                continue
+            chrRows = chrs == chr
+            for region in self._boundaryRegions[chr]:
+                if region.genome not in genomeMasks:
+                    genomeMasks[region.genome] = getGenomeMask(columns, region.genome, self.getGenome)
+                keep |= chrRows & genomeMasks[region.genome] & (starts >= region.start) & (ends <= region.end)
+        return selectRows(columns, keep)
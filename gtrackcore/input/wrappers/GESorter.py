@@ -1,31 +1,57 @@
+import cPickle
 from copy import copy
 
+import numpy
+
+from gtrackcore.core.Config import Config
 from gtrackcore.input.wrappers.GESourceWrapper import GESourceWrapper
+from gtrackcore.util.pytables.Constants import ITERATION_BLOCK_SIZE
+from gtrackcore.util.pytables.ExternalSorter import ExternalSorter
 
 class GESorter(GESourceWrapper):
+    # Elements are sorted as pickled strings by an ExternalSorter, which spills to disk if the
+    # elements do not fit in Config.SORT_BUFFER_SIZE bytes
+    _SORT_KEYS = ['genome', 'chr', 'start', 'end']
+    _SORT_DTYPE = numpy.dtype([(key, object) for key in _SORT_KEYS] + [('element', object)])
+
     def __init__(self, geSource):
         GESourceWrapper.__init__(self, geSource)
         self._geIter = None
         self._sortedElements = None
-        
+
     def __iter__(self):
         if True in [attrs in self._geSource.getPrefixList() for attrs in ['start', 'end']]:
             if self._sortedElements is None:
-                #self._sortedElements = [deepcopy(el) for el in self._geSource]
-                self._sortedElements = [el.getCopy() for el in self._geSource]
-                self._sortedElements.sort(key=lambda el: [el.genome, el.chr, el.start, el.end])
-                
-            self._geIter = self._sortedElements.__iter__()
+                self._sortedElements = self._sortElements()
+
+            self._geIter = self._iterSortedElements()
             return copy(self)
         else:
-            return self._geSource.__iter__()        
-    
+            return self._geSource.__iter__()
+
+    def _sortElements(self):
+        sorter = ExternalSorter(self._SORT_DTYPE, self._SORT_KEYS, Config.SORT_BUFFER_SIZE)
+        records = []
+        for el in self._geSource:
+            records.append((el.genome, el.chr, el.start, el.end, cPickle.dumps(el, cPickle.HIGHEST_PROTOCOL)))
+            if len(records) == ITERATION_BLOCK_SIZE:
+                sorter.add(numpy.array(records, dtype=self._SORT_DTYPE))
+                records = []
+        if len(records) > 0:
+            sorter.add(numpy.array(records, dtype=self._SORT_DTYPE))
+        return sorter
+
+    def _iterSortedElements(self):
+        for records in self._sortedElements:
+            for pickledEl in records['element']:
+                yield cPickle.loads(pickledEl)
+
     def next(self):
         el = self._geIter.next()
         return el
-        
+
     def __len__(self):
         if self._sortedElements is None:
             return sum(1 for el in self)
         else:
-            return len(self._sortedElements)
\ No newline at end of file
+            return len(self._sortedElements)
@@ -1,8 +1,12 @@
 from gtrackcore.util.CustomExceptions import InvalidFormatError, ShouldNotOccurError, AbstractClassError
+from gtrackcore.input.core.ColumnBatches import nextColumnBatchOfElements, iterColumnBatches
 from gtrackcore.input.core.GenomeElementSource import GenomeElementSource
 from copy import copy
 
 class GESourceWrapper(object):
+    # Whether the wrapper handles column batches with vectorized code (see ColumnBatches)
+    _supportsColumnBatches = False
+
     def __init__(self, geSource):
         self._geSource = geSource
         
@@ -32,6 +36,16 @@ class GESourceWrapper(object):
         
     def isSliceSource(self):
         return self._geSource.isSliceSource()
+
+    def hasColumnBatches(self):
+        return self._supportsColumnBatches and self._geSource.hasColumnBatches()
+
+    def nextColumnBatch(self):
+        # Wrappers without vectorized code collect their elements into column batches
+        return nextColumnBatchOfElements(self)
+
+    def iterColumnBatches(self):
+        return iterColumnBatches(self)
         
     def addsStartElementToDenseIntervals(self):
         return self._geSource.addsStartElementToDenseIntervals()
@@ -108,6 +122,8 @@ class GESourceWrapper(object):
     genome = property(getGenome)
 
 class BrTuplesGESourceWrapper(GESourceWrapper):
+    _supportsColumnBatches = True
+
     def __init__(self, geSource, brList=[]):
         GESourceWrapper.__init__(self, geSource)
         self._brList = brList
@@ -0,0 +1,71 @@
+import hashlib
+import os
+from collections import namedtuple
+from functools import partial
+
+from gtrackcore.core.Config import Config
+
+HASH_METHODS = ['full', 'sampled']
+SAMPLE_BLOCK_SIZE = 64 * 1024
+SAMPLE_BLOCK_COUNT = 16
+READ_BLOCK_SIZE = 1024 * 1024
+
+ManifestEntry = namedtuple('ManifestEntry', ['size', 'mtime', 'hashMethod', 'contentHash'])
+
+
+class OrigFileManifest(object):
+    '''
+    Content hashes of the original files of a track, which let preprocessing be skipped for tracks
+    whose files have been touched, copied or synced without changing their content. The entries
+    are stored in the origFileManifest attribute of TrackInfo. A file is only hashed again if its
+    size or modification time differs from its entry.
+
+    The hash method is set by Config.ORIG_FILE_HASH_METHOD: 'full' (the default) hashes the whole
+    file, while 'sampled' hashes the file size and SAMPLE_BLOCK_COUNT blocks spread evenly over the
+    file. Files of at most SAMPLE_BLOCK_COUNT blocks are hashed in full by both methods. The sampled
+    hash does not change by edits that keep the file size and lie outside the sampled blocks, so
+    such edits leave the track unchanged. It should only be used for files that are not edited in
+    place.
+    '''
+
+    def __init__(self, entries=None):
+        self._entries = dict((fn, ManifestEntry(*entry)) for fn, entry in entries.iteritems()) \
+            if entries is not None else {}
+
+    def getEntries(self):
+        # as plain tuples, so that the entries can be stored in TrackInfo without this module
+        return dict((fn, tuple(entry)) for fn, entry in self._entries.iteritems())
+
+    def getContentHashes(self, dirPath, fileList):
+        '''
+        Returns (filename, content hash) tuples for the files in fileList, updating the entries of
+        the manifest to hold exactly these files.
+        '''
+        hashMethod = Config.ORIG_FILE_HASH_METHOD
+        assert hashMethod in HASH_METHODS, 'Error: unknown hash method for original files: ' + hashMethod
+
+        entries = {}
+        for fn in fileList:
+            stat = os.stat(os.sep.join([dirPath, fn]))
+            entry = self._entries.get(fn)
+            if entry is None or \
+                    (entry.size, entry.mtime, entry.hashMethod) != (stat.st_size, stat.st_mtime, hashMethod):
+                entry = ManifestEntry(stat.st_size, stat.st_mtime, hashMethod,
+                                      hashFileContent(os.sep.join([dirPath, fn]), stat.st_size, hashMethod))
+            entries[fn] = entry
+
+        self._entries = entries
+        return tuple([(fn, entries[fn].contentHash) for fn in fileList])
+
+
+def hashFileContent(fn, size, hashMethod):
+    contentHash = hashlib.md5(str(size))
+    with open(fn, 'rb') as origFile:
+        if hashMethod == 'full' or size <= SAMPLE_BLOCK_SIZE * SAMPLE_BLOCK_COUNT:
+            for block in iter(partial(origFile.read, READ_BLOCK_SIZE), ''):
+                contentHash.update(block)
+        else:
+            for i in xrange(SAMPLE_BLOCK_COUNT):
+                origFile.seek((size - SAMPLE_BLOCK_SIZE) * i // (SAMPLE_BLOCK_COUNT - 1))
+                contentHash.update(origFile.read(SAMPLE_BLOCK_SIZE))
+    return contentHash.hexdigest()
@@ -7,6 +7,7 @@ from collections import namedtuple
 import gtrackcore.third_party.safeshelve as safeshelve
 
 from gtrackcore.core.Config import Config
+from gtrackcore.metadata.OrigFileManifest import OrigFileManifest
 from gtrackcore.track.format.TrackFormat import TrackFormatReq
 from gtrackcore.util.CommonFunctions import strWithStdFormatting, createPath
 from gtrackcore.util.CustomExceptions import ShouldNotOccurError, DBNotExistError
@@ -123,6 +124,8 @@ class TrackInfo(object):
         self.numEdgeWeightCategories = None
         self.timeOfPreProcessing = None
         self.preProcVersion = ''
+        self.storagePolicy = None
+        self.origFileManifest = None
 
         self.__dict__.update(existingAttrs)
 
@@ -262,7 +265,12 @@ class TrackInfo(object):
         self.lastUpdatedBy = username
 
     @staticmethod
-    def constructIdFromPath(genome, origPath, geSourceVersion, preProcVersion):
+    def constructIdFromPath(genome, origPath, geSourceVersion, preProcVersion, manifest=None, useModificationTimes=False):
+        '''
+        Constructs the id from the content hashes of the original files, as found by manifest, which
+        is updated. If useModificationTimes, the id is instead constructed from the modification
+        times of the files, as before the content hashes were introduced.
+        '''
         if os.path.isdir(origPath):
             fileList = sorted([fn for fn in os.listdir(origPath) if os.path.isfile(origPath+os.sep+fn) and fn[0]!='.'])
         elif os.path.isfile(origPath):
@@ -271,7 +279,12 @@ class TrackInfo(object):
         else:
             raise ShouldNotOccurError
         
-        fileInfo = tuple([ (fn, os.stat(os.sep.join([origPath, fn])).st_mtime ) for fn in fileList ])
+        if useModificationTimes:
+            fileInfo = tuple([ (fn, os.stat(os.sep.join([origPath, fn])).st_mtime ) for fn in fileList ])
+        else:
+            if manifest is None:
+                manifest = OrigFileManifest()
+            fileInfo = manifest.getContentHashes(origPath, fileList)
         return hash( (hash(fileInfo), geSourceVersion, preProcVersion) )
 
     @staticmethod
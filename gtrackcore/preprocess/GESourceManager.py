@@ -1,6 +1,9 @@
 from collections import defaultdict
 from functools import partial
 
+import numpy
+
+from gtrackcore.core.Config import Config
 from gtrackcore.input.core.GenomeElementSource import BoundingRegionTuple
 from gtrackcore.input.adapters.TrackGenomeElementSource import TrackGenomeElementSource
 from gtrackcore.input.wrappers.GESourceWrapper import BrTuplesGESourceWrapper
@@ -11,6 +14,7 @@ from gtrackcore.track.format.TrackFormat import TrackFormat
 from gtrackcore.util.CommonFunctions import flatten
 from gtrackcore.util.CommonConstants import RESERVED_PREFIXES
 from gtrackcore.util.CommonClasses import OrderedDefaultDict
+from gtrackcore.util.pytables.NumpyFunctions import split_columns_by_chr
 
 
 class GESourceManager(object):
@@ -51,42 +55,105 @@ class GESourceManager(object):
             prevPrintWarnings = self._geSource.getPrintWarnings()
             self._geSource.setPrintWarnings(False)
 
-            if self._geSource.isSliceSource():
-                if len(self._getMaxStrLensKeys()):
-                    raise NotImplementedError('Dimension calculation not yet implemented for slice-based GenomeElementSources.')
+            for el in self.iterElementsAndCalcStatistics():
+                pass
 
-                prefixList = self._geSource.getPrefixList()
-                for el in self._geSource:
-                    chr = el.chr
-                    self._numElements[chr] += len(getattr(el, prefixList[0]))
-            else:
-                for el in self._geSource:
-                    chr = el.chr
-                    self._numElements[chr] += 1
+            self._geSource.setPrintWarnings(prevPrintWarnings)
 
-                    if el.isBlankElement:
-                        continue
+    def iterElementsAndCalcStatistics(self):
+        '''
+        Iterates over the elements of the geSource, calculating the statistics on the way. This lets
+        the elements be written in the same pass as the statistics are calculated, instead of in a
+        second pass. If the statistics have already been calculated, the elements are just iterated.
+        '''
+        if self._hasCalculatedStats:
+            for el in self._geSource:
+                yield el
+            return
+
+        if self._geSource.isSliceSource():
+            if len(self._getMaxStrLensKeys()):
+                raise NotImplementedError('Dimension calculation not yet implemented for slice-based GenomeElementSources.')
+
+            prefixList = self._geSource.getPrefixList()
+            for el in self._geSource:
+                self._numElements[el.chr] += len(getattr(el, prefixList[0]))
+                yield el
+        else:
+            for el in self._geSource:
+                self._updateStatistics(el)
+                yield el
 
-                    if self._areValsCategorical:
-                        self._valCategories.add(el.val)
+        self._hasCalculatedStats = True
 
-                    if self._areEdgeWeightsCategorical:
-                        self._edgeWeightCategories |= set(el.weights)
+    def hasColumnBatches(self):
+        return self._geSource.hasColumnBatches()
 
-                    for prefix in self._maxStrLens[chr]:
-                        content = getattr(el, prefix, None)
+    def shouldIterColumnBatches(self):
+        return Config.COLUMN_BATCH_PARSING and self.hasColumnBatches()
 
-                        if content is not None:
-                            self._maxStrLens[chr][prefix] = \
-                                    max( self._maxStrLens[chr][prefix], \
-                                         max(1, len(content)) if isinstance(content, basestring) else \
-                                            max([1] + [len(x) for x in flatten(content)]) )
+    def iterColumnBatchesAndCalcStatistics(self):
+        '''
+        As iterElementsAndCalcStatistics, but iterates over blocks of elements given as dicts of
+        column arrays. Only for GenomeElementSources with column batches.
+        '''
+        calcStatistics = not self._hasCalculatedStats
+        for columns in self._geSource.iterColumnBatches():
+            if calcStatistics:
+                for chr, chrColumns in split_columns_by_chr(columns):
+                    self.updateStatisticsFromColumns(chr, chrColumns)
+            yield columns
 
-                            if prefix == 'edges':
-                                self._maxNumEdges[chr] = max(self._maxNumEdges[chr], len(el.edges))
+        self._hasCalculatedStats = True
 
-            self._geSource.setPrintWarnings(prevPrintWarnings)
-            self._hasCalculatedStats = True
+    def _updateStatistics(self, el):
+        chr = el.chr
+        self._numElements[chr] += 1
+
+        if el.isBlankElement:
+            return
+
+        if self._areValsCategorical:
+            self._valCategories.add(el.val)
+
+        if self._areEdgeWeightsCategorical:
+            self._edgeWeightCategories |= set(el.weights)
+
+        for prefix in self._maxStrLens[chr]:
+            content = getattr(el, prefix, None)
+
+            if content is not None:
+                self._maxStrLens[chr][prefix] = \
+                        max( self._maxStrLens[chr][prefix], \
+                             max(1, len(content)) if isinstance(content, basestring) else \
+                                max([1] + [len(x) for x in flatten(content)]) )
+
+                if prefix == 'edges':
+                    self._maxNumEdges[chr] = max(self._maxNumEdges[chr], len(el.edges))
+
+    def updateStatisticsFromColumns(self, chr, columns):
+        '''
+        Updates the statistics with rows of chromosome chr, given as a dict of column arrays, e.g.
+        rows of a preprocessed track or a column batch of a GenomeElementSource. This lets elements
+        be appended to a preprocessed track without iterating over the elements already in the track.
+        '''
+        maxStrLens = self._maxStrLens[chr]
+        numRows = len(columns['start'] if 'start' in columns else columns.values()[0])
+        self._numElements[chr] += numRows
+        if numRows == 0:
+            return
+
+        if self._areValsCategorical:
+            self._valCategories.update(numpy.unique(columns['val']).tolist())
+
+        if self._areEdgeWeightsCategorical:
+            self._edgeWeightCategories.update(numpy.unique(columns['weights'][columns['edges'] != '']).tolist())
+
+        for prefix in maxStrLens:
+            maxStrLens[prefix] = max(maxStrLens[prefix], 1, int(numpy.char.str_len(columns[prefix]).max()))
+
+        if 'edges' in maxStrLens:
+            self._maxNumEdges[chr] = max(self._maxNumEdges[chr], int((columns['edges'] != '').sum(axis=1).max()))
 
     def getGESource(self):
         return self._geSource
@@ -220,6 +287,12 @@ class OverlapClusteringGESourceManager(GESourceManager):
         return GEBoundingRegionElementCounter(GEOverlapClusterer(geSource), \
                                               self._origBrTuples)
 
+    def shouldIterColumnBatches(self):
+        # The with overlaps rows are then clustered block by block from the column arrays of the track.
+        # The statistics of column batches need the links as padded arrays, which are not kept.
+        return Config.NO_OVERLAPS_FROM_COLUMN_ARRAYS and self.hasColumnBatches() and \
+            'edges' not in self.getPrefixList()
+
 
 class RegionBasedGESourceManager(GESourceManager):
     def __init__(self, geSource, brRegionList, calcStatsInExtraPass, countElsInBoundingRegions):
@@ -242,6 +315,14 @@ class RegionBasedGESourceManager(GESourceManager):
             if self._calcStatsInExtraPass:
                 GESourceManager._calcStatisticsInExtraPass(self)
             else:
-                for br in self._brRegionList:
-                    self._numElements[br.chr] += len(br)
-                self._hasCalculatedStats = True
+                self._calcStatisticsFromBoundingRegions()
+
+    def iterElementsAndCalcStatistics(self):
+        if not self._calcStatsInExtraPass and not self._hasCalculatedStats:
+            self._calcStatisticsFromBoundingRegions()
+        return GESourceManager.iterElementsAndCalcStatistics(self)
+
+    def _calcStatisticsFromBoundingRegions(self):
+        for br in self._brRegionList:
+            self._numElements[br.chr] += len(br)
+        self._hasCalculatedStats = True
@@ -3,6 +3,7 @@ import datetime
 from collections import defaultdict, OrderedDict
 
 from gtrackcore.track.format.TrackFormat import TrackFormat
+from gtrackcore.metadata.OrigFileManifest import OrigFileManifest
 from gtrackcore.metadata.TrackInfo import constructKey, TrackInfo
 from gtrackcore.util.CustomDecorators import timeit
 
@@ -41,6 +42,7 @@ class PreProcMetaDataCollector(object):
         self._undirectedEdges = None
         self._preProcVersion = ''
         self._id = None
+        self._origFileManifest = None
         
         self._numElements = defaultdict(int)
         self._boundingRegionTuples = defaultdict(list)
@@ -160,6 +162,12 @@ class PreProcMetaDataCollector(object):
         
     def getId(self):
         return self._id
+
+    def getOrigFileManifest(self):
+        # The stored manifest lets unchanged files be skipped when hashing
+        if self._origFileManifest is None:
+            self._origFileManifest = OrigFileManifest(TrackInfo(self._genome, self._trackName).origFileManifest)
+        return self._origFileManifest
                 
     def finalize(self, username, printMsg):
         ti = TrackInfo(self._genome, self._trackName)
@@ -189,6 +197,8 @@ class PreProcMetaDataCollector(object):
             ti.numEdgeWeightCategories = len(self._edgeWeightCategories[True])
         
         ti.id = self._id
+        if self._origFileManifest is not None:
+            ti.origFileManifest = self._origFileManifest.getEntries()
         ti.timeOfPreProcessing = datetime.datetime.now()
     
         ti.lastUpdatedBy = username
@@ -1,6 +1,13 @@
+import os
+
+from gtrackcore.core.Config import Config
 from gtrackcore.preprocess.PreProcMetaDataCollector import PreProcMetaDataCollector
 from gtrackcore.preprocess.PreProcessUtils import PreProcessUtils
+from gtrackcore.preprocess.pytables.ChromosomeShards import ChromosomeShards
+from gtrackcore.preprocess.pytables.ColumnSpill import ColumnSpill
 from gtrackcore.preprocess.pytables.OutputManager import OutputManager
+from gtrackcore.track.format.TrackFormat import TrackFormat
+from gtrackcore.util.pytables.NameFunctions import get_database_filename
 
 
 class PreProcessGeSourceJob(object):
@@ -21,38 +28,127 @@ class PreProcessGeSourceJob(object):
 
     def _createPreProcFiles(self):
         geSource = self._geSourceManager.getGESource()
+
+        if self._mode == 'Real' and self._shouldShardByChr(geSource):
+            shards = self._shardElementsAndCalcStatistics(geSource)
+            try:
+                self._createPreProcFilesFromShards(geSource, shards)
+            finally:
+                shards.remove()
+        elif self._mode == 'Real' and (Config.SINGLE_PASS_PREPROCESSING or self._shouldParseColumnBatches()):
+            spill = self._spillElementsAndCalcStatistics(geSource)
+            try:
+                self._createPreProcFilesFromSpill(geSource, spill)
+            finally:
+                spill.remove()
+        else:
+            self._createPreProcFilesInTwoPasses(geSource)
+
+    def _createPreProcFilesInTwoPasses(self, geSource):
         genome = geSource.genome
+
+        collector = self._updateMetaDataForFinalization(geSource)
+
+        if self._geSourceManager.getNumElements() == 0:
+            return
+        
+        if self._mode != 'Real':
+            for ge in geSource:
+                pass
+            return
         
-        collector = PreProcMetaDataCollector(genome, self._trackName)
+        with OutputManager(genome, self._trackName, self._allowOverlaps, self._geSourceManager,
+                           collector.getTrackFormat()) as output:
+            writeFunc = output.writeRawSlice if geSource.isSliceSource() else output.writeElement
+
+            for ge in geSource:
+                writeFunc(ge)
+
+            collector.flagChrsAsPreProcessed(self._allowOverlaps, self._geSourceManager.getAllChrs())
+
+    def _updateMetaDataForFinalization(self, geSource):
+        collector = PreProcMetaDataCollector(geSource.genome, self._trackName)
         collector.updateMetaDataForFinalization(geSource.getFileSuffix(), geSource.getPrefixList(),
                                                 geSource.getValDataType(), geSource.getValDim(),
                                                 geSource.getEdgeWeightDataType(), geSource.getEdgeWeightDim(),
                                                 geSource.hasUndirectedEdges(),
-                                                geSource.getVersion(), PreProcessUtils.constructId(geSource),
+                                                geSource.getVersion(),
+                                                PreProcessUtils.constructId(geSource, collector.getOrigFileManifest()),
                                                 self._geSourceManager.getNumElements(),
                                                 self._geSourceManager.getBoundingRegionTuples(),
                                                 self._geSourceManager.getValCategories(),
                                                 self._geSourceManager.getEdgeWeightCategories(),
                                                 self._allowOverlaps)
+        return collector
+
+    def _getSpillColumnNames(self, geSource):
+        columns = set(geSource.getPrefixList()) - set(['orderedExtraKeys', 'genome'])
+        if not TrackFormat.createInstanceFromGeSource(geSource).reprIsDense():
+            columns.add('chr')
+        return sorted(columns)
+
+    def _getTrackDirPath(self, geSource):
+        return os.path.dirname(get_database_filename(geSource.genome, self._trackName,
+                                                     allow_overlaps=self._allowOverlaps, create_path=True))
+
+    def _shouldParseColumnBatches(self):
+        return self._geSourceManager.shouldIterColumnBatches()
+
+    def _spillElementsAndCalcStatistics(self, geSource):
+        spill = ColumnSpill(self._getSpillColumnNames(geSource), self._getTrackDirPath(geSource))
+
+        if self._shouldParseColumnBatches():
+            for columns in self._geSourceManager.iterColumnBatchesAndCalcStatistics():
+                spill.append_columns(columns)
+        else:
+            appendFunc = spill.append_slice if geSource.isSliceSource() else spill.append_element
+            for ge in self._geSourceManager.iterElementsAndCalcStatistics():
+                appendFunc(ge)
+
+        return spill
+
+    def _createPreProcFilesFromSpill(self, geSource, spill):
+        collector = self._updateMetaDataForFinalization(geSource)
 
         if self._geSourceManager.getNumElements() == 0:
             return
-        
-        if self._mode != 'Real':
-            for ge in geSource:
-                pass
+
+        with OutputManager(geSource.genome, self._trackName, self._allowOverlaps, self._geSourceManager,
+                           collector.getTrackFormat()) as output:
+            for columns in spill.iter_blocks():
+                output.writeColumns(columns)
+
+            collector.flagChrsAsPreProcessed(self._allowOverlaps, self._geSourceManager.getAllChrs())
+
+    def _shouldShardByChr(self, geSource):
+        # Dense tracks have no chr column, and slice sources already give the elements in blocks
+        return Config.CHROMOSOME_SHARD_WORKERS > 1 and not geSource.isSliceSource() and \
+            not TrackFormat.createInstanceFromGeSource(geSource).reprIsDense()
+
+    def _shardElementsAndCalcStatistics(self, geSource):
+        shards = ChromosomeShards(self._getSpillColumnNames(geSource), self._getTrackDirPath(geSource))
+
+        if self._shouldParseColumnBatches():
+            for columns in self._geSourceManager.iterColumnBatchesAndCalcStatistics():
+                shards.append_columns(columns)
+        else:
+            for ge in self._geSourceManager.iterElementsAndCalcStatistics():
+                shards.append_element(ge)
+
+        return shards
+
+    def _createPreProcFilesFromShards(self, geSource, shards):
+        collector = self._updateMetaDataForFinalization(geSource)
+
+        if self._geSourceManager.getNumElements() == 0:
             return
-        
-        output = OutputManager(genome, self._trackName, self._allowOverlaps, self._geSourceManager, collector.getTrackFormat())
-        
-        writeFunc = output.writeRawSlice if geSource.isSliceSource() else output.writeElement
-        
-        for ge in geSource:
-            writeFunc(ge)
-        
-        collector.flagChrsAsPreProcessed(self._allowOverlaps, self._geSourceManager.getAllChrs())
-        
-        output.close()
+
+        with OutputManager(geSource.genome, self._trackName, self._allowOverlaps, self._geSourceManager,
+                           collector.getTrackFormat()) as output:
+            shards.write_shards(output.getRowDtype(), output.getColumnDefaults(), Config.CHROMOSOME_SHARD_WORKERS)
+            shards.merge_shards(output)
+
+            collector.flagChrsAsPreProcessed(self._allowOverlaps, self._geSourceManager.getAllChrs())
 
     def hasModifiedData(self):
         return self._dirty
@@ -1,14 +1,19 @@
 #!/usr/bin/env python
 
+import errno
+import multiprocessing
 import os
+import shutil
 import sys
 import traceback
 #import pyximport; pyximport.install()
 
 import gtrackcore
+from gtrackcore.core.Config import Config
 from gtrackcore.input.core.ToolGenomeElementSource import ToolGenomeElementSource
 
-from gtrackcore.input.core.GenomeElementSource import GenomeElementSource
+from gtrackcore.input.core.GenomeElementSource import GenomeElementSource, BoundingRegionTuple
+from gtrackcore.metadata.GenomeInfo import GenomeInfo
 from gtrackcore.metadata.TrackInfo import DynamicTrackInfo, TrackInfo
 from gtrackcore.preprocess.GESourceManager import GESourceManager, OverlapClusteringGESourceManager, RegionBasedGESourceManager
 from gtrackcore.preprocess.PreProcessGeSourceJob import PreProcessGeSourceJob
@@ -19,12 +24,16 @@ from gtrackcore.track.hierarchy.ExternalTrackManager import ExternalTrackManager
 from gtrackcore.track.hierarchy.ProcTrackOptions import ProcTrackOptions
 from gtrackcore.track.hierarchy.RenameTrack import renameTrack
 from gtrackcore.track.hierarchy.OrigTrackFnSource import OrigTrackNameSource
+from gtrackcore.track.pytables.database.Database import DatabaseReader
 from gtrackcore.track.pytables.database.MetadataHandler import MetadataHandler
-from gtrackcore.preprocess.pytables.CommonTableFunctions import merge_and_rename_overlap_tables, create_c_arrays_from_table, sort_preprocessed_table
+from gtrackcore.preprocess.pytables.TrackAppender import TrackAppender
+from gtrackcore.preprocess.pytables.CommonTableFunctions import merge_and_rename_overlap_tables, create_c_arrays_from_table, sort_preprocessed_table, \
+                                                                sort_preprocessed_table_into_c_arrays
 from gtrackcore.util.CommonFunctions import createOrigPath, get_dir_path, prettyPrintTrackName, \
                                         reorderTrackNameListFromTopDownToBottomUp, \
                                         replaceIllegalElementsInTrackNames
-from gtrackcore.util.CustomExceptions import NotSupportedError, AbstractClassError, Warning
+from gtrackcore.util.CustomExceptions import NotSupportedError, AbstractClassError, Warning, InvalidFormatError
+from gtrackcore.util.pytables.StoragePolicy import get_storage_policy
 from gtrackcore.track.core.GenomeRegion import  GenomeRegion
 
 
@@ -33,6 +42,10 @@ class PreProcessTracksJob(object):
 
     PASS_ON_EXCEPTIONS = False
 
+    # File access errors that may be transient, such as locks held by other processes, are retried
+    # Config.PREPROCESSING_RETRIES times. Other errors, e.g. missing files or denied permissions, are not.
+    RETRYABLE_ERRNOS = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR, errno.EBUSY, errno.ENOLCK, errno.EDEADLK)
+
     def __init__(self, genome, username='', mode='Real', raiseIfAnyWarnings=False):
         self._genome = genome
         self._username = username
@@ -47,78 +60,21 @@ class PreProcessTracksJob(object):
         gtrackcore.preprocess.is_preprocessing = True
 
         atLeastOneFinalized = False
-        for trackName in self._allTrackNames():
-            assert trackName != ['']
-            overlapRulesProcessedForTrackName = []
-            collector = PreProcMetaDataCollector(self._genome, trackName)
+        for result in self._preProcessAllTracks():
+            if result.exceptionMsg:
+                print result.exceptionMsg
 
-            try:
-                trackName = self._renameTrackNameIfIllegal(trackName)
-
-                for allowOverlaps in [True, False]:
-
-                    anyGeSourceManagers = False
-                    for geSourceManager in self._allGESourceManagers(trackName, allowOverlaps):
-                        anyGeSourceManagers = True
-
-                        # PreProcess if needed
-                        if self._shouldPreProcess():
-                            PreProcessUtils.removeOutdatedPreProcessedFiles(self._genome, trackName, allowOverlaps, self._mode)
-
-                            if self._shouldPrintProcessMessages() and allowOverlaps not in overlapRulesProcessedForTrackName:
-                                self._printProcessTrackMessage(trackName, allowOverlaps)
-                                overlapRulesProcessedForTrackName.append(allowOverlaps)
-
-                            self._status = 'Trying to preprocess geSource...'
-                            geSourceJob = PreProcessGeSourceJob(trackName, geSourceManager, allowOverlaps, self._mode)
-                            anyWarnings = geSourceJob.process()
-
-                            if self._raiseIfAnyWarnings and anyWarnings and trackName not in self._warningTrackNames:
-                                self._warningTrackNames.append(trackName)
-
-                            collector.updatePreProcDirtyStatus(geSourceJob.hasModifiedData())
-
-                    # Finalize overlapRule output if needed
-                    if anyGeSourceManagers and self._shouldFinalize() and collector.preProcIsDirty():
-                        if self._mode == 'Real' and self._shouldMergeChrFolders():
-                            sort_preprocessed_table(self._genome, trackName, allowOverlaps)
-                            PreProcessUtils.create_bounding_regions(self._genome, trackName, allowOverlaps)
-
-                            print '\tCreating c-arrays from table columns'
-                            create_c_arrays_from_table(self._genome, trackName, allowOverlaps)
-
-                        self._status = 'Trying to check whether 3D data is correct'
-                        PreProcessUtils.checkIfEdgeIdsExist(self._genome, trackName, allowOverlaps)
-                        PreProcessUtils.checkUndirectedEdges(self._genome, trackName, allowOverlaps)
-                        PreProcessUtils.checkUndirectedEdges(self._genome, trackName, allowOverlaps)
-                        collector.markOverlapRuleAsFinalized(allowOverlaps)
-
-                # Finalize track if needed
-                if self._shouldFinalize():
-                    if collector.preProcIsDirty():
-                        self._status = 'Trying to finalize.'
-                        collector.finalize(self._username, self._shouldPrintProcessMessages())
-                        if not atLeastOneFinalized:
-                            atLeastOneFinalized = True
-                        merge_and_rename_overlap_tables(self._genome, trackName)
-                        self._persist_metadata(trackName)
-                else:
-                        collector.removeEntry()
+            if result.isFinalized:
+                atLeastOneFinalized = True
 
-            except NotSupportedError, e:
-                collector.removeEntry()
-                if self.PASS_ON_EXCEPTIONS:
-                    raise
-                else:
-                    self._printExceptionMsg(e, trackName, Error=False)
-            except Exception, e:
-                collector.removeEntry()
-                if self.PASS_ON_EXCEPTIONS:
-                    raise
-                else:
-                    self._printExceptionMsg(e, trackName, Error=True)
+            if self._raiseIfAnyWarnings and result.anyWarnings and result.trackName not in self._warningTrackNames:
+                self._warningTrackNames.append(result.trackName)
 
-            self._calcAndStoreSubTrackCount(trackName)
+            self._calcAndStoreSubTrackCount(result.trackName)
+            if result.isFinalized:
+                # after the sub track count is stored, so that the persisted TrackInfo does not depend
+                # on whether the track has been preprocessed before
+                self._persist_metadata(result.trackName)
 
         if self._raiseIfAnyWarnings and len(self._warningTrackNames) > 0:
             raise Warning('Warnings occurred in the following tracks: ' + \
@@ -128,6 +84,147 @@ class PreProcessTracksJob(object):
 
         return atLeastOneFinalized
 
+    def _preProcessAllTracks(self):
+        numWorkers = self._getNumWorkers()
+        if numWorkers <= 1:
+            for trackName in self._allTrackNames():
+                yield self._preProcessTrackWithRetries(trackName, self.PASS_ON_EXCEPTIONS)
+        else:
+            for result in self._preProcessTracksInParallel(self._allTrackNames(), numWorkers):
+                yield result
+
+    def _preProcessTracksInParallel(self, trackNames, numWorkers):
+        # Each track is preprocessed in a fresh worker process. The tracks do not share any files, and
+        # the TrackInfo shelve is locked by safeshelve. Results are returned in the order of the track
+        # names, so that subtracks are counted after they are finished. Files kept open by this process
+        # are closed first, so that their locks are not inherited by the workers.
+        DatabaseReader.close_unused_files()
+
+        pool = multiprocessing.Pool(numWorkers, maxtasksperchild=1)
+        try:
+            for result in pool.imap(_preProcessTrackInWorker, [(self, trackName) for trackName in trackNames]):
+                if result.exception is not None and self.PASS_ON_EXCEPTIONS:
+                    raise self._addWorkerTraceback(result.exception, result.traceback)
+                yield result
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    @staticmethod
+    def _addWorkerTraceback(e, workerTraceback):
+        # The traceback is lost when the exception is passed from the worker process, and is instead
+        # added to the message of the exception
+        msg = os.linesep + 'Traceback of worker process:' + os.linesep + workerTraceback
+        if isinstance(e, EnvironmentError) and e.strerror is not None:
+            e.strerror += msg
+        elif len(e.args) <= 1 and all(isinstance(arg, basestring) for arg in e.args):
+            e.args = (''.join(e.args) + msg,)
+        return e
+
+    def _preProcessTrackWithRetries(self, trackName, passOnExceptions):
+        for attemptsLeft in reversed(xrange(Config.PREPROCESSING_RETRIES + 1)):
+            try:
+                return self._preProcessTrack(trackName)
+            except NotSupportedError, e:
+                if passOnExceptions:
+                    raise
+                return self._createFailedResult(e, trackName, Error=False)
+            except Exception, e:
+                if attemptsLeft == 0 or not self._isRetryable(e):
+                    if passOnExceptions:
+                        raise
+                    return self._createFailedResult(e, trackName, Error=True)
+                print "Retrying preprocessing of track '%s' after error: %s" % (':'.join(trackName), e)
+                self._removePartialPreProcessedFiles(trackName)
+
+    def _isRetryable(self, e):
+        return isinstance(e, EnvironmentError) and e.errno in self.RETRYABLE_ERRNOS
+
+    def _removePartialPreProcessedFiles(self, trackName):
+        if self._mode == 'Real':
+            PreProcessUtils.removePartialPreProcessedFiles(self._genome, self._getLegalTrackName(trackName))
+
+    def _preProcessTrack(self, trackName):
+        assert trackName != ['']
+        overlapRulesProcessedForTrackName = []
+        collector = PreProcMetaDataCollector(self._genome, trackName)
+        result = PreProcessTrackResult(trackName)
+
+        try:
+            trackName = result.trackName = self._renameTrackNameIfIllegal(trackName)
+
+            for allowOverlaps in [True, False]:
+
+                anyGeSourceManagers = False
+                for geSourceManager in self._allGESourceManagers(trackName, allowOverlaps):
+                    anyGeSourceManagers = True
+
+                    # PreProcess if needed
+                    if self._shouldPreProcess():
+                        PreProcessUtils.removeOutdatedPreProcessedFiles(self._genome, trackName, allowOverlaps, self._mode)
+
+                        if self._shouldPrintProcessMessages() and allowOverlaps not in overlapRulesProcessedForTrackName:
+                            self._printProcessTrackMessage(trackName, allowOverlaps)
+                            overlapRulesProcessedForTrackName.append(allowOverlaps)
+
+                        self._status = 'Trying to preprocess geSource...'
+                        geSourceJob = PreProcessGeSourceJob(trackName, geSourceManager, allowOverlaps, self._mode)
+                        if geSourceJob.process():
+                            result.anyWarnings = True
+
+                        collector.updatePreProcDirtyStatus(geSourceJob.hasModifiedData())
+
+                # Finalize overlapRule output if needed
+                if anyGeSourceManagers and self._shouldFinalize() and collector.preProcIsDirty():
+                    self._finalizeOverlapRule(trackName, allowOverlaps)
+
+            # Finalize track if needed
+            if self._shouldFinalize():
+                if collector.preProcIsDirty():
+                    self._status = 'Trying to finalize.'
+                    collector.finalize(self._username, self._shouldPrintProcessMessages())
+                    result.isFinalized = True
+                    merge_and_rename_overlap_tables(self._genome, trackName)
+            else:
+                    collector.removeEntry()
+
+        except Exception:
+            collector.removeEntry()
+            raise
+
+        return result
+
+    def _finalizeOverlapRule(self, trackName, allowOverlaps):
+        if self._mode == 'Real' and self._shouldMergeChrFolders():
+            if get_storage_policy(self._genome, trackName).columnar_only:
+                PreProcessUtils.create_bounding_regions(self._genome, trackName, allowOverlaps)
+
+                print '\tSorting table rows into c-arrays'
+                sort_preprocessed_table_into_c_arrays(self._genome, trackName, allowOverlaps)
+            else:
+                sort_preprocessed_table(self._genome, trackName, allowOverlaps)
+                PreProcessUtils.create_bounding_regions(self._genome, trackName, allowOverlaps)
+
+                print '\tCreating c-arrays from table columns'
+                create_c_arrays_from_table(self._genome, trackName, allowOverlaps)
+
+        self._status = 'Trying to check whether 3D data is correct'
+        PreProcessUtils.checkIfEdgeIdsExist(self._genome, trackName, allowOverlaps)
+        PreProcessUtils.checkUndirectedEdges(self._genome, trackName, allowOverlaps)
+        PreProcessUtils.checkUndirectedEdges(self._genome, trackName, allowOverlaps)
+        PreProcMetaDataCollector(self._genome, trackName).markOverlapRuleAsFinalized(allowOverlaps)
+
+    def _createFailedResult(self, e, trackName, Error=False):
+        # with the track name of the result of a successful run, which is renamed if illegal
+        trackName = self._getLegalTrackName(trackName)
+        return PreProcessTrackResult(trackName, exception=e,
+                                     exceptionMsg=self._getExceptionMsg(e, trackName, Error=Error),
+                                     traceback=traceback.format_exc())
+
+    def _getNumWorkers(self):
+        return 1
+
     def _persist_metadata(self, track_name):
         dynamic_trackinfo = DynamicTrackInfo(self._genome, track_name)
         metadata_handler = MetadataHandler(self._genome, track_name)
@@ -166,8 +263,12 @@ class PreProcessTracksJob(object):
                 self._status = 'Trying to prepare preprocessing for track "%s"' % ':'.join(trackNameList) + \
                                 (' (filename: "%s")' % geSource.getFileName() if geSource.hasOrigFile() else '') + \
                                 (' (allowOverlaps: %s)' % allowOverlaps)
-                if PreProcessUtils.shouldPreProcessGESource(trackNameList, geSource, allowOverlaps):
+                shouldPreProcess, updatedIdAndManifest = \
+                    PreProcessUtils.checkPreProcessedGESource(trackNameList, geSource, allowOverlaps)
+                if shouldPreProcess:
                     yield self._getGESourceManagerFromGESource(geSource)
+                elif updatedIdAndManifest is not None and self._mode == 'Real':
+                    PreProcessUtils.storeIdAndOrigFileManifest(self._genome, trackNameList, *updatedIdAndManifest)
 
     def _allGESources(self, trackName):
         raise AbstractClassError
@@ -191,8 +292,12 @@ class PreProcessTracksJob(object):
     def _shouldMergeChrFolders(self):
         return True
 
+    @staticmethod
+    def _getLegalTrackName(trackName):
+        return [replaceIllegalElementsInTrackNames(x) for x in trackName]
+
     def _renameTrackNameIfIllegal(self, trackName):
-        legalTrackName = [replaceIllegalElementsInTrackNames(x) for x in trackName]
+        legalTrackName = self._getLegalTrackName(trackName)
 
         if legalTrackName != trackName and os.path.exists(get_dir_path(self._genome, trackName)):
             renameTrack(self._genome, trackName, legalTrackName)
@@ -220,14 +325,31 @@ class PreProcessTracksJob(object):
         elif self._mode == 'Real':
             print "Processing track: '%s' with allowOverlaps: %s" % (':'.join(trackName), allowOverlaps)
 
-    def _printExceptionMsg(self, e, trackName, Error=False):
-        print (os.linesep + '--- BEGIN ERROR ---' + os.linesep *2 if Error else 'Warning! ') + \
-            "Could not pre-process track '%s'." % ':'.join(trackName)
-        print "Status: %s" % self._status
+    def _getExceptionMsg(self, e, trackName, Error=False):
+        msg = (os.linesep + '--- BEGIN ERROR ---' + os.linesep *2 if Error else 'Warning! ') + \
+            "Could not pre-process track '%s'." % ':'.join(trackName) + os.linesep
+        msg += "Status: %s" % self._status
         #print e.__class__.__name__ + ':', e
         if Error:
-            traceback.print_exc(file=sys.stdout)
-            print os.linesep + '--- END ERROR ---' + os.linesep
+            msg += os.linesep + traceback.format_exc()
+            msg += os.linesep + '--- END ERROR ---' + os.linesep
+        return msg
+
+
+class PreProcessTrackResult(object):
+    def __init__(self, trackName, isFinalized=False, anyWarnings=False, exception=None, exceptionMsg='', traceback=''):
+        self.trackName = trackName
+        self.isFinalized = isFinalized
+        self.anyWarnings = anyWarnings
+        self.exception = exception
+        self.exceptionMsg = exceptionMsg
+        self.traceback = traceback
+
+
+def _preProcessTrackInWorker(args):
+    job, trackName = args
+    return job._preProcessTrackWithRetries(trackName, passOnExceptions=False)
+
 
 class PreProcessAllTracksJob(PreProcessTracksJob):
     """ ??
@@ -244,6 +366,9 @@ class PreProcessAllTracksJob(PreProcessTracksJob):
         ??
     mergeChrFolders : bool
         ?! Specifies whether chromosome folders should be merged into one.
+    numWorkers : int
+        Number of worker processes preprocessing tracks in parallel. Defaults to
+        Config.PREPROCESSING_WORKERS.
 
     Attributes
     ----------
@@ -255,12 +380,13 @@ class PreProcessAllTracksJob(PreProcessTracksJob):
 
     """
 
-    def __init__(self, genome, trackNameFilter=[], username='', mergeChrFolders=True, **kwArgs):
+    def __init__(self, genome, trackNameFilter=[], username='', mergeChrFolders=True, numWorkers=None, **kwArgs):
         PreProcessTracksJob.__init__(self, genome, username=username, **kwArgs)
         if trackNameFilter == ['']:
             trackNameFilter = []
         self._trackNameFilter = trackNameFilter
         self._mergeChrFolders = mergeChrFolders
+        self._numWorkers = numWorkers
 
     def _allTrackNames(self):
         #avoidLiterature = len(self._trackNameFilter) == 0 or (self._trackNameFilter != GenomeInfo.getLiteratureTrackName(self._genome))
@@ -300,6 +426,175 @@ class PreProcessAllTracksJob(PreProcessTracksJob):
     def _shouldMergeChrFolders(self):
         return self._mergeChrFolders
 
+    def _getNumWorkers(self):
+        return self._numWorkers if self._numWorkers is not None else Config.PREPROCESSING_WORKERS
+
+
+class PreProcessAppendToTrackJob(PreProcessAllTracksJob):
+    """
+    Appends the genome elements of a delta file to a preprocessed track, e.g. new records or new
+    chromosomes of a growing track. The delta file is appended to the original file of the track,
+    and must be in the same format. Header lines of the delta file must be the same as those of
+    the original file, and are not appended. The preprocessed track is then updated by a
+    TrackAppender, giving the same track as preprocessing the combined file from scratch, but only
+    merging and clustering the chromosomes with new elements. The bounding regions and metadata are
+    found from the statistics of the existing rows and the new elements.
+
+    Tracks that cannot be updated in this way are preprocessed from scratch: dense tracks, tracks
+    with bounding regions and tracks that are not up to date with their original files. If the
+    track has several original files, the delta file is added as a new file.
+
+    The delta file is appended to the original file in place. If preprocessing fails, the original
+    file is truncated to its previous size, and its modification time is restored.
+    """
+
+    def __init__(self, genome, trackName, deltaFn, username='', **kwArgs):
+        PreProcessAllTracksJob.__init__(self, genome, trackName, username=username, numWorkers=1, **kwArgs)
+        self._deltaFn = deltaFn
+        self._canAppend = False
+
+    def process(self):
+        origGeSources = list(self._allGESources(self._trackNameFilter))
+        self._canAppend = len(origGeSources) == 1 and \
+            not any(PreProcessUtils.shouldPreProcessGESource(self._trackNameFilter, origGeSources[0], allowOverlaps)
+                    for allowOverlaps in [True, False])
+
+        undoFunc = self._addDeltaToOrigFiles(origGeSources)
+        try:
+            isFinalized = PreProcessAllTracksJob.process(self)
+        except Exception:
+            undoFunc()
+            raise
+
+        if not isFinalized:
+            undoFunc()
+        return isFinalized
+
+    def _addDeltaToOrigFiles(self, origGeSources):
+        """
+        Adds the delta file to the original files, returning a function that undoes this.
+        """
+        if len(origGeSources) == 1 and \
+                os.path.splitext(origGeSources[0].getFileName())[1] == os.path.splitext(self._deltaFn)[1]:
+            origFn = origGeSources[0].getFileName()
+            numDeltaHeaderLines = self._checkDeltaHeaderLines(origGeSources[0])
+
+            origStat = os.stat(origFn)
+            try:
+                self._appendDeltaFile(origFn, numDeltaHeaderLines)
+            except Exception:
+                self._truncateOrigFile(origFn, origStat)
+                raise
+
+            return lambda: self._truncateOrigFile(origFn, origStat)
+        else:
+            newOrigFn = os.path.join(createOrigPath(self._genome, self._trackNameFilter), os.path.basename(self._deltaFn))
+            assert not os.path.exists(newOrigFn), 'Error: original file already exists: ' + newOrigFn
+            shutil.copy(self._deltaFn, newOrigFn)
+            self._canAppend = False
+
+            return lambda: os.unlink(newOrigFn)
+
+    def _checkDeltaHeaderLines(self, origGeSource):
+        deltaHeaderLines = GenomeElementSource(self._deltaFn, self._genome, forPreProcessor=True).getHeaderLines()
+        if len(deltaHeaderLines) > 0 and deltaHeaderLines != origGeSource.getHeaderLines():
+            raise InvalidFormatError('Error: the header lines of the delta file differ from those of the '
+                                     'original file: ' + origGeSource.getFileName())
+        return len(deltaHeaderLines)
+
+    def _appendDeltaFile(self, origFn, numDeltaHeaderLines):
+        with open(origFn, 'rb+') as origFile:
+            origFile.seek(0, os.SEEK_END)
+            if origFile.tell() > 0:
+                origFile.seek(-1, os.SEEK_END)
+                endsWithNewline = origFile.read(1) == '\n'
+                origFile.seek(0, os.SEEK_END)
+                if not endsWithNewline:
+                    origFile.write('\n')
+
+            with open(self._deltaFn, 'rb') as deltaFile:
+                for i in xrange(numDeltaHeaderLines):
+                    deltaFile.readline()
+                shutil.copyfileobj(deltaFile, origFile)
+
+    @staticmethod
+    def _truncateOrigFile(origFn, origStat):
+        with open(origFn, 'rb+') as origFile:
+            origFile.truncate(origStat.st_size)
+        os.utime(origFn, (origStat.st_atime, origStat.st_mtime))
+
+    def _allTrackNames(self):
+        return [self._trackNameFilter]
+
+    def _preProcessTrack(self, trackName):
+        if self._canAppend:
+            try:
+                return self._appendToPreProcessedTrack(trackName)
+            except NotSupportedError, e:
+                print "Preprocessing track '%s' from scratch, as it cannot be appended to: %s" % (':'.join(trackName), e)
+
+        return PreProcessAllTracksJob._preProcessTrack(self, trackName)
+
+    def _appendToPreProcessedTrack(self, trackName):
+        deltaGeSource = GenomeElementSource(self._deltaFn, self._genome, forPreProcessor=True)
+        trackFormat = TrackFormat.createInstanceFromGeSource(deltaGeSource)
+        if trackFormat.reprIsDense():
+            raise NotSupportedError('Dense tracks cannot be appended to.')
+
+        appender = TrackAppender(self._genome, trackName)
+        collector = PreProcMetaDataCollector(self._genome, trackName)
+        id = PreProcessUtils.constructId(list(self._allGESources(trackName))[0], collector.getOrigFileManifest())
+
+        print "Appending '%s' to track: '%s'" % (self._deltaFn, ':'.join(trackName))
+        appender.move_old_track_aside()
+        try:
+            self._status = 'Trying to append the elements of the delta file...'
+            geSourceManager = GESourceManager(deltaGeSource)
+            appender.write_table(True, geSourceManager, trackFormat)
+            brTuples = geSourceManager.getBoundingRegionTuples()
+            if geSourceManager.boundingRegionsAndGEsCorrespond():
+                raise NotSupportedError('The delta file has bounding regions.')
+            self._updateMetaDataForFinalization(trackName, geSourceManager, brTuples, id, True)
+            self._finalizeOverlapRule(trackName, True)
+
+            self._status = 'Trying to cluster the chromosomes with new elements...'
+            geSourceManager = OverlapClusteringGESourceManager(self._genome, trackName, self._getWholeChrBrTuples(
+                (chr, 0) for chr in appender.new_element_chrs))
+            appender.write_table(False, geSourceManager, collector.getTrackFormat())
+            brTuples = self._getWholeChrBrTuples((chr, geSourceManager.getNumElementsForChr(chr))
+                                                 for chr in geSourceManager.getAllChrs())
+            self._updateMetaDataForFinalization(trackName, geSourceManager, brTuples,
+                                                PreProcessUtils.constructId(geSourceManager.getGESource()), False)
+            self._finalizeOverlapRule(trackName, False)
+
+            self._status = 'Trying to finalize.'
+            collector.finalize(self._username, self._shouldPrintProcessMessages())
+            merge_and_rename_overlap_tables(self._genome, trackName)
+        except Exception:
+            if PreProcMetaDataCollector.hasKey(self._genome, trackName):
+                collector.removeEntry()
+            appender.restore_old_track()
+            raise
+
+        appender.remove_old_track()
+        return PreProcessTrackResult(trackName, isFinalized=True)
+
+    def _getWholeChrBrTuples(self, chrElCounts):
+        return [BoundingRegionTuple(GenomeRegion(chr=chr, start=0, end=GenomeInfo.getChrLen(self._genome, chr)), elCount)
+                for chr, elCount in chrElCounts]
+
+    def _updateMetaDataForFinalization(self, trackName, geSourceManager, brTuples, id, allowOverlaps):
+        geSource = geSourceManager.getGESource()
+        collector = PreProcMetaDataCollector(self._genome, trackName)
+        collector.updateMetaDataForFinalization(geSource.getFileSuffix(), geSource.getPrefixList(),
+                                                geSource.getValDataType(), geSource.getValDim(),
+                                                geSource.getEdgeWeightDataType(), geSource.getEdgeWeightDim(),
+                                                geSource.hasUndirectedEdges(), geSource.getVersion(), id,
+                                                geSourceManager.getNumElements(), brTuples,
+                                                geSourceManager.getValCategories(),
+                                                geSourceManager.getEdgeWeightCategories(), allowOverlaps)
+        collector.flagChrsAsPreProcessed(allowOverlaps, geSourceManager.getAllChrs())
+
 
 class PreProcessExternalTrackJob(PreProcessTracksJob):
     PASS_ON_EXCEPTIONS = True
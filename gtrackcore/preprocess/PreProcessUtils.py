@@ -5,6 +5,7 @@ import numpy
 
 from gtrackcore.core.Config import Config
 from gtrackcore.metadata.GenomeInfo import GenomeInfo
+from gtrackcore.metadata.OrigFileManifest import OrigFileManifest
 from gtrackcore.metadata.TrackInfo import TrackInfo
 from gtrackcore.preprocess.PreProcMetaDataCollector import PreProcMetaDataCollector
 from gtrackcore.track.memmap.BoundingRegionShelve import BoundingRegionShelve
@@ -12,11 +13,22 @@ from gtrackcore.track.pytables.BoundingRegionHandler import BoundingRegionHandle
 from gtrackcore.track.pytables.TrackSource import TrackSource
 from gtrackcore.util.CustomExceptions import InvalidFormatError, ShouldNotOccurError
 from gtrackcore.util.CommonFunctions import get_dir_path
+from gtrackcore.util.pytables.Constants import GTRACKCORE_FORMAT_SUFFIX
+from gtrackcore.util.pytables.NameFunctions import get_db_name
 
 
 class PreProcessUtils(object):
     @staticmethod
     def shouldPreProcessGESource(trackName, geSource, allowOverlaps):
+        return PreProcessUtils.checkPreProcessedGESource(trackName, geSource, allowOverlaps)[0]
+
+    @staticmethod
+    def checkPreProcessedGESource(trackName, geSource, allowOverlaps):
+        '''
+        Returns whether the geSource should be preprocessed, together with the id and original file
+        manifest entries to store in TrackInfo if the original files have been touched or copied
+        without changing their content (else None). Nothing is stored by this check.
+        '''
         genome = geSource.getGenome()
         storedInfo = TrackInfo(genome, trackName)
         
@@ -24,11 +36,13 @@ class PreProcessUtils(object):
             storedInfo.isValid()
         
         if not geSource.hasOrigFile():
-            return False if validFilesExist or geSource.isExternal() else True
+            return (False if validFilesExist or geSource.isExternal() else True), None
         
-        storedAsAccordingToGeSource = \
-            (PreProcessUtils.constructId(geSource) == storedInfo.id and \
-             geSource.getVersion() == storedInfo.preProcVersion)
+        if not validFilesExist:
+            return True, None
+
+        storedAsAccordingToGeSource, updatedIdAndManifest = \
+            PreProcessUtils._isStoredAccordingToContent(storedInfo, geSource)
         
         #from gtrackcore.application.LogSetup import logMessage
         #logMessage(geSource.getGenome())
@@ -39,7 +53,33 @@ class PreProcessUtils(object):
         #                               PreProcessUtils.constructId(geSource) == storedInfo.id, \
         #                               geSource.getVersion() == storedInfo.preProcVersion))
         
-        return not (validFilesExist and storedAsAccordingToGeSource)
+        return not storedAsAccordingToGeSource, updatedIdAndManifest
+
+    @staticmethod
+    def _isStoredAccordingToContent(storedInfo, geSource):
+        if geSource.getVersion() != storedInfo.preProcVersion:
+            return False, None
+
+        manifest = OrigFileManifest(storedInfo.origFileManifest)
+        id = PreProcessUtils.constructId(geSource, manifest)
+        if id != storedInfo.id:
+            # Tracks preprocessed before the manifest was introduced have ids based on modification times
+            if storedInfo.origFileManifest is not None or \
+                    PreProcessUtils.constructId(geSource, useModificationTimes=True) != storedInfo.id:
+                return False, None
+
+        # The files may have been touched or copied without changing their content
+        if manifest.getEntries() != storedInfo.origFileManifest:
+            return True, (id, manifest.getEntries())
+        return True, None
+
+    @staticmethod
+    def storeIdAndOrigFileManifest(genome, trackName, id, origFileManifest):
+        # The manifest is stored with the corresponding id in a single update
+        storedInfo = TrackInfo(genome, trackName)
+        storedInfo.id = id
+        storedInfo.origFileManifest = origFileManifest
+        storedInfo.store()
 
     @staticmethod
     def preProcFilesExist(genome, trackName, allowOverlaps):
@@ -78,12 +118,13 @@ class PreProcessUtils(object):
             not any(os.path.isdir(os.path.join(dirPath, subFn)) for subFn in os.listdir(dirPath))
     
     @staticmethod
-    def constructId(geSource):
+    def constructId(geSource, manifest=None, useModificationTimes=False):
         from gtrackcore.preprocess.PreProcessTracksJob import PreProcessTracksJob
         if geSource.hasOrigFile():
             origPath = os.path.dirname(geSource.getFileName()) if not geSource.isExternal() else geSource.getFileName()
             return TrackInfo.constructIdFromPath(geSource.getGenome(), origPath, \
-                                                 geSource.getVersion(), PreProcessTracksJob.VERSION)
+                                                 geSource.getVersion(), PreProcessTracksJob.VERSION, \
+                                                 manifest=manifest, useModificationTimes=useModificationTimes)
         else:
             return geSource.getId()
         
@@ -115,6 +156,17 @@ class PreProcessUtils(object):
             ti = TrackInfo(genome, trackName)
             ti.resetTimeOfPreProcessing()
 
+    @staticmethod
+    def removePartialPreProcessedFiles(genome, trackName):
+        # The files of each overlap rule are only present until the track is finalized, so any such
+        # files are left by a failed preprocessing attempt
+        dirPath = get_dir_path(genome, trackName)
+        for allowOverlaps in [True, False]:
+            fullFn = os.path.join(dirPath, '%s.%s' % (get_db_name(trackName[-1], allowOverlaps), GTRACKCORE_FORMAT_SUFFIX))
+            if os.path.isfile(fullFn):
+                print 'Removing partly preprocessed data: ', fullFn
+                os.unlink(fullFn)
+
     @staticmethod
     def create_bounding_regions(genome, track_name, allow_overlaps):
         collector = PreProcMetaDataCollector(genome, track_name)
@@ -0,0 +1,123 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from gtrackcore.core.Config import Config
+from gtrackcore.preprocess.pytables.ColumnSpill import ColumnSpill
+from gtrackcore.preprocess.pytables.OutputManager import convert_columns_to_rows
+from gtrackcore.track.pytables.database.Database import DatabaseWriter, DatabaseReader
+from gtrackcore.util.pytables.Constants import ITERATION_BLOCK_SIZE
+from gtrackcore.util.pytables.ExternalSorter import ExternalSorter
+from gtrackcore.util.pytables.NumpyFunctions import split_columns_by_chr
+
+SHARD_TABLE_NODE_NAMES = ['shard', 'table']
+
+
+class ChromosomeShards(object):
+    """
+    Per-chromosome shards of the rows of a track, letting the rows of a large track be converted and
+    sorted in several processes. The genome elements are spilled to one ColumnSpill per chromosome
+    as they are parsed. The rows of each chromosome are then sorted by start and end and written to
+    a temporary HDF5 shard by worker processes, and the shards are appended to the track table in
+    chromosome order. Rows with equal keys keep their order, so that the rows come out as when
+    sorting the whole table by chr, start and end.
+
+    The time used for writing and for merging the shards is kept in shard_time and merge_time.
+    """
+
+    def __init__(self, column_names, dir_path):
+        self._column_names = list(column_names)
+        self._shard_dir = tempfile.mkdtemp(prefix='.shards_', dir=dir_path)
+        self._spills = {}
+        self._shard_filenames = []
+        self.shard_time = 0.0
+        self.merge_time = 0.0
+
+    def __len__(self):
+        return len(self._spills)
+
+    def append_element(self, genome_element):
+        self._get_spill(genome_element.chr).append_element(genome_element)
+
+    def _get_spill(self, chr):
+        if chr not in self._spills:
+            # smaller blocks than for a single spill, as one block is buffered per chromosome
+            self._spills[chr] = ColumnSpill(self._column_names, self._shard_dir, block_size=ITERATION_BLOCK_SIZE)
+        return self._spills[chr]
+
+    def append_columns(self, columns):
+        for chr, chr_columns in split_columns_by_chr(columns):
+            # copied, so that the buffered rows do not keep the whole column batch in memory
+            self._get_spill(chr).append_columns(dict((column, values.copy())
+                                                     for column, values in chr_columns.iteritems()))
+
+    def write_shards(self, dtype, column_defaults, num_workers):
+        """
+        Writes the shards, in num_workers processes. The memory budget of Config.SORT_BUFFER_SIZE
+        bytes is shared between the workers. Inside worker processes, which cannot have child
+        processes, the shards are written in the current process.
+        """
+        start_time = time.time()
+
+        key_columns = [column for column in ['start', 'end'] if column in dtype.names]
+        max_memory = max(1, Config.SORT_BUFFER_SIZE // num_workers)
+        tasks = [(self._spills[chr], os.path.join(self._shard_dir, 'shard_%d.h5' % i), dtype, column_defaults,
+                  key_columns, max_memory) for i, chr in enumerate(sorted(self._spills))]
+
+        if num_workers > 1 and len(tasks) > 1 and not multiprocessing.current_process().daemon:
+            DatabaseReader.close_unused_files()
+            pool = multiprocessing.Pool(min(num_workers, len(tasks)))
+            try:
+                self._shard_filenames = pool.map(_write_shard, tasks)
+                pool.close()
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            self._shard_filenames = [_write_shard(task) for task in tasks]
+
+        self.shard_time = time.time() - start_time
+
+    def merge_shards(self, output):
+        """
+        Appends the rows of the shards to the OutputManager, in chromosome order.
+        """
+        start_time = time.time()
+
+        for shard_filename in self._shard_filenames:
+            db_writer = DatabaseWriter(shard_filename)
+            db_writer.open()
+            table = db_writer.get_table(SHARD_TABLE_NODE_NAMES)
+            for block_start in xrange(0, table.nrows, ITERATION_BLOCK_SIZE):
+                output.writeRows(table.read(block_start, min(block_start + ITERATION_BLOCK_SIZE, table.nrows)))
+            db_writer.close()
+
+        self.merge_time = time.time() - start_time
+
+    def remove(self):
+        shutil.rmtree(self._shard_dir, ignore_errors=True)
+        self._spills = {}
+        self._shard_filenames = []
+
+
+def _write_shard(args):
+    spill, shard_filename, dtype, column_defaults, key_columns, max_memory = args
+
+    sorter = ExternalSorter(dtype, key_columns, max_memory, dir_path=os.path.dirname(shard_filename))
+    try:
+        for columns in spill.iter_blocks():
+            sorter.add(convert_columns_to_rows(columns, dtype, column_defaults))
+
+        db_writer = DatabaseWriter(shard_filename)
+        db_writer.open()
+        table = db_writer.create_table(SHARD_TABLE_NODE_NAMES, dtype, len(sorter))
+        for rows in sorter:
+            table.append(rows)
+        table.flush()
+        db_writer.close()
+    finally:
+        sorter.remove()
+
+    return shard_filename
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+
+import numpy
+
+from gtrackcore.util.pytables.Constants import SPILL_BLOCK_SIZE
+
+
+class ColumnSpill(object):
+    """
+    Temporary columnar spill files for single-pass preprocessing. Genome elements are buffered
+    column by column and spilled to one .npy file per column and block, so that they can be written
+    to the track table after the pass, when the column widths and the number of elements are known.
+
+    Scalar columns are spilled as NumPy arrays. List-valued columns (edges, weights and vector
+    values) are spilled as object arrays, as their shapes are first known after the pass.
+    """
+
+    def __init__(self, column_names, dir_path, block_size=SPILL_BLOCK_SIZE):
+        self._column_names = list(column_names)
+        self._block_size = block_size
+        self._spill_dir = tempfile.mkdtemp(prefix='.spill_', dir=dir_path)
+        self._block_filenames = []
+        self._num_rows = 0
+        self._clear_buffers()
+
+    def _clear_buffers(self):
+        self._buffered_values = dict((column, []) for column in self._column_names)
+        self._buffered_arrays = dict((column, []) for column in self._column_names)
+        self._num_buffered_rows = 0
+
+    def __len__(self):
+        return self._num_rows
+
+    def append_element(self, genome_element):
+        ge_dict = genome_element.__dict__
+        for column in self._column_names:
+            self._buffered_values[column].append(ge_dict[column] if column in ge_dict else ge_dict['extra'][column])
+        self._add_buffered_rows(1)
+
+    def append_slice(self, genome_element):
+        ge_dict = genome_element.__dict__
+        self._convert_buffered_values()
+        num_rows = None
+        for column in self._column_names:
+            array = numpy.asarray(ge_dict[column])
+            if array.ndim == 0:
+                array = numpy.repeat(array, len(ge_dict['val']) if num_rows is None else num_rows)
+            num_rows = len(array)
+            self._buffered_arrays[column].append(array)
+        self._add_buffered_rows(num_rows)
+
+    def append_columns(self, columns):
+        """
+        Appends the rows given as a dict of column arrays, e.g. a column batch of a GenomeElementSource.
+        """
+        self._convert_buffered_values()
+        for column in self._column_names:
+            self._buffered_arrays[column].append(columns[column])
+        self._add_buffered_rows(len(columns[self._column_names[0]]))
+
+    def _add_buffered_rows(self, num_rows):
+        self._num_rows += num_rows
+        self._num_buffered_rows += num_rows
+        if self._num_buffered_rows >= self._block_size:
+            self._spill()
+
+    def _convert_buffered_values(self):
+        for column, values in self._buffered_values.iteritems():
+            if len(values) > 0:
+                self._buffered_arrays[column].append(self._convert_values_to_array(values))
+                self._buffered_values[column] = []
+
+    @staticmethod
+    def _convert_values_to_array(values):
+        if any(isinstance(value, (list, tuple, numpy.ndarray)) for value in values):
+            array = numpy.empty(len(values), dtype=object)
+            array[:] = [numpy.asarray(value) for value in values]
+            return array
+        return numpy.array(values)
+
+    def _spill(self):
+        self._convert_buffered_values()
+        if self._num_buffered_rows == 0:
+            return
+
+        block_filenames = {}
+        for column, arrays in self._buffered_arrays.iteritems():
+            filename = os.path.join(self._spill_dir, '%s_%d.npy' % (column, len(self._block_filenames)))
+            numpy.save(filename, numpy.concatenate(arrays) if len(arrays) > 1 else arrays[0])
+            block_filenames[column] = filename
+        self._block_filenames.append(block_filenames)
+        self._clear_buffers()
+
+    def iter_blocks(self):
+        """
+        Yields the spilled blocks in order, each as a dict of column arrays.
+        """
+        self._spill()
+        for block_filenames in self._block_filenames:
+            yield dict((column, numpy.load(filename, allow_pickle=True))
+                       for column, filename in block_filenames.iteritems())
+
+    def remove(self):
+        shutil.rmtree(self._spill_dir, ignore_errors=True)
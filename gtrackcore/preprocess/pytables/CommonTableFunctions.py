@@ -1,17 +1,31 @@
+from collections import OrderedDict
 from functools import partial
 import os
 
 import numpy
 import tables
 
+from gtrackcore.core.Config import Config
+from gtrackcore.track.pytables.PrefixSums import has_prefix_sums, PrefixSumWriter
+from gtrackcore.track.pytables.SummaryPyramids import has_summary_pyramids, store_summary_pyramid
 from gtrackcore.track.pytables.database.Database import DatabaseWriter, DatabaseReader
 from gtrackcore.util.pytables.NameFunctions import get_database_filename, get_base_node_names, \
-    WITH_OVERLAPS_NODE_NAME, get_array_group_node_names, get_track_table_node_names
+    WITH_OVERLAPS_NODE_NAME, get_array_group_node_names, get_track_table_node_names, get_br_table_node_names
 from gtrackcore.util.pytables.NumpyFunctions import insert_into_array_of_larger_shape
-from gtrackcore.util.pytables.Constants import FLUSH_LIMIT
+from gtrackcore.util.pytables.Constants import FLUSH_LIMIT, ITERATION_BLOCK_SIZE, C_ARRAY_BLOCK_BYTES
+from gtrackcore.util.pytables.ExternalSorter import ExternalSorter
+from gtrackcore.util.pytables.StoragePolicy import get_storage_policy
 
 
 def sort_preprocessed_table(genome, track_name, allow_overlaps):
+    """
+    Sorts the rows of the track table by chr, start and end, and removes the chr column. Tables that
+    do not fit in Config.SORT_BUFFER_SIZE bytes are sorted by an external merge sort.
+
+    Tables that are already sorted are not sorted, but they are still copied once, block by block, as
+    PyTables cannot remove the chr column without rewriting the table. The chr column is not kept in
+    sorted tables, as the stored table would then depend on the order of the input rows.
+    """
     database_filename = get_database_filename(genome, track_name, allow_overlaps=allow_overlaps)
 
     db_writer = DatabaseWriter(database_filename)
@@ -19,33 +33,58 @@ def sort_preprocessed_table(genome, track_name, allow_overlaps):
     table_node_names = get_track_table_node_names(genome, track_name, allow_overlaps)
     table = db_writer.get_table(table_node_names)
 
-    if 'start' in table.colinstances and 'end' in table.colinstances:
-        chr_column = table.colinstances['chr'][:]
-        start_column = table.colinstances['start'][:]
-        end_column = table.colinstances['end'][:]
-        sort_order = numpy.lexsort((end_column, start_column, chr_column))
-    elif 'start' in table.colinstances:
-        chr_column = table.colinstances['chr'][:]
-        start_column = table.colinstances['start'][:]
-        sort_order = numpy.lexsort((start_column, chr_column))
-    elif 'end' in table.colinstances:
-        chr_column = table.colinstances['chr'][:]
-        end_column = table.colinstances['end'][:]
-        sort_order = numpy.lexsort((end_column, chr_column))
-    else:
+    key_columns = [column for column in ['chr', 'start', 'end'] if column in table.colinstances]
+    if len(key_columns) < 2:
         db_writer.close()
         return
 
+    if _is_table_sorted(table, key_columns):
+        sorted_blocks = _iter_table_blocks(table)
+    else:
+        sorted_blocks = _iter_sorted_table_blocks(table, key_columns, os.path.dirname(database_filename))
+
     table_description = table.coldescrs
     if 'chr' in table_description:
         del table_description['chr']
 
-    copy_func = partial(_copy_content_from_old_to_new_table_in_sorted_order, table, sort_order=sort_order)
+    copy_func = partial(_copy_blocks_to_new_table, sorted_blocks)
     _create_updated_table(db_writer, table, table_node_names, table_description, 0, copy_func)
 
     db_writer.close()
 
 
+def _is_table_sorted(table, key_columns):
+    # consecutive blocks overlap by one row, so that the block borders are checked
+    for block_start in xrange(0, table.nrows, ITERATION_BLOCK_SIZE):
+        block_stop = min(block_start + ITERATION_BLOCK_SIZE + 1, table.nrows)
+        if not _is_sorted([table.read(block_start, block_stop, field=column) for column in key_columns]):
+            return False
+    return True
+
+
+def _is_sorted(sort_keys):
+    is_ordered = numpy.ones(len(sort_keys[0]) - 1 if len(sort_keys[0]) > 0 else 0, dtype=bool)
+    for key in reversed(sort_keys):
+        is_ordered = (key[1:] > key[:-1]) | ((key[1:] == key[:-1]) & is_ordered)
+    return bool(is_ordered.all())
+
+
+def _iter_table_blocks(table, rows_per_block=ITERATION_BLOCK_SIZE):
+    for block_start in xrange(0, table.nrows, rows_per_block):
+        yield table.read(block_start, min(block_start + rows_per_block, table.nrows))
+
+
+def _iter_sorted_table_blocks(table, key_columns, dir_path):
+    sorter = ExternalSorter(table.dtype, key_columns, Config.SORT_BUFFER_SIZE, dir_path=dir_path)
+    try:
+        for rows in _iter_table_blocks(table):
+            sorter.add(rows)
+        for sorted_rows in sorter:
+            yield sorted_rows
+    finally:
+        sorter.remove()
+
+
 def resize_table_columns(h5_filename, node_names, table_description, expected_new_rows):
     db_writer = DatabaseWriter(h5_filename)
     db_writer.open()
@@ -62,20 +101,22 @@ def _create_updated_table(db_writer, old_table, node_names, table_description, e
     old_table_node_names = node_names[:-1]
     old_table_node_names.append(old_table.name)
 
-    new_table = db_writer.create_table(node_names, table_description, old_table.nrows + expected_new_rows)
+    new_table = db_writer.create_table(node_names, table_description, old_table.nrows + expected_new_rows,
+                                       filters=old_table.filters)
 
     copy_func(new_table)
 
     db_writer.remove_table(old_table_node_names)
 
 
-def _copy_content_from_old_to_new_table_in_sorted_order(old_table, new_table, sort_order=None):
-    new_row = new_table.row
-    for i, old_row in enumerate(old_table.itersequence(sort_order)):
-        for col in new_table.colnames:
-            new_row[col] = old_row[col]
-        new_row.append()
-        flush_table(new_table, i)
+def _copy_blocks_to_new_table(blocks, new_table):
+    for rows in blocks:
+        for block_start in xrange(0, len(rows), ITERATION_BLOCK_SIZE):
+            old_rows = rows[block_start:block_start + ITERATION_BLOCK_SIZE]
+            new_rows = numpy.empty(len(old_rows), dtype=new_table.dtype)
+            for column in new_table.colnames:
+                new_rows[column] = old_rows[column]
+            new_table.append(new_rows)
     new_table.flush()
 
 
@@ -128,23 +169,129 @@ def merge_and_rename_overlap_tables(genome, track_name):
     _close_file_handlers(db_path)
 
 
-def create_c_arrays_from_table(genome, track_name, allow_overlaps):
+def create_c_arrays_from_table(genome, track_name, allow_overlaps, max_block_bytes=C_ARRAY_BLOCK_BYTES):
+    """
+    Creates one c-array per column of the track table at its final size, and fills the c-arrays
+    block by block from the table, reading at most max_block_bytes of rows at a time.
+    """
     database_filename = get_database_filename(genome, track_name, allow_overlaps=allow_overlaps)
+    storage_policy = get_storage_policy(genome, track_name)
 
     db_writer = DatabaseWriter(database_filename)
     db_writer.open()
+    _create_c_arrays_from_table(db_writer, genome, track_name, allow_overlaps, storage_policy, max_block_bytes)
+    db_writer.close()
+
+
+def _create_c_arrays_from_table(db_writer, genome, track_name, allow_overlaps, storage_policy, max_block_bytes):
+    table = db_writer.get_table(get_track_table_node_names(genome, track_name, allow_overlaps))
+    column_dtypes = [(column_name, table.coldtypes[column_name]) for column_name in table.colnames]
+    blocks = _iter_table_blocks(table, max(1, max_block_bytes // table.rowsize))
+    _create_c_arrays_from_blocks(db_writer, genome, track_name, allow_overlaps, storage_policy, column_dtypes,
+                                 table.nrows, blocks)
+
 
+def sort_preprocessed_table_into_c_arrays(genome, track_name, allow_overlaps, max_block_bytes=C_ARRAY_BLOCK_BYTES):
+    """
+    Columnar-only storage: sorts the rows of the track table as sort_preprocessed_table, but writes
+    the sorted rows directly to the c-arrays, without the chr column, and then removes the table.
+    The bounding regions must have been created, as the summary pyramids are made from them.
+    """
+    database_filename = get_database_filename(genome, track_name, allow_overlaps=allow_overlaps)
+    storage_policy = get_storage_policy(genome, track_name)
+
+    db_writer = DatabaseWriter(database_filename)
+    db_writer.open()
     table_node_names = get_track_table_node_names(genome, track_name, allow_overlaps)
     table = db_writer.get_table(table_node_names)
 
+    key_columns = [column for column in ['chr', 'start', 'end'] if column in table.colinstances]
+    if len(key_columns) >= 2 and not _is_table_sorted(table, key_columns):
+        blocks = _iter_sorted_table_blocks(table, key_columns, os.path.dirname(database_filename))
+    else:
+        blocks = _iter_table_blocks(table, max(1, max_block_bytes // table.rowsize))
+
+    column_dtypes = [(column_name, table.coldtypes[column_name]) for column_name in table.colnames
+                     if column_name != 'chr']
+    _create_c_arrays_from_blocks(db_writer, genome, track_name, allow_overlaps, storage_policy, column_dtypes,
+                                 table.nrows, blocks)
+
+    db_writer.remove_table(table_node_names)
+    db_writer.close()
+
+
+def _create_c_arrays_from_blocks(db_writer, genome, track_name, allow_overlaps, storage_policy, column_dtypes,
+                                 num_rows, blocks):
+    # column_dtypes are (column name, dtype) pairs, where the dtype has the shape of a single value
     array_group_node_names = get_array_group_node_names(genome, track_name, allow_overlaps)
 
-    for column_name, column in table.colinstances.iteritems():
+    c_arrays = OrderedDict()
+    prefix_sum_writer = None
+    for column_name, dtype in column_dtypes:
         c_array_node_names = array_group_node_names + [column_name]
-        db_writer.create_c_array_from_array(c_array_node_names, column[:])
+        shape = (num_rows,) + dtype.shape
+        c_array = db_writer.create_c_array(c_array_node_names, tables.Atom.from_dtype(dtype.base), shape,
+                                           filters=storage_policy.get_filters(),
+                                           chunkshape=storage_policy.get_chunkshape(shape))
+        c_arrays[column_name] = c_array
+
+        if column_name == 'val' and Config.STORE_VAL_PREFIX_SUMS and has_prefix_sums(c_array):
+            prefix_sum_writer = PrefixSumWriter(db_writer, c_array_node_names, num_rows,
+                                                filters=storage_policy.get_filters())
+
+    block_start = 0
+    for rows in blocks:
+        for column_name, c_array in c_arrays.iteritems():
+            c_array[block_start:block_start + len(rows)] = rows[column_name]
+        if prefix_sum_writer is not None:
+            prefix_sum_writer.append(rows['val'])
+        block_start += len(rows)
+
+    if Config.STORE_SUMMARY_PYRAMIDS and has_summary_pyramids(dict(column_dtypes)):
+        bounding_regions = db_writer.get_table(get_br_table_node_names(genome, track_name, allow_overlaps)).read()
+        store_summary_pyramid(db_writer, array_group_node_names + ['val'], bounding_regions, c_arrays['val'].read(),
+                              c_arrays['end'].read() if 'end' in c_arrays else None,
+                              Config.SUMMARY_PYRAMID_BIN_SIZE, Config.SUMMARY_PYRAMID_ZOOM_FACTOR,
+                              filters=storage_policy.get_filters())
+
+
+def convert_to_columnar_storage(genome, track_name):
+    """
+    Converts a preprocessed track to columnar-only storage: the track tables of both overlap rules
+    are removed, after creating any missing c-arrays from them. As HDF5 does not free the space of
+    removed nodes, the file is then rewritten. Returns False if the track had no track tables.
+    """
+    database_filename = get_database_filename(genome, track_name)
+    storage_policy = get_storage_policy(genome, track_name)
+
+    DatabaseReader.close_unused_files()
+    db_writer = DatabaseWriter(database_filename)
+    db_writer.open()
+
+    any_tables_removed = False
+    for allow_overlaps in [True, False]:
+        table_node_names = get_track_table_node_names(genome, track_name, allow_overlaps)
+        if not db_writer.table_exists(table_node_names):
+            continue
+
+        array_group_node_names = get_array_group_node_names(genome, track_name, allow_overlaps)
+        if len(db_writer.get_leaf_names(array_group_node_names)) == 0:
+            _create_c_arrays_from_table(db_writer, genome, track_name, allow_overlaps, storage_policy,
+                                        C_ARRAY_BLOCK_BYTES)
+
+        db_writer.remove_table(table_node_names)
+        any_tables_removed = True
 
     db_writer.close()
 
+    if any_tables_removed:
+        repacked_filename = database_filename + '.repacked'
+        tables.copy_file(database_filename, repacked_filename, overwrite=True)
+        os.rename(repacked_filename, database_filename)
+        _close_file_handlers(database_filename)
+
+    return any_tables_removed
+
 
 def _close_file_handlers(db_path):
     current_version = tuple(map(int, tables.__version__.split('.')))
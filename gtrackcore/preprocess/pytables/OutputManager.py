@@ -1,4 +1,3 @@
-from itertools import izip
 import os
 from stat import S_IRWXU, S_IRWXG, S_IROTH
 
@@ -6,9 +5,11 @@ import numpy
 
 from gtrackcore.preprocess.pytables.TableDescriber import TableDescriber
 from gtrackcore.track.pytables.database.Database import DatabaseWriter
-from gtrackcore.preprocess.pytables.CommonTableFunctions import resize_table_columns, flush_table
+from gtrackcore.preprocess.pytables.CommonTableFunctions import resize_table_columns
+from gtrackcore.util.pytables.Constants import OUTPUT_BLOCK_SIZE
 from gtrackcore.util.pytables.NameFunctions import get_database_filename, get_track_table_node_names
 from gtrackcore.util.pytables.NumpyFunctions import insert_into_array_of_larger_shape
+from gtrackcore.util.pytables.StoragePolicy import get_storage_policy
 
 
 class OutputManager(object):
@@ -18,13 +19,14 @@ class OutputManager(object):
                                                         allow_overlaps=allow_overlaps, create_path=True)
         self._db_writer = None
         self._table = None
-        self._insert_counter = 0
 
         self._setup_track_table_database(genome, track_name, allow_overlaps, ge_source_manager)
+        self._setup_block_buffer()
 
     def _setup_track_table_database(self, genome, track_name, allow_overlaps, ge_source_manager):
         table_describer = TableDescriber(ge_source_manager, self._track_format)
         new_table_description = table_describer.create_new_table_description()
+        storage_policy = get_storage_policy(genome, track_name)
 
         self._db_writer = DatabaseWriter(self._database_filename)
         self._db_writer.open()
@@ -46,53 +48,107 @@ class OutputManager(object):
                                      new_table_description, ge_source_manager.getNumElements())
                 self._db_writer.open()
         else:
-            self._db_writer.create_table(table_node_names, new_table_description, ge_source_manager.getNumElements())
+            self._db_writer.create_table(table_node_names, new_table_description, ge_source_manager.getNumElements(),
+                                         filters=storage_policy.get_filters(),
+                                         chunkshape=storage_policy.get_chunkshape((ge_source_manager.getNumElements(),)))
 
         self._table = self._db_writer.get_table(table_node_names)
 
-    def _add_ge_dict_as_row(self, ge_dict):
-        row = self._table.row
-        for column in self._table.colnames:
-            if column in ge_dict:
-                if column in ['edges', 'weights'] or (column == 'val' and isinstance(row['val'], numpy.ndarray)):
-                    if len(ge_dict[column]) > 0:
-                        row[column] = self._convert_list_attr_to_array(ge_dict[column], row[column].shape)
+    def _setup_block_buffer(self):
+        self._block = numpy.empty(OUTPUT_BLOCK_SIZE, dtype=self._table.dtype)
+        # edges, weights and vector values are stored as fixed-width array columns
+        self._block_columns = [(column, self._block[column], self._block[column].ndim > 1)
+                               for column in self._table.colnames]
+        self._num_buffered_rows = 0
+
+    def _add_ge_dict_to_block(self, ge_dict):
+        i = self._num_buffered_rows
+        for column, block_column, is_list_column in self._block_columns:
+            value = ge_dict[column] if column in ge_dict else ge_dict['extra'][column]
+            if is_list_column:
+                if len(value) > 0:
+                    block_column[i] = _convert_list_attr_to_array(value, block_column.shape[1:])
                 else:
-                    row[column] = ge_dict[column]
-            else:  # Get extra column
-                row[column] = ge_dict['extra'][column]
-            self._insert_counter += 1
-        row.append()
-        flush_table(self._table, self._insert_counter)
-
-    def _convert_list_attr_to_array(self, list, row_field_shape):
-        ndarray_col = numpy.asarray(list)
-        if ndarray_col.shape == row_field_shape:
-            return ndarray_col
-        else:
-            return insert_into_array_of_larger_shape(ndarray_col, row_field_shape)
+                    block_column[i] = self._table.coldflts[column]
+            else:
+                block_column[i] = value
 
-    def _add_slice_element_as_chunk(self, chunk):
-        self._table.append(chunk)
-        self._insert_counter += 1
-        flush_table(self._table, self._insert_counter)  # flush for each chuck
+        self._num_buffered_rows += 1
+        if self._num_buffered_rows == len(self._block):
+            self._append_buffered_rows()
 
-    def writeElement(self, genome_element):
-        self._add_ge_dict_as_row(genome_element.__dict__)
+    def _append_buffered_rows(self):
+        if self._num_buffered_rows > 0:
+            self._table.append(self._block[:self._num_buffered_rows])
+            self._num_buffered_rows = 0
 
-    def writeRawSlice(self, genome_element):
-        if 'val' in self._table.colnames and len(self._table.colnames) == 1:
-            self._add_slice_element_as_chunk(genome_element.__dict__['val'])
-        else:
-            raw_slices = {column: genome_element.__dict__[column] for column in self._table.colnames
-                          if column not in ['orderedExtraKeys', 'genome']}
+    def writeColumns(self, columns):
+        """
+        Appends the rows given as a dict of column arrays, e.g. a block of a ColumnSpill or a raw
+        slice. List-valued columns are given as object arrays, and are padded to the shape of the
+        table column.
+        """
+        self.writeRows(convert_columns_to_rows(columns, self._table.dtype, self._table.coldflts))
 
-            keys = raw_slices.keys()
-            assert self._table.colnames == keys
+    def writeRows(self, rows):
+        self._append_buffered_rows()
+        self._table.append(rows)
 
-            for genome_element_dict in [dict(izip(keys, vals)) for vals in izip(*(raw_slices[k] for k in keys))]:
-                self._add_ge_dict_as_row(genome_element_dict)
+    def getRowDtype(self):
+        return self._table.dtype
+
+    def getColumnDefaults(self):
+        return self._table.coldflts
+
+    def writeElement(self, genome_element):
+        self._add_ge_dict_to_block(genome_element.__dict__)
+
+    def writeRawSlice(self, genome_element):
+        self.writeColumns(genome_element.__dict__)
 
     def close(self):
+        self._append_buffered_rows()
+        self._table.flush()
         self._db_writer.close()
         os.chmod(self._database_filename, S_IRWXU | S_IRWXG | S_IROTH)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # after a failure, the file is closed without writing the buffered rows, so that it can be
+        # removed or reopened by a retry
+        if exc_type is None:
+            self.close()
+        else:
+            self._db_writer.close()
+
+
+def convert_columns_to_rows(columns, dtype, column_defaults):
+    """
+    Converts a dict of column arrays to rows of the given dtype. List-valued columns given as object
+    arrays are padded to the shape of the row fields, empty lists being replaced by the column default.
+    """
+    num_rows = max(numpy.size(columns[column], 0) if numpy.ndim(columns[column]) > 0 else 0
+                   for column in dtype.names)
+    rows = numpy.empty(num_rows, dtype=dtype)
+    for column in dtype.names:
+        values = numpy.asarray(columns[column])
+        if values.dtype == object:
+            rows[column] = column_defaults[column]
+            for i, value in enumerate(values):
+                if len(value) > 0:
+                    rows[column][i] = _convert_list_attr_to_array(value, rows[column].shape[1:])
+        elif values.ndim > 1 and values.shape[1:] != rows[column].shape[1:]:
+            rows[column] = insert_into_array_of_larger_shape(values, rows[column].shape)
+        else:
+            rows[column] = values
+    return rows
+
+
+def _convert_list_attr_to_array(list, row_field_shape):
+    ndarray_col = numpy.asarray(list)
+    if ndarray_col.shape == row_field_shape:
+        return ndarray_col
+    else:
+        return insert_into_array_of_larger_shape(ndarray_col, row_field_shape)
@@ -0,0 +1,178 @@
+import os
+from collections import OrderedDict
+
+from gtrackcore.core.Config import Config
+from gtrackcore.metadata.GenomeInfo import GenomeInfo
+from gtrackcore.preprocess.pytables.ColumnSpill import ColumnSpill
+from gtrackcore.preprocess.pytables.OutputManager import OutputManager, convert_columns_to_rows
+from gtrackcore.track.pytables.TrackSource import get_column_names
+from gtrackcore.track.pytables.database.Database import DatabaseReader
+from gtrackcore.util.CustomExceptions import NotSupportedError
+from gtrackcore.util.pytables.Constants import ITERATION_BLOCK_SIZE
+from gtrackcore.util.pytables.ExternalSorter import ExternalSorter
+from gtrackcore.util.pytables.NameFunctions import get_database_filename, get_br_table_node_names, \
+    get_array_group_node_names
+
+
+class TrackAppender(object):
+    """
+    Appends genome elements to a preprocessed sparse track with whole chromosome bounding regions.
+    The track tables of both overlap rules are written as when preprocessing the track from
+    scratch, to be finalized in the same way, while the existing rows are read from the column
+    arrays of the track. The track file is moved aside while appending, until remove_old_track or
+    restore_old_track is called.
+
+    Chromosomes without new elements are copied. For the other chromosomes, the existing with
+    overlaps rows are merged with the new elements, which are placed after existing rows with equal
+    start and end, as when the elements are appended to the original file. The no overlaps rows of
+    these chromosomes are replaced by clustering the merged rows anew.
+    """
+
+    def __init__(self, genome, track_name):
+        self._genome = genome
+        self._track_name = track_name
+        self._database_filename = get_database_filename(genome, track_name)
+        if not os.path.isfile(self._database_filename):
+            raise NotSupportedError("Track '%s' has not been preprocessed." % ':'.join(track_name))
+
+        dir_path, filename = os.path.split(self._database_filename)
+        self._old_database_filename = os.path.join(dir_path, '.%s.appending' % filename)
+        self._chr_index_ranges = dict((allow_overlaps, self._read_chr_index_ranges(allow_overlaps))
+                                      for allow_overlaps in [True, False])
+        self.new_element_chrs = []
+
+    def _read_chr_index_ranges(self, allow_overlaps):
+        db_reader = DatabaseReader(self._database_filename)
+        db_reader.open()
+        br_table_node_names = get_br_table_node_names(self._genome, self._track_name, allow_overlaps)
+        bounding_regions = db_reader.get_table(br_table_node_names).read() \
+            if db_reader.table_exists(br_table_node_names) else None
+        db_reader.close()
+
+        if bounding_regions is None:
+            raise NotSupportedError('Only tracks preprocessed with both overlap rules can be appended to.')
+
+        chr_index_ranges = OrderedDict()
+        for br in bounding_regions:
+            if br['chr'] in chr_index_ranges or br['start'] != 0 or \
+                    br['end'] != GenomeInfo.getChrLen(self._genome, br['chr']):
+                raise NotSupportedError('Only tracks with whole chromosome bounding regions can be appended to.')
+            chr_index_ranges[br['chr']] = (br['start_index'], br['end_index'])
+        return chr_index_ranges
+
+    def move_old_track_aside(self):
+        DatabaseReader.close_unused_files()
+        os.rename(self._database_filename, self._old_database_filename)
+
+    def remove_old_track(self):
+        os.remove(self._old_database_filename)
+
+    def restore_old_track(self):
+        DatabaseReader.close_unused_files()
+        for allow_overlaps in [True, False, None]:
+            database_filename = get_database_filename(self._genome, self._track_name, allow_overlaps=allow_overlaps)
+            if os.path.isfile(database_filename):
+                os.remove(database_filename)
+        os.rename(self._old_database_filename, self._database_filename)
+
+    def write_table(self, allow_overlaps, ge_source_manager, track_format):
+        """
+        Writes the track table of the overlap rule, with the rows of the existing track and the
+        elements of the GESourceManager, which for the no overlaps rule are the clustered elements
+        of the chromosomes with new elements. The statistics of the GESourceManager are updated
+        with the existing rows, so that they cover the whole table.
+        """
+        dir_path = os.path.dirname(get_database_filename(self._genome, self._track_name,
+                                                         allow_overlaps=allow_overlaps, create_path=True))
+        spills = self._spill_elements_by_chr(ge_source_manager, dir_path)
+        try:
+            if allow_overlaps:
+                self.new_element_chrs = sorted(spills)
+            else:
+                assert sorted(spills) == self.new_element_chrs
+
+            old_row_chrs = [chr for chr in self._chr_index_ranges[allow_overlaps] if allow_overlaps or chr not in spills]
+            self._update_statistics(allow_overlaps, ge_source_manager, old_row_chrs)
+
+            with OutputManager(self._genome, self._track_name, allow_overlaps, ge_source_manager, track_format) as output:
+                dtype, column_defaults = output.getRowDtype(), output.getColumnDefaults()
+                self._check_columns(allow_overlaps, dtype)
+
+                for chr in sorted(set(old_row_chrs) | set(spills)):
+                    if chr not in spills:
+                        for rows in self._iter_old_rows(allow_overlaps, chr, dtype, column_defaults):
+                            output.writeRows(rows)
+                    else:
+                        old_rows = self._iter_old_rows(allow_overlaps, chr, dtype, column_defaults) \
+                            if chr in old_row_chrs else []
+                        for rows in self._merge_rows(old_rows, spills[chr], dtype, column_defaults, dir_path):
+                            output.writeRows(rows)
+        finally:
+            for spill in spills.values():
+                spill.remove()
+
+    def _spill_elements_by_chr(self, ge_source_manager, dir_path):
+        ge_source = ge_source_manager.getGESource()
+        column_names = sorted(set(ge_source.getPrefixList() + ['chr']) - set(['orderedExtraKeys', 'genome']))
+
+        spills = {}
+        for ge in ge_source_manager.iterElementsAndCalcStatistics():
+            if ge.chr not in spills:
+                spills[ge.chr] = ColumnSpill(column_names, dir_path, block_size=ITERATION_BLOCK_SIZE)
+            spills[ge.chr].append_element(ge)
+        return spills
+
+    def _update_statistics(self, allow_overlaps, ge_source_manager, chrs):
+        for chr in chrs:
+            for columns in self._iter_old_columns(allow_overlaps, chr):
+                ge_source_manager.updateStatisticsFromColumns(chr, columns)
+
+    def _check_columns(self, allow_overlaps, dtype):
+        db_reader = DatabaseReader(self._old_database_filename)
+        db_reader.open()
+        array_group_node_names = get_array_group_node_names(self._genome, self._track_name, allow_overlaps)
+        old_column_names = get_column_names(db_reader.get_leaf_names(array_group_node_names))
+        old_dtypes = [db_reader.get_node(array_group_node_names + [column]).dtype for column in old_column_names]
+        db_reader.close()
+
+        column_names = [column for column in dtype.names if column != 'chr']
+        if sorted(old_column_names) != sorted(column_names) or \
+                any(old_dtype.kind != dtype[column].base.kind or
+                    (old_dtype.kind != 'S' and old_dtype != dtype[column].base)
+                    for column, old_dtype in zip(old_column_names, old_dtypes)):
+            raise NotSupportedError('The appended elements do not have the columns of the track.')
+
+    def _iter_old_columns(self, allow_overlaps, chr):
+        start_index, end_index = self._chr_index_ranges[allow_overlaps][chr]
+
+        db_reader = DatabaseReader(self._old_database_filename)
+        db_reader.open()
+        try:
+            array_group_node_names = get_array_group_node_names(self._genome, self._track_name, allow_overlaps)
+            c_arrays = [(column, db_reader.get_node(array_group_node_names + [column]))
+                        for column in get_column_names(db_reader.get_leaf_names(array_group_node_names))]
+            for block_start in xrange(start_index, end_index, ITERATION_BLOCK_SIZE):
+                block_end = min(block_start + ITERATION_BLOCK_SIZE, end_index)
+                yield dict((column, c_array[block_start:block_end]) for column, c_array in c_arrays)
+        finally:
+            db_reader.close()
+
+    def _iter_old_rows(self, allow_overlaps, chr, dtype, column_defaults):
+        for columns in self._iter_old_columns(allow_overlaps, chr):
+            columns['chr'] = chr
+            yield convert_columns_to_rows(columns, dtype, column_defaults)
+
+    @staticmethod
+    def _merge_rows(old_rows, spill, dtype, column_defaults, dir_path):
+        # the sort is stable, so that new rows come after old rows with equal start and end
+        key_columns = [column for column in ['start', 'end'] if column in dtype.names]
+        sorter = ExternalSorter(dtype, key_columns, Config.SORT_BUFFER_SIZE, dir_path=dir_path)
+        try:
+            for rows in old_rows:
+                sorter.add(rows)
+            for columns in spill.iter_blocks():
+                sorter.add(convert_columns_to_rows(columns, dtype, column_defaults))
+            for rows in sorter:
+                yield rows
+        finally:
+            sorter.remove()
@@ -149,6 +149,23 @@ def assertDecorator(decoratorClass, assertFunc, processedList, origList, valData
             
         assertFunc(len(processedList), j+1)
 
+    # the same elements as column batches
+    rows = _getRowsOfColumnBatches(decorated)
+    assertFunc(len(processedList), len(rows))
+    for processed, row in zip(processedList, rows):
+        assertFunc(processed[:4], [row.get(prefix) for prefix in ['genome', 'chr', 'start', 'end']])
+        if len(processed) == 5:
+            for prefix in processed[4]:
+                assertFunc(processed[4][prefix], row.get(prefix))
+
+def _getRowsOfColumnBatches(geSource):
+    rows = []
+    for columns in geSource.iterColumnBatches():
+        numRows = len(columns['chr'])
+        rows += [dict((prefix, values[i].item() if isinstance(values[i], numpy.generic) else values[i])
+                      for prefix, values in columns.iteritems()) for i in xrange(numRows)]
+    return rows
+
 def assertBoundingRegions(decoratorClass, assertFunc, processedBoundingRegionTuples, origBoundingRegionTuples, \
                           geList, sendBoundingRegionsToDecorator=False):
     geIter = _getIter(geList, 'float64', 1, 'float64', 1, origBoundingRegionTuples)
@@ -157,9 +174,13 @@ def assertBoundingRegions(decoratorClass, assertFunc, processedBoundingRegionTup
     else:
         decorated = decoratorClass(geIter)
         
-    for i in range(3):
-        for el in enumerate(decorated):
-            pass
+    # the last iteration is over column batches
+    for i in range(4):
+        if i < 3:
+            for el in enumerate(decorated):
+                pass
+        else:
+            assertFunc(len(geList), len(_getRowsOfColumnBatches(decorated)))
     
         j = -1
         for j, br in enumerate(decorated.getBoundingRegionTuples()):
@@ -0,0 +1,103 @@
+import tempfile
+import unittest
+
+import numpy
+
+from gtrackcore.input.core.ColumnBatches import nextColumnBatchOfElements
+from gtrackcore.input.core.GenomeElement import GenomeElement
+from gtrackcore.input.core.GenomeElementSource import GenomeElementSource, BoundingRegionTuple
+from gtrackcore.input.wrappers.GEBoundingRegionElementCounter import GEBoundingRegionElementCounter
+from gtrackcore.input.wrappers.GEMarkRemover import GEMarkRemover
+from gtrackcore.input.wrappers.GERegionBoundaryFilter import GERegionBoundaryFilter
+from gtrackcore.input.wrappers.GESorter import GESorter
+from gtrackcore.test.common.Asserts import TestCaseWithImprovedAsserts
+from gtrackcore.track.core.GenomeRegion import GenomeRegion
+
+
+class ReusedElementIter(object):
+    # As some GenomeElementSources, returns the same element object for each element
+    def __init__(self, numElements):
+        self._ge = GenomeElement('TestGenome', 'chr21', edges=[])
+        self._i = 0
+        self._numElements = numElements
+
+    def next(self):
+        if self._i == self._numElements:
+            raise StopIteration
+        self._ge.start, self._ge.end = self._i, self._i + 5
+        self._ge.edges = ['e%d' % j for j in xrange(self._i)]
+        self._i += 1
+        return self._ge
+
+
+class TestColumnBatches(TestCaseWithImprovedAsserts):
+    LINES = ['\t'.join(['chr21', str(start), str(start + 10), 'el%d' % start, '5', '+-'[start % 2]])
+             for start in xrange(0, 300, 7)] + \
+            ['\t'.join(['chrM', str(start), str(start + 3), 'el%d' % start, '7', '+'])
+             for start in xrange(0, 16000, 400)]
+
+    def setUp(self):
+        self._tf = tempfile.NamedTemporaryFile(suffix='.bed')
+        self._tf.write('\n'.join(self.LINES) + '\n')
+        self._tf.flush()
+
+    def tearDown(self):
+        self._tf.close()
+
+    def testNextColumnBatchOfElements(self):
+        geIter = ReusedElementIter(5)
+        batches = [nextColumnBatchOfElements(geIter, batchSize=2) for i in xrange(3)]
+        self.assertRaises(StopIteration, nextColumnBatchOfElements, geIter, batchSize=2)
+
+        self.assertEqual([2, 2, 1], [len(batch['chr']) for batch in batches])
+        self.assertEqual(['chr', 'edges', 'end', 'genome', 'start'], sorted(batches[0].keys()))
+        self.assertEqual(range(5), numpy.concatenate([batch['start'] for batch in batches]).tolist())
+        self.assertEqual(object, batches[0]['edges'].dtype)
+        self.assertEqual([[], ['e0'], ['e0', 'e1'], ['e0', 'e1', 'e2'], ['e0', 'e1', 'e2', 'e3']],
+                         [edges.tolist() for batch in batches for edges in batch['edges']])
+
+    def _getWrappedBedSource(self, wrapperFunc, readSize):
+        geSource = GenomeElementSource(self._tf.name, 'TestGenome')
+        geSource._COLUMN_BATCH_READ_SIZE = readSize
+        return wrapperFunc(geSource)
+
+    def _assertBatchesEqualElements(self, wrapperFunc, hasColumnBatches):
+        elSource = self._getWrappedBedSource(wrapperFunc, 1024 * 1024)
+        ges = [ge.getCopy() for ge in elSource]
+
+        for readSize in [1024 * 1024, 100]:
+            batchSource = self._getWrappedBedSource(wrapperFunc, readSize)
+            self.assertEqual(hasColumnBatches, batchSource.hasColumnBatches())
+            batches = list(batchSource.iterColumnBatches())
+            if hasColumnBatches:
+                self.assertTrue(len(batches) > 1 if readSize == 100 else len(batches) == 1)
+
+            for column in batches[0]:
+                if column != 'genome':
+                    self.assertListsOrDicts([getattr(ge, column) for ge in ges],
+                                            numpy.concatenate([batch[column] for batch in batches]).tolist())
+            self.assertEqual([(str(br.region), br.elCount) for br in elSource.getBoundingRegionTuples()],
+                             [(str(br.region), br.elCount) for br in batchSource.getBoundingRegionTuples()])
+
+    def testWrapperChain(self):
+        regions = [GenomeRegion('TestGenome', 'chr21', 0, 100), GenomeRegion('TestGenome', 'chr21', 100, 1000),
+                   GenomeRegion('TestGenome', 'chrM', 0, 8000), GenomeRegion('TestGenome', 'chrM', 8000, 16000)]
+        brTuples = lambda: [BoundingRegionTuple(region, 0) for region in regions]
+
+        self._assertBatchesEqualElements(
+            lambda geSource: GEBoundingRegionElementCounter(GERegionBoundaryFilter(geSource, regions), brTuples()),
+            hasColumnBatches=True)
+        self._assertBatchesEqualElements(
+            lambda geSource: GEBoundingRegionElementCounter(GEMarkRemover(GERegionBoundaryFilter(geSource, regions)),
+                                                            brTuples()),
+            hasColumnBatches=True)
+
+        # per-element wrappers are adapted
+        self._assertBatchesEqualElements(
+            lambda geSource: GEBoundingRegionElementCounter(GESorter(GERegionBoundaryFilter(geSource, regions)),
+                                                            brTuples()),
+            hasColumnBatches=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,6 +5,7 @@ import sys
 import numpy
 import copy
 from collections import OrderedDict
+from cStringIO import StringIO
 
 from gtrackcore.input.core.GenomeElement import GenomeElement
 from gtrackcore.input.core.GenomeElementSource import GenomeElementSource, BoundingRegionTuple
@@ -1780,9 +1781,7 @@ class TestGenomeElementSource(TestCaseWithImprovedAsserts):
                 ['gca'],
                 '.fa',
                 ['My','fasta-track'],
-                [GenomeElement('TestGenome', 'chrM', val=numpy.array(['a','c'], dtype='S1')),
-                 GenomeElement('TestGenome', 'chrM', val=numpy.array(['g','t'], dtype='S1'))]*40 +
-                [GenomeElement('TestGenome', 'chrM', val=numpy.array(['a','c','g'], dtype='S1')),
+                [GenomeElement('TestGenome', 'chrM', val=numpy.array(list('acgt' * 40 + 'acg'), dtype='S1')),
                  GenomeElement('TestGenome', 'chr21', val=numpy.array(['g','c','a'], dtype='S1'))],
                 [BoundingRegionTuple(region=GenomeRegion('TestGenome', 'chrM', start=0, end=163), elCount=163),
                  BoundingRegionTuple(region=GenomeRegion('TestGenome', 'chr21', start=0, end=3), elCount=3)],
@@ -3486,10 +3485,75 @@ class TestGenomeElementSource(TestCaseWithImprovedAsserts):
             self._assertEdgeWeightDim(case)
             case.close()
 
+    def _assertColumnBatches(self, case, readSize):
+        geSource = self._getGeSource(case)
+        geSource._geSource._COLUMN_BATCH_READ_SIZE = readSize
+        batches = list(geSource.iterColumnBatches())
+
+        for column in ['chr'] + case.prefixList:
+            self.assertListsOrDicts([ge.__dict__[column] if column in ge.__dict__ else ge.extra[column]
+                                     for ge in case.assertElementList],
+                                    sum([batch[column].tolist() for batch in batches], []))
+        self.assertEqual(case.valDim, geSource.getValDim())
+
+    def testColumnBatches(self):
+        for case in self.cases.values():
+            case.open()
+            # one batch, and one batch per line. Sources without hasColumnBatches() collect their elements.
+            for readSize in [1024 * 1024, 1]:
+                self._assertColumnBatches(case, readSize)
+            case.close()
+
     def runTest(self):
         pass
         #self.testDirtyFlagSortedWigFixedElementSource()
 
+
+class TestColumnBatches(TestCaseWithImprovedAsserts):
+    def _getBatchesAndElements(self, suffix, lines, readSize=20):
+        self._tf = tempfile.NamedTemporaryFile(suffix=suffix)
+        self._tf.write('\n'.join(lines) + '\n')
+        self._tf.flush()
+
+        geSource = GEDependentAttributesHolder(GenomeElementSource(self._tf.name, 'TestGenome', printWarnings=False))
+        geSource._geSource._COLUMN_BATCH_READ_SIZE = readSize
+        batches = list(geSource.iterColumnBatches())
+        return batches, geSource.anyWarnings(), list(geSource)
+
+    def tearDown(self):
+        self._tf.close()
+
+    def testLineByLineParsing(self):
+        # comments, blank lines and an unknown chromosome
+        lines = ['\t'.join(['chrM','71','72','a','0','+']),
+                 '#comment',
+                 '',
+                 '\t'.join(['chrX','10','20','b','1','-']),
+                 '\t'.join(['chr21','3','13','c','2','.']),
+                 '\t'.join(['chr21','30','40','d','3','+'])]
+        batches, anyWarnings, ges = self._getBatchesAndElements('.bed', lines)
+
+        self.assertTrue(anyWarnings)
+        self.assertEqual([ge.chr for ge in ges], numpy.concatenate([batch['chr'] for batch in batches]).tolist())
+        self.assertEqual([ge.start for ge in ges], numpy.concatenate([batch['start'] for batch in batches]).tolist())
+        self.assertEqual([ge.strand for ge in ges], numpy.concatenate([batch['strand'] for batch in batches]).tolist())
+        self.assertEqual([ge.name for ge in ges], numpy.concatenate([batch['name'] for batch in batches]).tolist())
+
+    def testErrorLine(self):
+        lines = ['\t'.join(['chr21',str(i),str(i+10),'a','1.5']) for i in xrange(100)] + \
+                ['\t'.join(['chr21','200','190','b','1.5'])]
+
+        storedStdOut = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            self.assertRaises(InvalidFormatError, self._getBatchesAndElements, '.valued.bed', lines, readSize=1024)
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = storedStdOut
+
+        # the error is reported for the line, as when iterating over the elements
+        self.assertTrue('chr21\t200\t190\tb\t1.5' in output)
+
 if __name__ == "__main__":
 #    TestGenomeElementSource().debug()
     unittest.main()
@@ -0,0 +1,139 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import gtrackcore.input.fileformats.FastaGenomeElementSource as FastaModule
+from gtrackcore.core.Config import Config
+from gtrackcore.input.fileformats.FastaGenomeElementSource import FastaGenomeElementSource, FastaIndex, \
+    getFastaIndexFilename
+from gtrackcore.input.wrappers.GEDependentAttributesHolder import GEDependentAttributesHolder
+from gtrackcore.util.CustomExceptions import InvalidFormatError
+
+
+class TestFastaGenomeElementSource(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._prevBuildIndex = Config.BUILD_FASTA_INDEX
+        self._prevBlockSize = FastaModule.READ_BLOCK_SIZE
+
+    def tearDown(self):
+        Config.BUILD_FASTA_INDEX = self._prevBuildIndex
+        FastaModule.READ_BLOCK_SIZE = self._prevBlockSize
+        shutil.rmtree(self._dir)
+
+    def _writeFasta(self, seqs, lineLen, newline='\n'):
+        fn = os.path.join(self._dir, 'test.fa')
+        with open(fn, 'wb') as fastaFile:
+            for chr, seq in seqs:
+                fastaFile.write('>' + chr + ' Description' + newline)
+                if lineLen is None:
+                    lines = [seq[:3], seq[3:]] if seq else []
+                else:
+                    lines = [seq[i:i + lineLen] for i in xrange(0, len(seq), lineLen)]
+                fastaFile.write(''.join(line + newline for line in lines))
+        return fn
+
+    def _getRandomSeqs(self, lengths):
+        random.seed(len(lengths))
+        return [('chr%s' % i, ''.join(random.choice('acgtn') for j in xrange(length)))
+                for i, length in enumerate(lengths)]
+
+    def _assertElementsEqualSeqs(self, fn, seqs):
+        geSource = GEDependentAttributesHolder(FastaGenomeElementSource(fn, None))
+        ges = list(geSource)
+        self.assertEqual([(chr, seq) for chr, seq in seqs if seq], [(ge.chr, ge.val.tostring()) for ge in ges])
+        self.assertEqual([(chr, 0, len(seq), len(seq)) for chr, seq in seqs],
+                         [(br.region.chr, br.region.start, br.region.end, br.elCount)
+                          for br in geSource.getBoundingRegionTuples()])
+
+    def testReadInBlocks(self):
+        seqs = self._getRandomSeqs([1000, 0, 17, 60, 2345])
+        for newline in ['\n', '\r\n']:
+            fn = self._writeFasta(seqs, 60, newline)
+            for blockSize in [100, 64, 1024 * 1024]:
+                FastaModule.READ_BLOCK_SIZE = blockSize
+                self._assertElementsEqualSeqs(fn, seqs)
+
+                index = FastaIndex.createFromFile(open(fn, 'rb'))
+                self.assertEqual([(chr, len(seq)) for chr, seq in seqs],
+                                 [(entry.name, entry.length) for entry in index.entries.values()])
+                self.assertEqual([(None, None) if not seq else (min(len(seq), 60), min(len(seq), 60) + len(newline))
+                                  for chr, seq in seqs],
+                                 [(entry.lineBases, entry.lineWidth) for entry in index.entries.values()])
+
+    def testReadRegion(self):
+        seqs = self._getRandomSeqs([1000, 123])
+        fn = self._writeFasta(seqs, 50)
+        FastaModule.READ_BLOCK_SIZE = 64
+        geSource = FastaGenomeElementSource(fn, None)
+
+        random.seed(0)
+        for i in xrange(100):
+            chr, seq = random.choice(seqs)
+            start = random.randint(0, len(seq))
+            end = random.randint(start, len(seq))
+            self.assertEqual(seq[start:end], geSource.readRegion(chr, start, end).tostring())
+
+        self.assertRaises(InvalidFormatError, geSource.readRegion, 'chr1', 100, 124)
+        self.assertRaises(InvalidFormatError, geSource.readRegion, 'chrX', 0, 1)
+
+    def testNonUniformLines(self):
+        seqs = self._getRandomSeqs([100, 10])
+        fn = self._writeFasta(seqs, None)
+        self._assertElementsEqualSeqs(fn, seqs)
+
+        geSource = FastaGenomeElementSource(fn, None)
+        self.assertFalse(geSource.getFastaIndex().isSeekable())
+        self.assertEqual(seqs[0][1][:3], geSource.readRegion('chr0', 0, 3).tostring())
+        self.assertRaises(InvalidFormatError, geSource.readRegion, 'chr0', 3, 5)
+
+    def testIndexFile(self):
+        seqs = self._getRandomSeqs([1000, 123])
+        fn = self._writeFasta(seqs, 50)
+        indexFn = getFastaIndexFilename(fn)
+
+        Config.BUILD_FASTA_INDEX = False
+        self._assertElementsEqualSeqs(fn, seqs)
+        self.assertFalse(os.path.exists(indexFn))
+
+        Config.BUILD_FASTA_INDEX = True
+        self._assertElementsEqualSeqs(fn, seqs)
+        self.assertTrue(os.path.basename(indexFn).startswith('.'))
+        fastaStat = os.stat(fn)
+        self.assertEqual(['#size=%d\tmtime=%r' % (fastaStat.st_size, fastaStat.st_mtime),
+                          'chr0\t1000\t18\t50\t51', 'chr1\t123\t1056\t50\t51'], open(indexFn).read().splitlines())
+
+        geSource = FastaGenomeElementSource(fn, None)
+        self.assertEqual(FastaIndex.read(indexFn).entries, geSource.getFastaIndex().entries)
+        self.assertEqual(seqs[1][1][70:80], geSource.readRegion('chr1', 70, 80).tostring())
+
+    def testIndexOfReplacedFile(self):
+        Config.BUILD_FASTA_INDEX = True
+        seqs = self._getRandomSeqs([1000, 123])
+        fn = self._writeFasta(seqs, 50)
+        self._assertElementsEqualSeqs(fn, seqs)
+        fastaStat = os.stat(fn)
+
+        # replaced by copies with preserved, older timestamps, e.g. by rsync -t or cp -p, of another
+        # size and of the same size
+        for newSeqs, lineLen in [(seqs, 60), ([(chr, seq.upper()) for chr, seq in seqs], 50)]:
+            fn = self._writeFasta(newSeqs, lineLen)
+            os.utime(fn, (fastaStat.st_atime - 100, fastaStat.st_mtime - 100))
+            self._assertElementsEqualSeqs(fn, newSeqs)
+            self.assertEqual(newSeqs[1][1][70:80], FastaGenomeElementSource(fn, None).readRegion('chr1', 70, 80).tostring())
+
+    def testInvalidFormat(self):
+        fn = os.path.join(self._dir, 'test.fa')
+        with open(fn, 'w') as fastaFile:
+            fastaFile.write('\nacgt\n>chr1\nacgt\n')
+        self.assertRaises(InvalidFormatError, list, FastaGenomeElementSource(fn, None))
+
+        with open(fn, 'w') as fastaFile:
+            fastaFile.write('\n>chr1\nacgt\n')
+        self.assertEqual(['acgt'], [ge.val.tostring() for ge in FastaGenomeElementSource(fn, None)])
+
+
+if __name__ == "__main__":
+    unittest.main()
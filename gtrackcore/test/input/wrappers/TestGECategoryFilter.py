@@ -0,0 +1,30 @@
+import unittest
+
+from functools import partial
+
+from gtrackcore.input.wrappers.GECategoryFilter import GECategoryFilter
+from gtrackcore.test.common.Asserts import assertDecorator
+
+class TestGECategoryFilter(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def _assertFilter(self, filteredList, unfilteredList, filterList, strict):
+        assertDecorator(partial(GECategoryFilter, filterList=filterList, strict=strict), \
+                        self.assertEqual, filteredList, unfilteredList)
+
+    def testFilter(self):
+        elList = [['A','chr1',2,5,{'val':'exon'}], ['A','chr1',4,8,{'val':'intron'}], \
+                  ['A','chr2',3,8,{'val':'exon_3'}], ['A','chr2',9,12,{'val':'utr'}]]
+
+        self._assertFilter([elList[0]], elList, ['exon'], strict=True)
+        self._assertFilter([elList[0], elList[1], elList[2]], elList, ['exon', 'intron'], strict=False)
+        self._assertFilter([elList[1], elList[3]], elList, ['intron', 'utr', 'other'], strict=True)
+        self._assertFilter([], elList, ['other'], strict=False)
+
+    def testFilterNonStringCategories(self):
+        self._assertFilter([['A','chr1',4,8,{'val':2}]], \
+                           [['A','chr1',2,5,{'val':1}], ['A','chr1',4,8,{'val':2}]], [2], strict=True)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,16 @@
+import unittest
+
+from gtrackcore.input.wrappers.GEMarkRemover import GEMarkRemover
+from gtrackcore.test.common.Asserts import assertDecorator
+
+class TestGEMarkRemover(unittest.TestCase):
+    def setUp(self):
+        pass
+
+    def testRemoveMarks(self):
+        assertDecorator(GEMarkRemover, self.assertEqual, \
+                        [['A','chr1',2,5,{'val':None, 'strand':True}], ['A','chr2',3,8,{'val':None, 'strand':False}]], \
+                        [['A','chr1',2,5,{'val':1.5, 'strand':True}], ['A','chr2',3,8,{'val':2.5, 'strand':False}]])
+
+if __name__ == "__main__":
+    unittest.main()
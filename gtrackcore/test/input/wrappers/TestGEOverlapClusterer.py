@@ -1,16 +1,38 @@
 import unittest
+import random
 import sys
 import numpy as np
 
+from copy import copy
 from numpy import nan
 
 from gtrackcore.core.Config import Config
+from gtrackcore.input.core.ColumnBatches import nextColumnBatchOfElements
 from gtrackcore.input.wrappers.GEOverlapClusterer import GEOverlapClusterer
-from gtrackcore.test.common.Asserts import assertDecorator, TestCaseWithImprovedAsserts
+from gtrackcore.input.wrappers.GESourceWrapper import GESourceWrapper
+from gtrackcore.test.common.Asserts import assertDecorator, TestCaseWithImprovedAsserts, _getIter, \
+    _getRowsOfColumnBatches
 from gtrackcore.util.CommonConstants import BINARY_MISSING_VAL
 
 MAX_CONCAT_LEN_FOR_OVERLAPPING_ELS = Config.MAX_CONCAT_LEN_FOR_OVERLAPPING_ELS
 
+class SmallBatchGESourceWrapper(GESourceWrapper):
+    # Returns the elements in small column batches, so that clusters span several batches
+    def __init__(self, geSource, batchSize):
+        GESourceWrapper.__init__(self, geSource)
+        self._batchSize = batchSize
+
+    def __iter__(self):
+        self = copy(self)
+        self._geIter = self._geSource.__iter__()
+        return self
+
+    def next(self):
+        return self._geIter.next()
+
+    def nextColumnBatch(self):
+        return nextColumnBatchOfElements(self, batchSize=self._batchSize)
+
 class TestGEOverlapClusterer(TestCaseWithImprovedAsserts):
     #def setUp(self):
     #    self.stdout = sys.stdout
@@ -152,6 +174,41 @@ class TestGEOverlapClusterer(TestCaseWithImprovedAsserts):
                                [['A','chr1',0,10,{'name':'a1'}]] * MAX_CONCAT_LEN_FOR_OVERLAPPING_ELS)
         self._assertClustering([['A','chr1',0,10,{'name':'a1|...'}]], \
                                [['A','chr1',0,10,{'name':'a1'}]] + [['A','chr1',0,10,{'name':'a2'}]] * MAX_CONCAT_LEN_FOR_OVERLAPPING_ELS)
+    VAL_CHOICES = {'float64': [1.0, 2.5], 'int32': [3, 4], 'int8': [False, True], 'S1': ['a', 'b'],
+                   'S': ['aa', 'b', 'c']}
+
+    def _getRandomElList(self, rand, valDataType, hasEnd):
+        elList = []
+        for chr in ['chr1', 'chr2']:
+            for start in sorted(rand.randint(0, 40) for i in xrange(rand.randint(0, 40))):
+                end = start + rand.randint(0, 8) if hasEnd else None
+                elList.append(['A', chr, start, end,
+                               {'val': rand.choice(self.VAL_CHOICES[valDataType]), 'strand': rand.choice([False, True]),
+                                'id': rand.choice(['a1', 'a2']), 'name': rand.choice(['n1', 'n2', 'n3'])}])
+        return elList
+
+    def testColumnBatchesEqualElements(self):
+        prevMaxConcatLen = Config.MAX_CONCAT_LEN_FOR_OVERLAPPING_ELS
+        Config.MAX_CONCAT_LEN_FOR_OVERLAPPING_ELS = 4
+        try:
+            rand = random.Random(0)
+            for i in xrange(200):
+                valDataType = rand.choice(sorted(self.VAL_CHOICES))
+                elList = self._getRandomElList(rand, valDataType, hasEnd=rand.choice([False, True]))
+                if len(elList) == 0:
+                    continue
+
+                geSource = _getIter(elList, valDataType, 1, 'float64', 1)
+                ges = [ge.getCopy() for ge in GEOverlapClusterer(geSource)]
+                rows = _getRowsOfColumnBatches(GEOverlapClusterer(
+                    SmallBatchGESourceWrapper(geSource, batchSize=rand.randint(1, 8))))
+
+                self.assertEqual(len(ges), len(rows))
+                for prefix in ['genome', 'chr', 'start', 'end', 'val', 'strand', 'id', 'name']:
+                    self.assertListsOrDicts([getattr(ge, prefix) for ge in ges], [row.get(prefix) for row in rows])
+        finally:
+            Config.MAX_CONCAT_LEN_FOR_OVERLAPPING_ELS = prevMaxConcatLen
+
     def runTest(self):
         #pass
         self.testClustering()
@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import gtrackcore.metadata.OrigFileManifest
+from gtrackcore.core.Config import Config
+from gtrackcore.input.core.GenomeElementSource import GenomeElementSource
+from gtrackcore.metadata.OrigFileManifest import OrigFileManifest, SAMPLE_BLOCK_SIZE, SAMPLE_BLOCK_COUNT
+from gtrackcore.metadata.TrackInfo import TrackInfo
+from gtrackcore.preprocess.PreProcessTracksJob import PreProcessAllTracksJob
+from gtrackcore.preprocess.PreProcMetaDataCollector import PreProcMetaDataCollector
+from gtrackcore.preprocess.PreProcessUtils import PreProcessUtils
+from gtrackcore.track.pytables.database.Database import DatabaseReader
+from gtrackcore.util.CommonFunctions import createOrigPath, get_dir_path
+
+
+class TestOrigFileManifest(unittest.TestCase):
+    def setUp(self):
+        self._prev_hash_method = Config.ORIG_FILE_HASH_METHOD
+        self._tempDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        Config.ORIG_FILE_HASH_METHOD = self._prev_hash_method
+        shutil.rmtree(self._tempDir, ignore_errors=True)
+
+    def _writeFile(self, fn, content):
+        with open(os.path.join(self._tempDir, fn), 'wb') as outFile:
+            outFile.write(content)
+
+    def _getHash(self, fn, manifest=None):
+        if manifest is None:
+            manifest = OrigFileManifest()
+        return dict(manifest.getContentHashes(self._tempDir, [fn]))[fn]
+
+    def testTouchedFile(self):
+        self._writeFile('a.bed', 'chr1\t10\t20\n')
+        contentHash = self._getHash('a.bed')
+        os.utime(os.path.join(self._tempDir, 'a.bed'), (1, 1))
+        self.assertEqual(contentHash, self._getHash('a.bed'))
+
+        self._writeFile('a.bed', 'chr1\t10\t21\n')
+        self.assertNotEqual(contentHash, self._getHash('a.bed'))
+
+    def testSampledAndFullHash(self):
+        content = 'a' * (SAMPLE_BLOCK_SIZE * SAMPLE_BLOCK_COUNT * 2)
+        middle = SAMPLE_BLOCK_SIZE * SAMPLE_BLOCK_COUNT + SAMPLE_BLOCK_SIZE // 2
+        changedContent = content[:middle] + 'b' + content[middle + 1:]
+
+        for hashMethod, shouldDetectChange in [('sampled', False), ('full', True)]:
+            Config.ORIG_FILE_HASH_METHOD = hashMethod
+            self._writeFile('a.bed', content)
+            contentHash = self._getHash('a.bed')
+            self._writeFile('a.bed', changedContent)
+            self.assertEqual(shouldDetectChange, contentHash != self._getHash('a.bed'))
+
+    def testReuseEntries(self):
+        self._writeFile('a.bed', 'chr1\t10\t20\n')
+        manifest = OrigFileManifest()
+        contentHash = self._getHash('a.bed', manifest)
+
+        # entries are reused while the size and modification time are unchanged
+        stat = os.stat(os.path.join(self._tempDir, 'a.bed'))
+        manifest = OrigFileManifest(dict((fn, entry[:-1] + ('stored',))
+                                         for fn, entry in manifest.getEntries().iteritems()))
+        self.assertEqual('stored', self._getHash('a.bed', manifest))
+
+        os.utime(os.path.join(self._tempDir, 'a.bed'), (stat.st_atime, int(stat.st_mtime) + 10))
+        self.assertEqual(contentHash, self._getHash('a.bed', manifest))
+        self.assertEqual(int(stat.st_mtime) + 10, manifest.getEntries()['a.bed'][1])
+
+
+class TestSkipUnchangedContent(unittest.TestCase):
+    GENOME = 'testgenome'
+    TRACK_NAME = ['ManifestTest', 'track']
+
+    def setUp(self):
+        self._origFn = os.path.join(createOrigPath(self.GENOME, self.TRACK_NAME), 'track.bed')
+        os.makedirs(os.path.dirname(self._origFn))
+        with open(self._origFn, 'w') as bedFile:
+            bedFile.write('chr21\t100\t200\nchr21\t150\t300\n')
+
+    def tearDown(self):
+        DatabaseReader.close_unused_files()
+        for path in [createOrigPath(self.GENOME, self.TRACK_NAME[:1]), get_dir_path(self.GENOME, self.TRACK_NAME[:1])]:
+            shutil.rmtree(path, ignore_errors=True)
+        TrackInfo(self.GENOME, self.TRACK_NAME).removeEntryFromShelve()
+        if PreProcMetaDataCollector.hasKey(self.GENOME, self.TRACK_NAME):
+            PreProcMetaDataCollector(self.GENOME, self.TRACK_NAME).removeEntry()
+
+    def _shouldPreProcess(self):
+        geSource = GenomeElementSource(self._origFn, self.GENOME, forPreProcessor=True)
+        return [PreProcessUtils.shouldPreProcessGESource(self.TRACK_NAME, geSource, allowOverlaps)
+                for allowOverlaps in [True, False]]
+
+    def _getStoredMTime(self):
+        return TrackInfo(self.GENOME, self.TRACK_NAME).origFileManifest['track.bed'][1]
+
+    def testSkipTouchedTrack(self):
+        PreProcessAllTracksJob(self.GENOME, self.TRACK_NAME).process()
+        self.assertEqual([False, False], self._shouldPreProcess())
+
+        stat = os.stat(self._origFn)
+        os.utime(self._origFn, (stat.st_atime, int(stat.st_mtime) + 10))
+        self.assertEqual([False, False], self._shouldPreProcess())
+        self.assertEqual(stat.st_mtime, self._getStoredMTime())
+
+        # the refreshed manifest is only stored by real runs
+        self.assertFalse(PreProcessAllTracksJob(self.GENOME, self.TRACK_NAME, mode='Simulated').process())
+        self.assertEqual(stat.st_mtime, self._getStoredMTime())
+        self.assertFalse(PreProcessAllTracksJob(self.GENOME, self.TRACK_NAME).process())
+        self.assertEqual(int(stat.st_mtime) + 10, self._getStoredMTime())
+
+        with open(self._origFn, 'a') as bedFile:
+            bedFile.write('chr21\t400\t500\n')
+        self.assertEqual([True, True], self._shouldPreProcess())
+
+    def testSameSizeEditOutsideSampledBlocks(self):
+        # small sampled blocks, so that the sampled hash would miss the edit
+        sampleBlockSize = 4
+        prevSampleBlockSize = gtrackcore.metadata.OrigFileManifest.SAMPLE_BLOCK_SIZE
+        gtrackcore.metadata.OrigFileManifest.SAMPLE_BLOCK_SIZE = sampleBlockSize
+        try:
+            lines = ['chr21\t%d\t%d\t%s\n' % (i * 100, i * 100 + 50, 'a' * 20) for i in xrange(SAMPLE_BLOCK_COUNT * 4)]
+            content = ''.join(lines)
+            with open(self._origFn, 'w') as bedFile:
+                bedFile.write(content)
+            PreProcessAllTracksJob(self.GENOME, self.TRACK_NAME).process()
+
+            sampledOffsets = set(offset for i in xrange(SAMPLE_BLOCK_COUNT)
+                                 for start in [(len(content) - sampleBlockSize) * i // (SAMPLE_BLOCK_COUNT - 1)]
+                                 for offset in xrange(start, start + sampleBlockSize))
+            editOffset = [offset for offset in xrange(len(content) // 2, len(content))
+                          if content[offset] == 'a' and offset not in sampledOffsets][0]
+            with open(self._origFn, 'w') as bedFile:
+                bedFile.write(content[:editOffset] + 'b' + content[editOffset + 1:])
+
+            self.assertEqual([True, True], self._shouldPreProcess())
+        finally:
+            gtrackcore.metadata.OrigFileManifest.SAMPLE_BLOCK_SIZE = prevSampleBlockSize
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,451 @@
+import errno
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+import tables
+
+import gtrackcore
+import gtrackcore.preprocess
+import gtrackcore.preprocess.pytables.OutputManager
+from gtrackcore.core.Config import Config
+from gtrackcore.input.core.GenomeElementSource import GenomeElementSource
+from gtrackcore.input.wrappers.GESourceWrapper import GESourceWrapper
+from gtrackcore.metadata.TrackInfo import TrackInfo
+from gtrackcore.preprocess.PreProcessTracksJob import PreProcessTracksJob, PreProcessTrackResult, \
+    PreProcessAllTracksJob, PreProcessAppendToTrackJob
+from gtrackcore.preprocess.PreProcMetaDataCollector import PreProcMetaDataCollector
+from gtrackcore.preprocess.PreProcessUtils import PreProcessUtils
+from gtrackcore.track.pytables.database.Database import DatabaseReader
+from gtrackcore.track.pytables.database.MetadataHandler import MetadataHandler
+from gtrackcore.util.CommonFunctions import createOrigPath, get_dir_path
+from gtrackcore.util.CustomExceptions import InvalidFormatError
+from gtrackcore.util.pytables.NameFunctions import get_database_filename, get_array_group_node_names, \
+    get_br_table_node_names, get_base_node_names, TRACKINFO_NODE_NAME
+
+
+def readTrack(genome, trackName):
+    gtrackcore.preprocess.is_preprocessing = True
+    db_reader = DatabaseReader(get_database_filename(genome, trackName))
+    db_reader.open()
+    content = {}
+    for allowOverlaps in [True, False]:
+        content[allowOverlaps, 'bounding_regions'] = \
+            db_reader.get_table(get_br_table_node_names(genome, trackName, allowOverlaps)).read().tolist()
+        array_group_node_names = get_array_group_node_names(genome, trackName, allowOverlaps)
+        for name in db_reader.get_leaf_names(array_group_node_names):
+            array = db_reader.get_node(array_group_node_names + [name]).read()
+            content[allowOverlaps, name] = (str(array.dtype), array.shape, numpy.where(array != array, None, array).tolist())
+    db_reader.close()
+    return content
+
+
+def readTrackFile(genome, trackName):
+    # The data and attributes of every node of the track file, with the track name replaced in the node
+    # paths and titles. The data of the persisted TrackInfo is left out, as it is compared by readTrackInfos.
+    DatabaseReader.close_unused_files()
+    trackNodeName = get_base_node_names(genome, trackName)[-1]
+    h5File = tables.open_file(get_database_filename(genome, trackName))
+    content = {}
+    for node in h5File.walk_nodes('/'):
+        path = '/'.join('<track>' if name == trackNodeName else name for name in node._v_pathname.split('/'))
+        attrs = dict((name, repr(node._v_attrs[name]).replace(repr(trackNodeName), '<track>'))
+                     for name in node._v_attrs._f_list('all'))
+        if isinstance(node, tables.Leaf) and node.name != TRACKINFO_NODE_NAME:
+            array = node.read()
+            content[path] = (attrs, str(array.dtype), array.shape, array.tostring())
+        else:
+            content[path] = (attrs,)
+    h5File.close()
+    return content
+
+
+def readTrackInfos(genome, trackName):
+    # The stored and the persisted TrackInfo, without the attributes that differ between tracks with
+    # the same content
+    trackInfos = []
+    for trackInfo in [TrackInfo(genome, trackName),
+                      MetadataHandler(genome, trackName).get_newest_trackinfo(get_database_filename(genome, trackName), None)]:
+        attrs = dict(trackInfo.__dict__)
+        for attr in ['trackName', 'timeOfLastUpdate', 'timeOfPreProcessing']:
+            del attrs[attr]
+        attrs['origFileManifest'] = dict((fn, (size, hashMethod, contentHash)) for fn, (size, mtime, hashMethod, contentHash)
+                                         in attrs['origFileManifest'].iteritems())
+        trackInfos.append(attrs)
+    return trackInfos
+
+
+class MockPreProcessTracksJob(PreProcessTracksJob):
+    def __init__(self, numWorkers):
+        PreProcessTracksJob.__init__(self, 'TestGenome')
+        self._numWorkers = numWorkers
+        self._attempts = {}
+        self.subTrackCountOrder = []
+
+    def _allTrackNames(self):
+        return [['ok', 'a'], ['flaky'], ['broken:track'], ['missing'], ['ok']]
+
+    def _preProcessTrack(self, trackName):
+        attempt = self._attempts[tuple(trackName)] = self._attempts.get(tuple(trackName), 0) + 1
+        if trackName == ['broken:track']:
+            raise ValueError('broken track')
+        if trackName == ['flaky'] and attempt == 1:
+            raise IOError(errno.EAGAIN, 'flaky track')
+        if trackName == ['missing'] and attempt == 1:
+            raise IOError(errno.ENOENT, 'missing file')
+        return PreProcessTrackResult(trackName, isFinalized=True, anyWarnings=attempt > 1)
+
+    def _getNumWorkers(self):
+        return self._numWorkers
+
+    def _calcAndStoreSubTrackCount(self, trackName):
+        self.subTrackCountOrder.append(trackName)
+
+    def _persist_metadata(self, track_name):
+        pass
+
+
+class TestPreProcessTracksJob(unittest.TestCase):
+    def setUp(self):
+        self._prev_retries = Config.PREPROCESSING_RETRIES
+        Config.PREPROCESSING_RETRIES = 1
+
+    def tearDown(self):
+        Config.PREPROCESSING_RETRIES = self._prev_retries
+        MockPreProcessTracksJob.PASS_ON_EXCEPTIONS = False
+
+    def _assertResults(self, numWorkers):
+        job = MockPreProcessTracksJob(numWorkers)
+        results = list(job._preProcessAllTracks())
+
+        # only transient errors are retried, and failed tracks get the legal track name
+        trackNames = [['ok', 'a'], ['flaky'], ['broken.track'], ['missing'], ['ok']]
+        self.assertEqual(trackNames, [result.trackName for result in results])
+        self.assertEqual([True, True, False, False, True], [result.isFinalized for result in results])
+        self.assertEqual([False, True, False, False, False], [result.anyWarnings for result in results])
+        self.assertEqual([None, None, ValueError, IOError, None],
+                         [result.exception.__class__ if result.exception else None for result in results])
+        self.assertTrue('broken track' in results[2].exceptionMsg)
+        self.assertTrue("raise ValueError('broken track')" in results[2].traceback)
+
+        self.assertTrue(job.process())
+        self.assertEqual(trackNames, job.subTrackCountOrder)
+
+    def testSequential(self):
+        self._assertResults(1)
+
+    def testParallel(self):
+        self._assertResults(2)
+
+    def testPassOnExceptions(self):
+        MockPreProcessTracksJob.PASS_ON_EXCEPTIONS = True
+        for numWorkers in [1, 2]:
+            self.assertRaises(ValueError, MockPreProcessTracksJob(numWorkers).process)
+
+        with self.assertRaises(ValueError) as context:
+            MockPreProcessTracksJob(2).process()
+        self.assertTrue('Traceback of worker process' in str(context.exception))
+        self.assertTrue("raise ValueError('broken track')" in str(context.exception))
+
+
+class FailingGESourceWrapper(GESourceWrapper):
+    def __init__(self, geSource, job):
+        GESourceWrapper.__init__(self, geSource)
+        self._job = job
+
+    def __iter__(self):
+        self._geIter = self._geSource.__iter__()
+        return self
+
+    def next(self):
+        ge = self._geIter.next()
+        self._job.countElement()
+        return ge
+
+
+class FailingPreProcessAllTracksJob(PreProcessAllTracksJob):
+    # Raises an IOError once, at the given element read from the original files or after finalizing
+    # the first overlap rule
+    def __init__(self, genome, trackName, failAtElement=None, failAfterFinalizing=False):
+        PreProcessAllTracksJob.__init__(self, genome, trackName, numWorkers=1)
+        self._elementsBeforeFailure = failAtElement
+        self._failAfterFinalizing = failAfterFinalizing
+
+    def _allGESources(self, trackName):
+        for geSource in PreProcessAllTracksJob._allGESources(self, trackName):
+            yield FailingGESourceWrapper(geSource, self)
+
+    def countElement(self):
+        if self._elementsBeforeFailure is not None:
+            self._elementsBeforeFailure -= 1
+            if self._elementsBeforeFailure == 0:
+                raise IOError(errno.EAGAIN, 'Failure while reading element')
+
+    def _finalizeOverlapRule(self, trackName, allowOverlaps):
+        PreProcessAllTracksJob._finalizeOverlapRule(self, trackName, allowOverlaps)
+        if self._failAfterFinalizing:
+            self._failAfterFinalizing = False
+            raise IOError(errno.EAGAIN, 'Failure after finalizing')
+
+
+class TestRetryAfterPartialPreProcessing(unittest.TestCase):
+    GENOME = 'testgenome'
+    TRACK_NAME = ['RetryTest']
+    LINES = ['chr21\t%d\t%d\tel%d\t5\t+' % (start, start + 100, start) for start in xrange(0, 5000, 70)]
+
+    def setUp(self):
+        self._prev_is_preprocessing = gtrackcore.preprocess.is_preprocessing
+        self._prev_retries = Config.PREPROCESSING_RETRIES
+        self._prev_output_block_size = gtrackcore.preprocess.pytables.OutputManager.OUTPUT_BLOCK_SIZE
+        Config.PREPROCESSING_RETRIES = 1
+        # so that rows are written to the table before the failures
+        gtrackcore.preprocess.pytables.OutputManager.OUTPUT_BLOCK_SIZE = 16
+
+    def tearDown(self):
+        gtrackcore.preprocess.is_preprocessing = self._prev_is_preprocessing
+        Config.PREPROCESSING_RETRIES = self._prev_retries
+        gtrackcore.preprocess.pytables.OutputManager.OUTPUT_BLOCK_SIZE = self._prev_output_block_size
+        self._removeTracks()
+
+    def _removeTracks(self):
+        DatabaseReader.close_unused_files()
+        for path in [createOrigPath(self.GENOME, self.TRACK_NAME), get_dir_path(self.GENOME, self.TRACK_NAME)]:
+            shutil.rmtree(path, ignore_errors=True)
+        for subTrackName in ['failing', 'reference']:
+            trackName = self.TRACK_NAME + [subTrackName]
+            TrackInfo(self.GENOME, trackName).removeEntryFromShelve()
+            if PreProcMetaDataCollector.hasKey(self.GENOME, trackName):
+                PreProcMetaDataCollector(self.GENOME, trackName).removeEntry()
+
+    def _preProcess(self, subTrackName, **kwArgs):
+        trackName = self.TRACK_NAME + [subTrackName]
+        origPath = createOrigPath(self.GENOME, trackName)
+        os.makedirs(origPath)
+        with open(os.path.join(origPath, 'track.bed'), 'w') as bedFile:
+            bedFile.write('\n'.join(self.LINES) + '\n')
+
+        self.assertTrue(FailingPreProcessAllTracksJob(self.GENOME, trackName, **kwArgs).process())
+        return readTrack(self.GENOME, trackName)
+
+    def testRetryAfterFailure(self):
+        # failing while gathering statistics, while writing the with overlaps table and after the
+        # c-arrays of the with overlaps rows are created
+        for kwArgs in [dict(failAtElement=10), dict(failAtElement=len(self.LINES) + 50),
+                       dict(failAfterFinalizing=True)]:
+            content = self._preProcess('failing', **kwArgs)
+            self.assertEqual(len(self.LINES), content[True, 'start'][1][0])
+            self.assertEqual(self._preProcess('reference'), content)
+            self._removeTracks()
+
+
+class FailingAppendToTrackJob(PreProcessAppendToTrackJob):
+    # Fails after the delta file is written to the original file, or when appending to the track
+    PASS_ON_EXCEPTIONS = False
+
+    def __init__(self, genome, trackName, deltaFn, failWhileAppendingDeltaFile=False):
+        PreProcessAppendToTrackJob.__init__(self, genome, trackName, deltaFn)
+        self._failWhileAppendingDeltaFile = failWhileAppendingDeltaFile
+
+    def _appendDeltaFile(self, origFn, numDeltaHeaderLines):
+        PreProcessAppendToTrackJob._appendDeltaFile(self, origFn, numDeltaHeaderLines)
+        if self._failWhileAppendingDeltaFile:
+            raise IOError('Failure while appending the delta file')
+
+    def _appendToPreProcessedTrack(self, trackName):
+        raise ValueError('Failure while appending')
+
+
+class TestPreProcessAppendToTrackJob(unittest.TestCase):
+    GENOME = 'testgenome'
+    TRACK_NAME = ['AppendTest', 'appended']
+    REBUILT_TRACK_NAME = ['AppendTest', 'rebuilt']
+
+    ORIG_LINES = ['chr21\t100\t200\ta\t5\t+', 'chr21\t150\t300\tb\t7\t-', 'chr21\t100\t200\tc\t1\t+',
+                  'chr21\t1000\t1100\td\t2\t+', 'chr21\t5000\t5010\te\t3\t-']
+    DELTA_LINES = ['chr21\t100\t200\tlong_name\t9\t-', 'chrM\t10\t20\tf\t4\t+', 'chr21\t120\t130\tg\t6\t+',
+                   'chrM\t15\t30\th\t8\t-', 'chr21\t4000\t4500\ti\t5\t+']
+
+    def setUp(self):
+        self._prev_is_preprocessing = gtrackcore.preprocess.is_preprocessing
+        self._tempDir = tempfile.mkdtemp()
+        self._deltaFn = os.path.join(self._tempDir, 'delta.bed')
+
+    def tearDown(self):
+        gtrackcore.preprocess.is_preprocessing = self._prev_is_preprocessing
+        DatabaseReader.close_unused_files()
+        for path in [self._tempDir, createOrigPath(self.GENOME, self.TRACK_NAME[:1]), get_dir_path(self.GENOME, self.TRACK_NAME[:1])]:
+            shutil.rmtree(path, ignore_errors=True)
+        for trackName in [self.TRACK_NAME, self.REBUILT_TRACK_NAME]:
+            TrackInfo(self.GENOME, trackName).removeEntryFromShelve()
+            if PreProcMetaDataCollector.hasKey(self.GENOME, trackName):
+                PreProcMetaDataCollector(self.GENOME, trackName).removeEntry()
+
+    def _writeFile(self, fn, lines):
+        if not os.path.exists(os.path.dirname(fn)):
+            os.makedirs(os.path.dirname(fn))
+        with open(fn, 'w') as bedFile:
+            bedFile.write('\n'.join(lines) + '\n')
+
+    def _assertAppendedEqualsRebuilt(self, origLines, deltaLines, numDeltaHeaderLines=0):
+        self._writeFile(os.path.join(createOrigPath(self.GENOME, self.TRACK_NAME), 'track.bed'), origLines)
+        self._writeFile(self._deltaFn, deltaLines)
+        combinedLines = origLines + deltaLines[numDeltaHeaderLines:]
+        self._writeFile(os.path.join(createOrigPath(self.GENOME, self.REBUILT_TRACK_NAME), 'track.bed'),
+                        combinedLines)
+
+        PreProcessAllTracksJob(self.GENOME, self.TRACK_NAME).process()
+        PreProcessAllTracksJob(self.GENOME, self.REBUILT_TRACK_NAME).process()
+        self.assertTrue(PreProcessAppendToTrackJob(self.GENOME, self.TRACK_NAME, self._deltaFn).process())
+
+        self.assertEqual(readTrackFile(self.GENOME, self.REBUILT_TRACK_NAME), readTrackFile(self.GENOME, self.TRACK_NAME))
+        self.assertEqual(readTrackInfos(self.GENOME, self.REBUILT_TRACK_NAME), readTrackInfos(self.GENOME, self.TRACK_NAME))
+
+        # the original file holds the combined data, and the track is up to date with it
+        origFn = os.path.join(createOrigPath(self.GENOME, self.TRACK_NAME), 'track.bed')
+        self.assertEqual(combinedLines, open(origFn).read().splitlines())
+        self.assertEqual(['track.bed'], os.listdir(createOrigPath(self.GENOME, self.TRACK_NAME)))
+        geSource = GenomeElementSource(origFn, self.GENOME, forPreProcessor=True)
+        for allowOverlaps in [True, False]:
+            self.assertFalse(PreProcessUtils.shouldPreProcessGESource(self.TRACK_NAME, geSource, allowOverlaps))
+
+    def testAppend(self):
+        self._assertAppendedEqualsRebuilt(self.ORIG_LINES, self.DELTA_LINES)
+
+    def testAppendToUnaffectedChromosome(self):
+        self._assertAppendedEqualsRebuilt(self.ORIG_LINES + ['chrM\t10\t20\tf\t4\t+'], self.DELTA_LINES[:1])
+
+    def testDeltaHeaderLines(self):
+        header = 'track name=appended'
+        self._assertAppendedEqualsRebuilt([header] + self.ORIG_LINES, [header] + self.DELTA_LINES,
+                                          numDeltaHeaderLines=1)
+
+        origFn = os.path.join(createOrigPath(self.GENOME, self.TRACK_NAME), 'track.bed')
+        origContent = open(origFn).read()
+        self._writeFile(self._deltaFn, ['track name=other'] + self.DELTA_LINES)
+        self.assertRaises(InvalidFormatError, PreProcessAppendToTrackJob(self.GENOME, self.TRACK_NAME, self._deltaFn).process)
+        self.assertEqual(origContent, open(origFn).read())
+
+    def testOrigFileIsUnchangedIfAppendFails(self):
+        origFn = os.path.join(createOrigPath(self.GENOME, self.TRACK_NAME), 'track.bed')
+        self._writeFile(origFn, self.ORIG_LINES)
+        self._writeFile(self._deltaFn, self.DELTA_LINES)
+        PreProcessAllTracksJob(self.GENOME, self.TRACK_NAME).process()
+        trackContent = readTrack(self.GENOME, self.TRACK_NAME)
+        origMTime = os.stat(origFn).st_mtime
+
+        self.assertRaises(IOError, FailingAppendToTrackJob(self.GENOME, self.TRACK_NAME, self._deltaFn,
+                                                           failWhileAppendingDeltaFile=True).process)
+        self.assertFalse(FailingAppendToTrackJob(self.GENOME, self.TRACK_NAME, self._deltaFn).process())
+        self.assertEqual(self.ORIG_LINES, open(origFn).read().splitlines())
+        self.assertAlmostEqual(origMTime, os.stat(origFn).st_mtime, places=5)
+        geSource = GenomeElementSource(origFn, self.GENOME, forPreProcessor=True)
+        self.assertFalse(PreProcessUtils.shouldPreProcessGESource(self.TRACK_NAME, geSource, True))
+        self.assertEqual(['track.bed'], os.listdir(createOrigPath(self.GENOME, self.TRACK_NAME)))
+        self.assertEqual(trackContent, readTrack(self.GENOME, self.TRACK_NAME))
+
+        # the delta is appended once when the job is run again
+        self.assertTrue(PreProcessAppendToTrackJob(self.GENOME, self.TRACK_NAME, self._deltaFn).process())
+        self.assertEqual(self.ORIG_LINES + self.DELTA_LINES, open(origFn).read().splitlines())
+
+
+class TestColumnBatchParsing(unittest.TestCase):
+    GENOME = 'testgenome'
+    TRACK_NAME = ['ColumnBatchTest']
+
+    def setUp(self):
+        self._prev_is_preprocessing = gtrackcore.preprocess.is_preprocessing
+        self._prev_column_batch_parsing = Config.COLUMN_BATCH_PARSING
+        self._prev_shard_workers = Config.CHROMOSOME_SHARD_WORKERS
+
+    def tearDown(self):
+        gtrackcore.preprocess.is_preprocessing = self._prev_is_preprocessing
+        Config.COLUMN_BATCH_PARSING = self._prev_column_batch_parsing
+        Config.CHROMOSOME_SHARD_WORKERS = self._prev_shard_workers
+        self._removeTracks()
+
+    def _removeTracks(self):
+        DatabaseReader.close_unused_files()
+        for path in [createOrigPath(self.GENOME, self.TRACK_NAME), get_dir_path(self.GENOME, self.TRACK_NAME)]:
+            shutil.rmtree(path, ignore_errors=True)
+        for subTrackName in ['elements', 'batches']:
+            trackName = self.TRACK_NAME + [subTrackName]
+            TrackInfo(self.GENOME, trackName).removeEntryFromShelve()
+            if PreProcMetaDataCollector.hasKey(self.GENOME, trackName):
+                PreProcMetaDataCollector(self.GENOME, trackName).removeEntry()
+
+    def _preProcess(self, fn, subTrackName, columnBatchParsing):
+        origPath = createOrigPath(self.GENOME, self.TRACK_NAME + [subTrackName])
+        os.makedirs(origPath)
+        shutil.copy(fn, origPath)
+
+        Config.COLUMN_BATCH_PARSING = columnBatchParsing
+        PreProcessAllTracksJob(self.GENOME, self.TRACK_NAME + [subTrackName]).process()
+        return readTrack(self.GENOME, self.TRACK_NAME + [subTrackName])
+
+    def testEqualToElementParsing(self):
+        sourceDir = os.path.join(os.path.dirname(gtrackcore.__file__), 'data', 'GESourceTracks')
+        for shardWorkers in [1, 2]:
+            Config.CHROMOSOME_SHARD_WORKERS = shardWorkers
+            for geSourceDir in ['BedGenomeElementSource', 'BedCategoryGenomeElementSource',
+                                'BedValuedGenomeElementSource', 'PointBedGenomeElementSource',
+                                'BedGraphGenomeElementSource', 'BedGraphTargetControlGenomeElementSource']:
+                fn = os.path.join(sourceDir, geSourceDir, sorted(os.listdir(os.path.join(sourceDir, geSourceDir)))[0])
+                self.assertEqual(self._preProcess(fn, 'elements', False), self._preProcess(fn, 'batches', True))
+                self._removeTracks()
+
+
+class TestNoOverlapsFromColumnArrays(unittest.TestCase):
+    GENOME = 'testgenome'
+    TRACK_NAME = ['NoOverlapsFromColumnArraysTest']
+
+    def setUp(self):
+        self._prev_is_preprocessing = gtrackcore.preprocess.is_preprocessing
+        self._prev_no_overlaps_from_column_arrays = Config.NO_OVERLAPS_FROM_COLUMN_ARRAYS
+
+    def tearDown(self):
+        gtrackcore.preprocess.is_preprocessing = self._prev_is_preprocessing
+        Config.NO_OVERLAPS_FROM_COLUMN_ARRAYS = self._prev_no_overlaps_from_column_arrays
+        self._removeTracks()
+
+    def _removeTracks(self):
+        DatabaseReader.close_unused_files()
+        for path in [createOrigPath(self.GENOME, self.TRACK_NAME), get_dir_path(self.GENOME, self.TRACK_NAME)]:
+            shutil.rmtree(path, ignore_errors=True)
+        for subTrackName in ['elements', 'columns']:
+            trackName = self.TRACK_NAME + [subTrackName]
+            TrackInfo(self.GENOME, trackName).removeEntryFromShelve()
+            if PreProcMetaDataCollector.hasKey(self.GENOME, trackName):
+                PreProcMetaDataCollector(self.GENOME, trackName).removeEntry()
+
+    def _preProcess(self, path, subTrackName, noOverlapsFromColumnArrays):
+        origPath = createOrigPath(self.GENOME, self.TRACK_NAME + [subTrackName])
+        if os.path.isdir(path):
+            shutil.copytree(path, origPath)
+        else:
+            os.makedirs(origPath)
+            shutil.copy(path, origPath)
+
+        Config.NO_OVERLAPS_FROM_COLUMN_ARRAYS = noOverlapsFromColumnArrays
+        PreProcessAllTracksJob(self.GENOME, self.TRACK_NAME + [subTrackName]).process()
+        return readTrack(self.GENOME, self.TRACK_NAME + [subTrackName])
+
+    def testEqualToClusteringElements(self):
+        # the sample tracks of sparse track types, as dense tracks have no with overlaps rows to cluster
+        dataDir = os.path.join(os.path.dirname(gtrackcore.__file__), 'data')
+        sourceDir = os.path.join(dataDir, 'GESourceTracks')
+        paths = [os.path.join(sourceDir, geSourceDir, fn)
+                 for geSourceDir in sorted(os.listdir(sourceDir))
+                 if geSourceDir not in ['FastaGenomeElementSource', 'HBFunctionGenomeElementSource',
+                                        'PositionIterGESource']
+                 for fn in sorted(os.listdir(os.path.join(sourceDir, geSourceDir)))] + \
+                [os.path.join(dataDir, 'integration_test_data', 'test_twofiles', 'linked_valued_segments')]
+
+        for path in paths:
+            self.assertEqual(self._preProcess(path, 'elements', False), self._preProcess(path, 'columns', True))
+            self._removeTracks()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from gtrackcore.core.Config import Config
+from gtrackcore.input.core.GenomeElement import GenomeElement
+from gtrackcore.preprocess.pytables.ChromosomeShards import ChromosomeShards
+
+
+class MockOutputManager(object):
+    def __init__(self):
+        self.rows = []
+
+    def writeRows(self, rows):
+        self.rows += rows.tolist()
+
+
+class TestChromosomeShards(unittest.TestCase):
+    DTYPE = numpy.dtype([('chr', 'S5'), ('start', 'int32'), ('end', 'int32'), ('val', 'float64'),
+                         ('edges', 'S2', (2,))])
+
+    def setUp(self):
+        self._prev_sort_buffer_size = Config.SORT_BUFFER_SIZE
+        self._temp_dir = tempfile.mkdtemp()
+
+        random = numpy.random.RandomState(0)
+        self._elements = []
+        for i in xrange(500):
+            start = int(random.randint(0, 50))
+            self._elements.append(GenomeElement('TestGenome', chr=['chr1', 'chr2', 'chr10'][random.randint(0, 3)],
+                                                start=start, end=start + int(random.randint(0, 3)), val=float(i),
+                                                edges=['e%d' % j for j in xrange(i % 3)]))
+
+    def tearDown(self):
+        Config.SORT_BUFFER_SIZE = self._prev_sort_buffer_size
+        shutil.rmtree(self._temp_dir)
+
+    def _get_expected_rows(self):
+        rows = [(el.chr, el.start, el.end, el.val, tuple(el.edges + [''] * (2 - len(el.edges))))
+                for el in self._elements]
+        return sorted(rows, key=lambda row: row[:3])
+
+    def _assert_merged_rows(self, num_workers):
+        shards = ChromosomeShards(['chr', 'start', 'end', 'val', 'edges'], self._temp_dir)
+        for el in self._elements:
+            shards.append_element(el)
+        self.assertEqual(3, len(shards))
+
+        output = MockOutputManager()
+        shards.write_shards(self.DTYPE, {'edges': numpy.array(['', ''])}, num_workers)
+        shards.merge_shards(output)
+        shards.remove()
+
+        self.assertEqual(self._get_expected_rows(), [(row[0], row[1], row[2], row[3], tuple(row[4]))
+                                                     for row in output.rows])
+        self.assertEqual([], os.listdir(self._temp_dir))
+
+    def testWriteAndMergeShards(self):
+        self._assert_merged_rows(1)
+
+    def testWriteAndMergeShardsInParallel(self):
+        self._assert_merged_rows(2)
+
+    def testExternalSortOfShards(self):
+        Config.SORT_BUFFER_SIZE = 2000
+        self._assert_merged_rows(2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from gtrackcore.preprocess.pytables.ColumnSpill import ColumnSpill
+
+
+class MockGenomeElement(object):
+    def __init__(self, **kwArgs):
+        self.__dict__.update(kwArgs)
+
+
+class TestColumnSpill(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._temp_dir)
+
+    def testAppendElements(self):
+        spill = ColumnSpill(['chr', 'start', 'edges', 'name'], self._temp_dir, block_size=3)
+        for i in xrange(7):
+            spill.append_element(MockGenomeElement(chr='chr%d' % i, start=i * 10, edges=['e'] * (i % 3),
+                                                   extra={'name': 'x' * i}))
+        self.assertEqual(7, len(spill))
+
+        blocks = list(spill.iter_blocks())
+        self.assertEqual([3, 3, 1], [len(block['start']) for block in blocks])
+
+        columns = dict((column, numpy.concatenate([block[column] for block in blocks]))
+                       for column in ['chr', 'start', 'edges', 'name'])
+        self.assertEqual(['chr%d' % i for i in xrange(7)], columns['chr'].tolist())
+        self.assertEqual(range(0, 70, 10), columns['start'].tolist())
+        self.assertEqual([i % 3 for i in xrange(7)], [len(edges) for edges in columns['edges']])
+        self.assertEqual(['x' * i for i in xrange(7)], columns['name'].tolist())
+
+        spill.remove()
+        self.assertEqual([], os.listdir(self._temp_dir))
+
+    def testAppendSlices(self):
+        spill = ColumnSpill(['chr', 'val'], self._temp_dir, block_size=5)
+        spill.append_slice(MockGenomeElement(chr='chr1', val=numpy.arange(4.0)))
+        spill.append_slice(MockGenomeElement(chr='chr2', val=numpy.arange(3.0)))
+
+        blocks = list(spill.iter_blocks())
+        self.assertEqual(1, len(blocks))
+        self.assertEqual(['chr1'] * 4 + ['chr2'] * 3, blocks[0]['chr'].tolist())
+        self.assertEqual([0.0, 1.0, 2.0, 3.0, 0.0, 1.0, 2.0], blocks[0]['val'].tolist())
+        spill.remove()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+import shutil
+import unittest
+
+import numpy
+
+import gtrackcore.preprocess
+import gtrackcore.test
+from gtrackcore.core.Config import Config
+from gtrackcore.test.common.Asserts import TestCaseWithImprovedAsserts
+from gtrackcore.preprocess.pytables.CommonTableFunctions import sort_preprocessed_table, create_c_arrays_from_table, \
+    sort_preprocessed_table_into_c_arrays, convert_to_columnar_storage
+from gtrackcore.track.pytables.PrefixSums import create_prefix_sums, get_prefix_sum_node_names
+from gtrackcore.track.pytables.database.Database import DatabaseWriter
+from gtrackcore.util.CommonFunctions import get_dir_path
+from gtrackcore.util.pytables.NameFunctions import get_database_filename, get_track_table_node_names, \
+    get_array_group_node_names
+
+
+class TestSortPreprocessedTable(unittest.TestCase):
+    GENOME = 'TestGenome'
+    TRACK_NAME = ['SortTest', 'segments']
+
+    def setUp(self):
+        self._prev_sort_buffer_size = Config.SORT_BUFFER_SIZE
+        self._table_node_names = get_track_table_node_names(self.GENOME, self.TRACK_NAME, True)
+        self._rows = numpy.array([('chr2', 10, 20, 1.0), ('chr1', 30, 40, 2.0), ('chr1', 5, 50, 3.0),
+                                  ('chr1', 5, 8, 4.0), ('chr2', 0, 1, 5.0)],
+                                 dtype=[('chr', 'S4'), ('start', 'int32'), ('end', 'int32'), ('val', 'float64')])
+
+    def tearDown(self):
+        Config.SORT_BUFFER_SIZE = self._prev_sort_buffer_size
+        shutil.rmtree(get_dir_path(self.GENOME, self.TRACK_NAME), ignore_errors=True)
+
+    def _write_table(self, rows):
+        db_writer = DatabaseWriter(get_database_filename(self.GENOME, self.TRACK_NAME, allow_overlaps=True,
+                                                         create_path=True))
+        db_writer.open()
+        db_writer.create_table(self._table_node_names, rows.dtype, len(rows))
+        db_writer.get_table(self._table_node_names).append(rows)
+        db_writer.close()
+
+    def _sort_and_read_table(self):
+        sort_preprocessed_table(self.GENOME, self.TRACK_NAME, True)
+        db_writer = DatabaseWriter(get_database_filename(self.GENOME, self.TRACK_NAME, allow_overlaps=True))
+        db_writer.open()
+        table = db_writer.get_table(self._table_node_names)
+        column_names, rows = table.colnames, table.read()
+        db_writer.close()
+        return column_names, rows
+
+    def _assert_sorted_table(self, rows):
+        column_names, sorted_rows = self._sort_and_read_table()
+        self.assertEqual(['start', 'end', 'val'], column_names)
+
+        expected_rows = sorted(rows.tolist())
+        self.assertEqual([row[1:] for row in expected_rows], sorted_rows.tolist())
+
+    def testExternalSort(self):
+        Config.SORT_BUFFER_SIZE = 1
+        self._write_table(self._rows)
+        self._assert_sorted_table(self._rows)
+
+    def testSortInMemory(self):
+        self._write_table(self._rows)
+        self._assert_sorted_table(self._rows)
+
+    def testAlreadySorted(self):
+        Config.SORT_BUFFER_SIZE = 50
+        sorted_rows = numpy.sort(self._rows, order=['chr', 'start', 'end'])
+        self._write_table(sorted_rows)
+        self._assert_sorted_table(sorted_rows)
+
+
+class TestCreateCArraysFromTable(TestCaseWithImprovedAsserts):
+    GENOME = 'TestGenome'
+    TRACK_NAME = ['CArrayTest', 'segments']
+
+    def setUp(self):
+        self._prev_store_val_prefix_sums = Config.STORE_VAL_PREFIX_SUMS
+        Config.STORE_VAL_PREFIX_SUMS = True
+
+        self._rows = numpy.zeros(25, dtype=[('start', 'int32'), ('end', 'int32'), ('val', 'float64'),
+                                            ('edges', 'S3', (2,))])
+        self._rows['start'] = numpy.arange(25) * 10
+        self._rows['end'] = self._rows['start'] + 5
+        self._rows['val'] = numpy.linspace(0.1, 2.5, 25)
+        self._rows['val'][::4] = numpy.nan
+        self._rows['edges'][::3] = ['a', 'bb']
+
+        db_writer = DatabaseWriter(get_database_filename(self.GENOME, self.TRACK_NAME, allow_overlaps=True,
+                                                         create_path=True))
+        db_writer.open()
+        table_node_names = get_track_table_node_names(self.GENOME, self.TRACK_NAME, True)
+        db_writer.create_table(table_node_names, self._rows.dtype, len(self._rows))
+        db_writer.get_table(table_node_names).append(self._rows)
+        db_writer.close()
+
+    def tearDown(self):
+        Config.STORE_VAL_PREFIX_SUMS = self._prev_store_val_prefix_sums
+        shutil.rmtree(get_dir_path(self.GENOME, self.TRACK_NAME), ignore_errors=True)
+
+    def testCreateCArraysInBlocks(self):
+        # blocks of 3 rows
+        create_c_arrays_from_table(self.GENOME, self.TRACK_NAME, True, max_block_bytes=3 * self._rows.itemsize)
+
+        db_writer = DatabaseWriter(get_database_filename(self.GENOME, self.TRACK_NAME, allow_overlaps=True))
+        db_writer.open()
+        array_group_node_names = get_array_group_node_names(self.GENOME, self.TRACK_NAME, True)
+        for column in self._rows.dtype.names:
+            c_array = db_writer.get_node(array_group_node_names + [column]).read()
+            self.assertEqual(self._rows[column].dtype, c_array.dtype)
+            self.assertListsOrDicts(self._rows[column].tolist(), c_array.tolist())
+
+        sums, counts = create_prefix_sums(self._rows['val'])
+        sum_node_names, count_node_names = get_prefix_sum_node_names(array_group_node_names + ['val'])
+        self.assertEqual(sums.tolist(), db_writer.get_node(sum_node_names).read().tolist())
+        self.assertEqual(counts.tolist(), db_writer.get_node(count_node_names).read().tolist())
+        db_writer.close()
+
+
+class TestColumnarStorage(unittest.TestCase):
+    GENOME = 'TestGenome'
+    TRACK_NAME = ['ColumnarTest', 'segments']
+
+    def setUp(self):
+        # as when preprocessing, so that reading the track info does not keep the file open
+        self._prev_is_preprocessing = gtrackcore.preprocess.is_preprocessing
+        gtrackcore.preprocess.is_preprocessing = True
+        self._rows = numpy.array([('chr2', 10, 20, 1.0), ('chr1', 30, 40, 2.0), ('chr1', 5, 50, 3.0),
+                                  ('chr1', 5, 8, 4.0), ('chr2', 0, 1, 5.0)],
+                                 dtype=[('chr', 'S4'), ('start', 'int32'), ('end', 'int32'), ('val', 'float64')])
+
+    def tearDown(self):
+        gtrackcore.preprocess.is_preprocessing = self._prev_is_preprocessing
+        shutil.rmtree(get_dir_path(self.GENOME, self.TRACK_NAME), ignore_errors=True)
+
+    def _write_table(self, database_filename, allow_overlaps, rows):
+        db_writer = DatabaseWriter(database_filename)
+        db_writer.open()
+        table_node_names = get_track_table_node_names(self.GENOME, self.TRACK_NAME, allow_overlaps)
+        db_writer.create_table(table_node_names, rows.dtype, len(rows))
+        db_writer.get_table(table_node_names).append(rows)
+        db_writer.close()
+
+    def _read_c_arrays(self, database_filename, allow_overlaps):
+        db_writer = DatabaseWriter(database_filename)
+        db_writer.open()
+        self.assertFalse(db_writer.table_exists(get_track_table_node_names(self.GENOME, self.TRACK_NAME,
+                                                                           allow_overlaps)))
+        array_group_node_names = get_array_group_node_names(self.GENOME, self.TRACK_NAME, allow_overlaps)
+        c_arrays = dict((name, db_writer.get_node(array_group_node_names + [name]).read().tolist())
+                        for name in db_writer.get_leaf_names(array_group_node_names))
+        db_writer.close()
+        return c_arrays
+
+    def testSortPreprocessedTableIntoCArrays(self):
+        database_filename = get_database_filename(self.GENOME, self.TRACK_NAME, allow_overlaps=True,
+                                                  create_path=True)
+        self._write_table(database_filename, True, self._rows)
+        sort_preprocessed_table_into_c_arrays(self.GENOME, self.TRACK_NAME, True)
+
+        sorted_rows = numpy.sort(self._rows, order=['chr', 'start', 'end'])
+        self.assertEqual(dict((column, sorted_rows[column].tolist()) for column in ['start', 'end', 'val']),
+                         self._read_c_arrays(database_filename, True))
+
+    def testConvertToColumnarStorage(self):
+        sorted_rows = numpy.sort(self._rows, order=['chr', 'start', 'end'])[['start', 'end', 'val']]
+        database_filename = get_database_filename(self.GENOME, self.TRACK_NAME, create_path=True)
+        for allow_overlaps in [True, False]:
+            self._write_table(database_filename, allow_overlaps, sorted_rows)
+        # the c-arrays of the no-overlaps table are missing, and are created by the conversion
+        create_c_arrays_from_table(self.GENOME, self.TRACK_NAME, True)
+
+        self.assertTrue(convert_to_columnar_storage(self.GENOME, self.TRACK_NAME))
+        for allow_overlaps in [True, False]:
+            self.assertEqual(dict((column, sorted_rows[column].tolist()) for column in ['start', 'end', 'val']),
+                             self._read_c_arrays(database_filename, allow_overlaps))
+
+        self.assertFalse(convert_to_columnar_storage(self.GENOME, self.TRACK_NAME))
+
+
+if __name__ == "__main__":
+    unittest.main()
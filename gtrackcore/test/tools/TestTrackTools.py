@@ -2,10 +2,13 @@ import os
 import unittest
 import itertools
 
+import numpy
+
 from gtrackcore.core.LogSetup import logMessage
 from gtrackcore.preprocess.PreProcessTracksJob import PreProcessAllTracksJob
 from gtrackcore.tools.TrackOperations import coverage, overlap, overlap_iter, count_elements, \
-    count_elements_in_all_bounding_regions, sum_of_values, sum_of_weights, sum_of_weights_iter
+    count_elements_in_all_bounding_regions, sum_of_values, sum_of_weights, sum_of_weights_iter, get_track_view, \
+    get_track_views, sums_and_counts_of_values, summaries_of_values
 from gtrackcore.track.core.GenomeRegion import GenomeRegion
 from gtrackcore.util.CommonFunctions import createOrigPath
 
@@ -113,6 +116,67 @@ class TestTrackTools(unittest.TestCase):
         self.assertAlmostEqual(result, result_should_be, msg='sum of values result was %f, but should be %f for track '
                                                              '%s' % (result, result_should_be,
                                                                      ':'.join(track_data['track_name'])), places=2)
+    def test_get_track_views(self):
+        bins = [GenomeRegion('testgenome', 'chr21', start, start + 60) for start in xrange(0, 300, 50)] + \
+               [GenomeRegion('testgenome', 'chrM', 150, 200), GenomeRegion('testgenome', 'chr21', 2, 4),
+                GenomeRegion('testgenome', 'chrM', 0, 1)]
+
+        for track_key, allow_overlaps in [('segment1', False), ('segment1', True), ('valued_segment1', True),
+                                          ('genome_partition1', False), ('function1', False)]:
+            track_name = all_test_track_data[track_key]['track_name']
+            regions = [region for region in bins
+                       if any(region.chr == br.chr and br.start <= region.start and region.end <= br.end
+                              for br in all_test_track_data[track_key]['genome_regions'])]
+
+            track_views = get_track_views(track_name, allow_overlaps, regions)
+            self.assertEqual(len(regions), len(track_views))
+
+            for region, track_view in zip(regions, track_views):
+                single_track_view = get_track_view(track_name, allow_overlaps, region)
+                self.assertEqual(single_track_view.getNumElements(), track_view.getNumElements())
+                for as_numpy_array in ['startsAsNumpyArray', 'endsAsNumpyArray', 'valsAsNumpyArray']:
+                    single_array = getattr(single_track_view, as_numpy_array)()
+                    array = getattr(track_view, as_numpy_array)()
+                    self.assertEqual(None if single_array is None else list(single_array),
+                                     None if array is None else list(array))
+                self.assertEqual([(el.start(), el.end(), el.val()) for el in single_track_view],
+                                 [(el.start(), el.end(), el.val()) for el in track_view])
+
+    def test_sums_and_counts_of_values(self):
+        bins = [GenomeRegion('testgenome', 'chr21', start, start + 60) for start in xrange(0, 300, 50)] + \
+               [GenomeRegion('testgenome', 'chr21', start, end) for start, end in [(0, 5), (1, 3), (2, 2), (4, 5)]] + \
+               [GenomeRegion('testgenome', 'chrM', 0, 1), GenomeRegion('testgenome', 'chrM', 0, 2)]
+
+        for track_key, allow_overlaps in [('valued_segment1', True), ('function1', False)]:
+            track_name = all_test_track_data[track_key]['track_name']
+            regions = [region for region in bins
+                       if any(region.chr == br.chr and br.start <= region.start and region.end <= br.end
+                              for br in all_test_track_data[track_key]['genome_regions'])]
+
+            sums, counts = sums_and_counts_of_values(track_name, allow_overlaps, regions)
+            self.assertEqual(len(regions), len(sums))
+
+            for region, sum, count in zip(regions, sums, counts):
+                vals = get_track_view(track_name, allow_overlaps, region).valsAsNumpyArray()
+                self.assertAlmostEqual(numpy.nansum(vals), sum, places=4)
+                self.assertEqual(numpy.count_nonzero(~numpy.isnan(vals)), count)
+
+    def test_summaries_of_values(self):
+        track_name = all_test_track_data['function1']['track_name']
+        regions = [GenomeRegion('testgenome', 'chr21', 0, 5), GenomeRegion('testgenome', 'chr21', 1, 3),
+                   GenomeRegion('testgenome', 'chrM', 0, 2), GenomeRegion('testgenome', 'chrM', 1, 1)]
+
+        for bin_size in [None, 1000]:
+            summaries = summaries_of_values(track_name, regions, bin_size)
+            self.assertEqual(len(regions), len(summaries))
+
+            for region, summary in zip(regions, summaries):
+                vals = get_track_view(track_name, False, region).valsAsNumpyArray()
+                self.assertEqual((len(vals), vals.sum(), (vals * vals).sum()),
+                                 (summary['count'], summary['sum'], summary['sum_of_squares']))
+                if len(vals) > 0:
+                    self.assertEqual((vals.min(), vals.max()), (summary['min'], summary['max']))
+
 
 all_test_track_data = {
     'segment1': {
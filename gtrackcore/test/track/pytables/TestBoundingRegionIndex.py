@@ -0,0 +1,79 @@
+import unittest
+
+import numpy
+
+from gtrackcore.track.pytables.database.Queries import BoundingRegionIndex
+
+
+class _TableStub(object):
+    def __init__(self, rows):
+        self._rows = rows
+
+    def read(self):
+        return self._rows
+
+
+class TestBoundingRegionIndex(unittest.TestCase):
+    BOUNDING_REGIONS = [('chr1', 10, 20, 0, 2, 2), ('chr1', 30, 50, 2, 5, 3), ('chr1', 70, 100, 5, 5, 0),
+                        ('chr2', 0, 40, 5, 9, 4)]
+
+    def setUp(self):
+        self._br_index = self._create_br_index(self.BOUNDING_REGIONS)
+
+    @staticmethod
+    def _create_br_index(bounding_regions):
+        rows = numpy.array(bounding_regions, dtype=[('chr', 'S4'), ('start', 'int64'), ('end', 'int64'),
+                                                    ('start_index', 'int64'), ('end_index', 'int64'),
+                                                    ('element_count', 'int64')])
+        return BoundingRegionIndex(_TableStub(rows))
+
+    def _brute_force(self, chr, condition):
+        return [(br[1], br[2]) for br in self.BOUNDING_REGIONS if br[0] == chr and condition(br[1], br[2])]
+
+    def _assert_bounding_regions(self, expected, bounding_regions):
+        self.assertEqual(expected, [(br['start'], br['end']) for br in bounding_regions])
+
+    def testQueries(self):
+        for chr in ['chr1', 'chr2', 'chr3']:
+            for region_start in xrange(0, 110, 5):
+                for region_end in xrange(region_start, 110, 5):
+                    self._assert_bounding_regions(
+                        self._brute_force(chr, lambda start, end: start <= region_start and end >= region_end),
+                        self._br_index.enclosing(chr, region_start, region_end))
+                    self._assert_bounding_regions(
+                        self._brute_force(chr, lambda start, end: start >= region_start and end < region_end),
+                        self._br_index.enclosed_by(chr, region_start, region_end))
+                    self._assert_bounding_regions(
+                        self._brute_force(chr, lambda start, end: start < region_end and end > region_start),
+                        self._br_index.touched_by(chr, region_start, region_end))
+
+    def testEnclosingPositions(self):
+        region_starts = numpy.array([0, 10, 35, 50, 60, 75])
+        region_ends = numpy.array([5, 20, 40, 51, 65, 100])
+        self.assertEqual([-1, 0, 1, -1, -1, 2],
+                         list(self._br_index.enclosing_positions('chr1', region_starts, region_ends)))
+        self.assertEqual([-1] * 6, list(self._br_index.enclosing_positions('chr3', region_starts, region_ends)))
+
+    def testElementCountAndAll(self):
+        self.assertEqual(5, self._br_index.element_count_for_chr('chr1'))
+        self.assertEqual(4, self._br_index.element_count_for_chr('chr2'))
+        self.assertEqual(0, self._br_index.element_count_for_chr('chr3'))
+        self.assertEqual([br[:5] for br in self.BOUNDING_REGIONS],
+                         [(br['chr'], br['start'], br['end'], br['start_index'], br['end_index'])
+                          for br in self._br_index.all()])
+
+
+    def testChrsInTableOrder(self):
+        bounding_regions = [('chr2', 0, 40, 0, 4, 4), ('chr1', 10, 20, 4, 6, 2), ('chr1', 30, 50, 6, 9, 3),
+                            ('chrX', 5, 15, 9, 10, 1)]
+        br_index = self._create_br_index(bounding_regions)
+        self.assertEqual([br[:5] for br in bounding_regions],
+                         [(br['chr'], br['start'], br['end'], br['start_index'], br['end_index'])
+                          for br in br_index.all()])
+        self.assertEqual([-1, 0, 1], list(br_index.enclosing_positions('chr1', numpy.array([0, 10, 35]),
+                                                                       numpy.array([5, 20, 40]))))
+        self.assertEqual(0, len(self._create_br_index([]).all()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+import tables
+
+from gtrackcore.core.Config import Config
+from gtrackcore.track.pytables.ColumnChunkCache import ColumnChunkCache
+from gtrackcore.track.pytables.database.Database import DatabaseReader, DatabaseWriter
+from gtrackcore.util.pytables.Constants import COLUMN_CHUNK_LENGTH
+
+
+class TestColumnChunkCache(unittest.TestCase):
+    def setUp(self):
+        self._prev_cache_size = Config.COLUMN_CHUNK_CACHE_SIZE
+        Config.COLUMN_CHUNK_CACHE_SIZE = 2 * COLUMN_CHUNK_LENGTH * numpy.dtype('int32').itemsize
+        ColumnChunkCache.clear()
+
+        self._temp_dir = tempfile.mkdtemp()
+        self._filename = os.path.join(self._temp_dir, 'track.h5')
+        self._values = numpy.arange(3 * COLUMN_CHUNK_LENGTH + 100, dtype='int32')
+        h5_file = tables.open_file(self._filename, mode='w')
+        h5_file.create_carray(h5_file.root, 'values', obj=self._values)
+        h5_file.close()
+
+        self._db_reader = DatabaseReader(self._filename)
+        self._db_reader.open()
+
+    def tearDown(self):
+        self._db_reader.close()
+        self._db_reader._close_file()
+        del DatabaseReader._db_readers[self._filename]
+        ColumnChunkCache.clear()
+        Config.COLUMN_CHUNK_CACHE_SIZE = self._prev_cache_size
+        shutil.rmtree(self._temp_dir)
+
+    def _read(self, start_index, end_index):
+        return ColumnChunkCache.read(self._db_reader, ['values'], start_index, end_index)
+
+    def testRead(self):
+        for start_index, end_index in [(0, 10), (COLUMN_CHUNK_LENGTH - 5, COLUMN_CHUNK_LENGTH + 5),
+                                       (3 * COLUMN_CHUNK_LENGTH, 3 * COLUMN_CHUNK_LENGTH + 200), (20, 10),
+                                       (0, 3 * COLUMN_CHUNK_LENGTH + 100)]:
+            self.assertEqual(self._values[start_index:end_index].tolist(), self._read(start_index, end_index).tolist())
+
+    def testReadWithinChunkIsViewOfChunk(self):
+        result = self._read(COLUMN_CHUNK_LENGTH + 10, COLUMN_CHUNK_LENGTH + 20)
+        self.assertFalse(result.flags.owndata)
+        self.assertFalse(result.flags.writeable)
+
+        result = self._read(COLUMN_CHUNK_LENGTH - 5, COLUMN_CHUNK_LENGTH + 5)
+        self.assertTrue(result.flags.writeable)
+
+    def testHitsAndEvictions(self):
+        self._read(0, 10)
+        self._read(10, 20)
+        statistics = ColumnChunkCache.get_statistics()
+        self.assertEqual((1, 1, 0), (statistics['hits'], statistics['misses'], statistics['evictions']))
+
+        self._read(COLUMN_CHUNK_LENGTH, 2 * COLUMN_CHUNK_LENGTH + 1)
+        statistics = ColumnChunkCache.get_statistics()
+        self.assertEqual((1, 3, 1), (statistics['hits'], statistics['misses'], statistics['evictions']))
+        self.assertEqual(2, statistics['num_chunks'])
+        self.assertTrue(statistics['size_in_bytes'] <= Config.COLUMN_CHUNK_CACHE_SIZE)
+
+    def testInvalidatedOnWrite(self):
+        self._read(0, 10)
+        self._db_reader._close_file()
+        db_writer = DatabaseWriter(self._filename)
+        db_writer.open()
+        db_writer.close()
+        self.assertEqual(0, ColumnChunkCache.get_statistics()['num_chunks'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+import tables
+
+from gtrackcore.core.Config import Config
+from gtrackcore.track.pytables.ColumnMemmaps import ColumnMemmaps
+from gtrackcore.track.pytables.database.Database import DatabaseReader, DatabaseWriter
+
+
+class TestColumnMemmaps(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = tempfile.mkdtemp()
+        self._filename = os.path.join(self._temp_dir, 'track.h5')
+        self._values = numpy.arange(1000, dtype='int64')
+        self._filenames = [self._filename]
+        self._prev_max_open_files = Config.MAX_OPEN_DATABASE_FILES
+
+        self._write_file(self._filename, self._values)
+        self._db_reader = DatabaseReader(self._filename)
+
+    def tearDown(self):
+        Config.MAX_OPEN_DATABASE_FILES = self._prev_max_open_files
+        for filename in self._filenames:
+            if filename in DatabaseReader._db_readers:
+                DatabaseReader._db_readers[filename]._close_file()
+                del DatabaseReader._db_readers[filename]
+            ColumnMemmaps.invalidate(filename)
+        shutil.rmtree(self._temp_dir)
+
+    def _write_file(self, filename, values):
+        db_writer = DatabaseWriter(filename)
+        db_writer.open()
+        db_writer.create_c_array_from_array(['columns', 'contiguous'], values)
+        db_writer.create_c_array_from_array(['columns', 'compressed'], values,
+                                            filters=tables.Filters(complevel=1, complib='zlib'))
+        db_writer.create_c_array_from_array(['columns', 'strings'], numpy.array(['a', 'bc', 'def']))
+        db_writer.close()
+
+    def _get_num_open_file_descriptors(self, filename):
+        fd_dir = '/proc/self/fd'
+        num_fds = 0
+        for fd in os.listdir(fd_dir):
+            try:
+                num_fds += os.readlink(os.path.join(fd_dir, fd)) == filename
+            except OSError:
+                pass
+        return num_fds
+
+    def testContiguousColumnIsMemoryMapped(self):
+        memmap = ColumnMemmaps.get(self._db_reader, ['columns', 'contiguous'])
+        self.assertEqual(self._values.tolist(), memmap.tolist())
+        self.assertFalse(memmap.flags.writeable)
+        self.assertTrue(ColumnMemmaps.get(self._db_reader, ['columns', 'contiguous']) is memmap)
+
+        self.assertEqual(['a', 'bc', 'def'], ColumnMemmaps.get(self._db_reader, ['columns', 'strings']).tolist())
+
+    def testCompressedColumnFallsBack(self):
+        self.assertTrue(ColumnMemmaps.get(self._db_reader, ['columns', 'compressed']) is None)
+
+    def testMappingsFollowOpenFiles(self):
+        if not os.path.isdir('/proc/self/fd'):
+            self.skipTest('Open file descriptors are not listed in /proc')
+
+        Config.MAX_OPEN_DATABASE_FILES = 2
+        for i in xrange(1, 4):
+            filename = os.path.join(self._temp_dir, 'track%d.h5' % i)
+            self._filenames.append(filename)
+            self._write_file(filename, self._values + i)
+
+        for filename in self._filenames:
+            memmap = ColumnMemmaps.get(DatabaseReader(filename), ['columns', 'contiguous'])
+            self.assertEqual(int(self._values[0]) + self._filenames.index(filename), memmap[0])
+            del memmap
+
+            self.assertTrue(set(ColumnMemmaps.get_mapped_filenames()) <= set(DatabaseReader.get_open_filenames()))
+            self.assertTrue(len(ColumnMemmaps.get_mapped_filenames()) <= 2)
+
+        self.assertEqual(0, self._get_num_open_file_descriptors(self._filenames[0]))
+        self.assertTrue(self._get_num_open_file_descriptors(self._filenames[-1]) > 0)
+
+    def testReplacedFileIsMappedAgain(self):
+        memmap = ColumnMemmaps.get(self._db_reader, ['columns', 'contiguous'])
+
+        # as when a file is preprocessed again by another process
+        new_values = numpy.arange(2000, dtype='int64') * 2
+        new_filename = os.path.join(self._temp_dir, 'new_track.h5')
+        self._write_file(new_filename, new_values)
+        os.rename(new_filename, self._filename)
+
+        # the file that the reader has open is still mapped, until the reader reopens the file
+        self.assertTrue(ColumnMemmaps.get(self._db_reader, ['columns', 'contiguous']) is memmap)
+
+        DatabaseReader.close_unused_files()
+        self.assertEqual(new_values.tolist(), ColumnMemmaps.get(self._db_reader, ['columns', 'contiguous']).tolist())
+        self.assertEqual(self._values.tolist(), memmap.tolist())
+
+    def testMappedColumnIsReadWithoutSystemCalls(self):
+        memmap = ColumnMemmaps.get(self._db_reader, ['columns', 'contiguous'])
+
+        stat_calls = []
+        orig_stat = os.stat
+        os.stat = lambda *args: stat_calls.append(args) or orig_stat(*args)
+        try:
+            for i in xrange(10):
+                self.assertTrue(ColumnMemmaps.get(self._db_reader, ['columns', 'contiguous']) is memmap)
+        finally:
+            os.stat = orig_stat
+
+        self.assertEqual([], stat_calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
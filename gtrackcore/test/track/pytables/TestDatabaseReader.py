@@ -0,0 +1,87 @@
+from collections import OrderedDict
+import os
+import shutil
+import tempfile
+import unittest
+
+import tables
+
+import gtrackcore.preprocess
+from gtrackcore.core.Config import Config
+from gtrackcore.track.pytables.database.Database import DatabaseReader
+
+
+class TestDatabaseReader(unittest.TestCase):
+    NUM_FILES = 4
+
+    def setUp(self):
+        self._prev_max_open_files = Config.MAX_OPEN_DATABASE_FILES
+        Config.MAX_OPEN_DATABASE_FILES = 2
+        self._prev_open_db_readers = DatabaseReader._open_db_readers
+        self._prev_is_preprocessing = gtrackcore.preprocess.is_preprocessing
+        gtrackcore.preprocess.is_preprocessing = False
+        DatabaseReader._open_db_readers = OrderedDict()
+
+        self._temp_dir = tempfile.mkdtemp()
+        self._filenames = []
+        for i in xrange(self.NUM_FILES):
+            filename = os.path.join(self._temp_dir, 'track%s.h5' % i)
+            h5_file = tables.open_file(filename, mode='w')
+            h5_file.create_array(h5_file.root, 'values', obj=range(i + 1))
+            h5_file.close()
+            self._filenames.append(filename)
+
+    def tearDown(self):
+        for filename in self._filenames:
+            db_reader = DatabaseReader(filename)
+            db_reader._usage_count = 0
+            db_reader._close_file()
+            del DatabaseReader._db_readers[filename]
+            DatabaseReader._evicted_filenames.discard(filename)
+        DatabaseReader._open_db_readers = self._prev_open_db_readers
+        gtrackcore.preprocess.is_preprocessing = self._prev_is_preprocessing
+        shutil.rmtree(self._temp_dir)
+        Config.MAX_OPEN_DATABASE_FILES = self._prev_max_open_files
+
+    def _read_values(self, filename):
+        db_reader = DatabaseReader(filename)
+        db_reader.open()
+        values = list(db_reader.get_node(['values'])[:])
+        db_reader.close()
+        return values
+
+    def _num_open_test_files(self):
+        return len(set(DatabaseReader.get_open_filenames()) & set(self._filenames))
+
+    def testPoolIsBounded(self):
+        for i, filename in enumerate(self._filenames):
+            self.assertEqual(range(i + 1), self._read_values(filename))
+            self.assertTrue(self._num_open_test_files() <= 2)
+
+        self.assertEqual(set(self._filenames[:2]), DatabaseReader.get_evicted_filenames() & set(self._filenames))
+
+    def testEvictedFileIsReopened(self):
+        for filename in self._filenames:
+            self._read_values(filename)
+        self.assertTrue(self._filenames[0] in DatabaseReader.get_evicted_filenames())
+        self.assertEqual([0], self._read_values(self._filenames[0]))
+        self.assertEqual([0], self._read_values(self._filenames[0]))
+        self.assertFalse(self._filenames[0] in DatabaseReader.get_evicted_filenames())
+
+        statistics = DatabaseReader.get_file_handle_statistics()[self._filenames[0]]
+        self.assertEqual(2, statistics['misses'])
+        self.assertEqual(1, statistics['hits'])
+
+    def testFilesInUseAreNotEvicted(self):
+        db_reader = DatabaseReader(self._filenames[0])
+        db_reader.open()
+        for filename in self._filenames[1:]:
+            self._read_values(filename)
+
+        self.assertTrue(db_reader.h5_file.isopen)
+        self.assertEqual([0], list(db_reader.get_node(['values'])[:]))
+        db_reader.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
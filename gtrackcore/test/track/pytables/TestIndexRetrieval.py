@@ -0,0 +1,74 @@
+import unittest
+
+import numpy
+
+from gtrackcore.track.pytables.database.IndexRetrieval import segment_index_range, point_index_range, \
+    partition_index_range, segment_index_ranges, point_index_ranges, partition_index_ranges
+
+
+class TestIndexRetrieval(unittest.TestCase):
+    def _brute_force_segment_range(self, starts, ends, region_start, region_end):
+        touching = [i for i in xrange(len(starts))
+                    if (starts[i] < region_start < ends[i]) or (region_start <= starts[i] < region_end)]
+        if len(touching) == 0:
+            return 0, 0
+        end_index = next((i for i in xrange(touching[0], len(starts)) if starts[i] >= region_end), len(starts))
+        return touching[0], end_index
+
+    def _assert_segment_range(self, starts, ends, region_start, region_end):
+        starts = numpy.array(starts, dtype='int32')
+        ends = numpy.array(ends, dtype='int32')
+        max_ends = numpy.maximum.accumulate(ends)
+        self.assertEqual(self._brute_force_segment_range(starts, ends, region_start, region_end),
+                         segment_index_range(starts, max_ends, region_start, region_end))
+
+    def testSegmentIndexRange(self):
+        starts, ends = [10, 210, 260, 410], [20, 240, 310, 710]
+        for region_start, region_end in [(0, 100), (200, 300), (0, 900), (300, 700), (310, 700),
+                                         (300, 410), (310, 410), (0, 0), (300, 300), (400, 400), (800, 900)]:
+            self._assert_segment_range(starts, ends, region_start, region_end)
+
+    def testSegmentIndexRangeWithOverlaps(self):
+        starts = numpy.array([0, 5, 8, 30, 31], dtype='int32')
+        ends = numpy.array([100, 6, 9, 40, 32], dtype='int32')
+        max_ends = numpy.maximum.accumulate(ends)
+
+        self.assertEqual((0, 5), segment_index_range(starts, max_ends, 50, 60))
+        self.assertEqual((0, 5), segment_index_range(starts, max_ends, 35, 200))
+        self.assertEqual((0, 0), segment_index_range(starts, max_ends, 100, 200))
+
+    def testPointIndexRange(self):
+        starts = numpy.array([10, 20, 20, 30], dtype='int32')
+        self.assertEqual((1, 3), point_index_range(starts, 15, 25))
+        self.assertEqual((0, 4), point_index_range(starts, 0, 31))
+        self.assertEqual((3, 4), point_index_range(starts, 30, 31))
+        self.assertEqual((0, 0), point_index_range(starts, 21, 30))
+        self.assertEqual((0, 0), point_index_range(starts, 31, 40))
+
+    def testPartitionIndexRange(self):
+        ends = numpy.array([0, 10, 20, 30], dtype='int32')
+        self.assertEqual((0, 4), partition_index_range(ends, 0, 30))
+        self.assertEqual((1, 3), partition_index_range(ends, 5, 15))
+        self.assertEqual((1, 3), partition_index_range(ends, 10, 20))
+        self.assertEqual((2, 4), partition_index_range(ends, 15, 35))
+        self.assertEqual((0, 0), partition_index_range(ends, 11, 19))
+
+    def testVectorizedIndexRanges(self):
+        starts = numpy.array([0, 5, 8, 30, 31, 31, 60], dtype='int32')
+        ends = numpy.array([100, 6, 9, 40, 32, 35, 70], dtype='int32')
+        max_ends = numpy.maximum.accumulate(ends)
+        region_starts = numpy.array([0, 5, 31, 35, 50, 71, 100, 6, 31])
+        region_ends = numpy.array([1, 30, 32, 60, 71, 80, 110, 6, 31])
+
+        for index_ranges_func, index_range_func, columns in \
+                [(segment_index_ranges, segment_index_range, (starts, max_ends)),
+                 (point_index_ranges, point_index_range, (starts,)),
+                 (partition_index_ranges, partition_index_range, (max_ends,))]:
+            start_indices, end_indices = index_ranges_func(*(columns + (region_starts, region_ends)))
+            self.assertEqual([index_range_func(*(columns + (region_start, region_end)))
+                              for region_start, region_end in zip(region_starts, region_ends)],
+                             zip(start_indices, end_indices))
+
+
+if __name__ == "__main__":
+    unittest.main()
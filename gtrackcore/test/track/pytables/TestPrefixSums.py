@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from gtrackcore.track.pytables.PrefixSums import create_prefix_sums, store_prefix_sums, read_sums_and_counts, \
+    PrefixSumWriter
+from gtrackcore.track.pytables.database.Database import DatabaseReader, DatabaseWriter
+
+
+class TestPrefixSums(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = tempfile.mkdtemp()
+        self._filename = os.path.join(self._temp_dir, 'track.h5')
+        self._values = numpy.array([1.0, numpy.nan, 2.5, 3.0, numpy.nan, -1.0])
+
+        db_writer = DatabaseWriter(self._filename)
+        db_writer.open()
+        db_writer.create_c_array_from_array(['columns', 'val'], self._values)
+        store_prefix_sums(db_writer, ['columns', 'val'], self._values)
+        db_writer.close()
+
+        self._db_reader = DatabaseReader(self._filename)
+
+    def tearDown(self):
+        self._db_reader._close_file()
+        del DatabaseReader._db_readers[self._filename]
+        shutil.rmtree(self._temp_dir)
+
+    def testCreatePrefixSums(self):
+        sums, counts = create_prefix_sums(self._values)
+        self.assertEqual([0.0, 1.0, 1.0, 3.5, 6.5, 6.5, 5.5], sums.tolist())
+        self.assertEqual([0, 1, 1, 2, 3, 3, 4], counts.tolist())
+
+        sums, counts = create_prefix_sums(numpy.array([3, 4], dtype='int32'))
+        self.assertEqual([0.0, 3.0, 7.0], sums.tolist())
+        self.assertEqual([0, 1, 2], counts.tolist())
+
+    def testCreatePrefixSumsInBlocks(self):
+        sums, counts = create_prefix_sums(self._values[3:], initial_sum=3.5, initial_count=2)
+        self.assertEqual([3.5, 6.5, 6.5, 5.5], sums.tolist())
+        self.assertEqual([2, 3, 3, 4], counts.tolist())
+
+    def testPrefixSumWriter(self):
+        db_writer = DatabaseWriter(self._filename)
+        db_writer.open()
+        writer = PrefixSumWriter(db_writer, ['columns', 'blocks'], len(self._values))
+        for block_start in xrange(0, len(self._values), 4):
+            writer.append(self._values[block_start:block_start + 4])
+        db_writer.close()
+
+        sums, counts = read_sums_and_counts(self._db_reader, ['columns', 'blocks'], [0, 0, 2], [0, 6, 5])
+        self.assertEqual([0.0, 5.5, 5.5], sums.tolist())
+        self.assertEqual([0, 4, 2], counts.tolist())
+
+    def testReadSumsAndCounts(self):
+        start_indices = [0, 1, 2, 3, 4]
+        end_indices = [6, 2, 4, 3, 6]
+        sums, counts = read_sums_and_counts(self._db_reader, ['columns', 'val'], start_indices, end_indices)
+
+        for i, (start, end) in enumerate(zip(start_indices, end_indices)):
+            values = self._values[start:end]
+            self.assertAlmostEqual(numpy.nansum(values), sums[i])
+            self.assertEqual(numpy.count_nonzero(~numpy.isnan(values)), counts[i])
+
+    def testMissingPrefixSums(self):
+        self.assertEqual(None, read_sums_and_counts(self._db_reader, ['columns', 'other'], [0], [1]))
+        sums, counts = read_sums_and_counts(self._db_reader, ['columns', 'other'], [], [])
+        self.assertEqual(([], []), (sums.tolist(), counts.tolist()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from gtrackcore.track.pytables.SummaryPyramids import MIN, MAX, SUM, COUNT, SUM_OF_SQUARES, \
+    create_summary_pyramid, store_summary_pyramid, get_summary_bin_sizes, choose_bin_sizes, read_summaries
+from gtrackcore.track.pytables.database.Database import DatabaseReader, DatabaseWriter
+
+
+class TestSummaryPyramids(unittest.TestCase):
+    def setUp(self):
+        random = numpy.random.RandomState(0)
+        self._function_brs = [{'start': 1000, 'end': 1500, 'start_index': 2532, 'end_index': 3032},
+                              {'start': 5, 'end': 2537, 'start_index': 0, 'end_index': 2532}]
+        self._function_vals = random.normal(size=3032)
+        self._function_vals[random.randint(0, 3032, 300)] = numpy.nan
+
+        self._step_function_brs = [{'start': 0, 'end': 1000, 'start_index': 0, 'end_index': 4}]
+        self._step_function_ends = numpy.array([0, 130, 420, 1000])
+        self._step_function_vals = numpy.array([numpy.nan, 1.0, 2.0, numpy.nan])
+
+        self._temp_dir = tempfile.mkdtemp()
+        self._filename = os.path.join(self._temp_dir, 'track.h5')
+        self._db_reader = None
+
+    def tearDown(self):
+        if self._db_reader is not None:
+            self._db_reader._close_file()
+            del DatabaseReader._db_readers[self._filename]
+        shutil.rmtree(self._temp_dir)
+
+    def _get_bp_vals(self, br, vals, ends):
+        if ends is None:
+            return vals[br['start_index']:br['end_index']]
+        bp_vals = numpy.zeros(br['end'] - br['start'])
+        piece_start = br['start']
+        for end, val in zip(ends[br['start_index']:br['end_index']], vals[br['start_index']:br['end_index']]):
+            bp_vals[piece_start - br['start']:end - br['start']] = val
+            piece_start = end
+        return bp_vals
+
+    def _assert_summary(self, bp_vals, summary):
+        bp_vals = bp_vals[~numpy.isnan(bp_vals)]
+        self.assertEqual(len(bp_vals), summary[COUNT])
+        self.assertAlmostEqual(bp_vals.sum(), summary[SUM])
+        self.assertAlmostEqual((bp_vals * bp_vals).sum(), summary[SUM_OF_SQUARES])
+        if len(bp_vals) > 0:
+            self.assertEqual((bp_vals.min(), bp_vals.max()), (summary[MIN], summary[MAX]))
+        else:
+            self.assertTrue(numpy.isnan(summary[MIN]) and numpy.isnan(summary[MAX]))
+
+    def _assert_pyramid(self, bounding_regions, vals, ends, base_bin_size, zoom_factor, bin_sizes):
+        pyramid = create_summary_pyramid(bounding_regions, vals, ends, base_bin_size, zoom_factor)
+        self.assertEqual(bin_sizes, [bin_size for bin_size, _, _ in pyramid])
+
+        bounding_regions = sorted(bounding_regions, key=lambda br: br['start_index'])
+        for bin_size, summaries, offsets in pyramid:
+            self.assertEqual(len(summaries), offsets[-1])
+            for br, offset in zip(bounding_regions, offsets):
+                bp_vals = self._get_bp_vals(br, vals, ends)
+                bin_starts = range(br['start'] // bin_size * bin_size, br['end'], bin_size)
+                for i, bin_start in enumerate(bin_starts):
+                    self._assert_summary(bp_vals[max(bin_start - br['start'], 0):bin_start + bin_size - br['start']],
+                                         summaries[offset + i])
+
+    def testFunctionPyramid(self):
+        self._assert_pyramid(self._function_brs, self._function_vals, None, 100, 4, [100, 400, 1600, 6400])
+
+    def testStepFunctionPyramid(self):
+        self._assert_pyramid(self._step_function_brs, self._step_function_vals, self._step_function_ends,
+                             100, 10, [100, 1000])
+
+    def testReadSummaries(self):
+        db_writer = DatabaseWriter(self._filename)
+        db_writer.open()
+        store_summary_pyramid(db_writer, ['columns', 'val'], self._function_brs, self._function_vals, None, 100, 4)
+        db_writer.close()
+        self._db_reader = DatabaseReader(self._filename)
+
+        bin_sizes = get_summary_bin_sizes(self._db_reader, ['columns', 'val'])
+        self.assertEqual([100, 400, 1600, 6400], bin_sizes)
+        self.assertEqual([400, 100], choose_bin_sizes(bin_sizes, 800))
+        self.assertEqual([], get_summary_bin_sizes(self._db_reader, ['columns', 'other']))
+
+        brs = [self._function_brs[1]] * 4 + [self._function_brs[0]] * 2
+        starts = [5, 400, 1200, 10, 1000, 1100]
+        ends = [400, 2537, 1600, 800, 1500, 1100]
+        summaries, is_aligned = read_summaries(self._db_reader, ['columns', 'val'], 400, brs, starts, ends)
+        self.assertEqual([True, True, True, False, True, False], is_aligned.tolist())
+
+        for br, start, end, summary, aligned in zip(brs, starts, ends, summaries, is_aligned):
+            if aligned:
+                bp_vals = self._function_vals[br['start_index']:br['end_index']]
+                self._assert_summary(bp_vals[start - br['start']:end - br['start']], summary)
+
+
+if __name__ == "__main__":
+    unittest.main()
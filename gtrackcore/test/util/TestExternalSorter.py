@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from gtrackcore.util.pytables.ExternalSorter import ExternalSorter
+
+
+class TestExternalSorter(unittest.TestCase):
+    DTYPE = numpy.dtype([('chr', 'S5'), ('start', 'int32'), ('end', 'int32'), ('id', 'int64')])
+
+    def setUp(self):
+        self._temp_dir = tempfile.mkdtemp()
+        random = numpy.random.RandomState(0)
+        self._records = numpy.empty(5000, dtype=self.DTYPE)
+        self._records['chr'] = numpy.array(['chr1', 'chr2', 'chr10'])[random.randint(0, 3, 5000)]
+        self._records['start'] = random.randint(0, 100, 5000)
+        self._records['end'] = self._records['start'] + random.randint(0, 3, 5000)
+        self._records['id'] = numpy.arange(5000)
+
+    def tearDown(self):
+        shutil.rmtree(self._temp_dir)
+
+    def _sort(self, records, max_memory, block_size=300, **kwArgs):
+        sorter = ExternalSorter(records.dtype, ['chr', 'start', 'end'], max_memory, dir_path=self._temp_dir,
+                                **kwArgs)
+        for block_start in xrange(0, len(records), block_size):
+            sorter.add(records[block_start:block_start + block_size])
+        return sorter
+
+    def _assert_sorted(self, sorter, records):
+        expected = records[numpy.lexsort((records['end'], records['start'], records['chr']))]
+        for i in range(2):
+            blocks = list(sorter)
+            self.assertEqual(expected.tolist(), numpy.concatenate(blocks).tolist())
+        self.assertEqual(len(records), len(sorter))
+        self.assertTrue(sorter.peak_memory <= sorter._max_memory)
+
+    def testSortInMemory(self):
+        sorter = self._sort(self._records, 10 ** 6)
+        self._assert_sorted(sorter, self._records)
+        self.assertEqual([], os.listdir(self._temp_dir))
+
+    def testExternalSort(self):
+        sorter = self._sort(self._records, 20000)
+        self._assert_sorted(sorter, self._records)
+        self.assertTrue(len(sorter._runs) > 1)
+
+        sorter.remove()
+        self.assertEqual([], os.listdir(self._temp_dir))
+
+    def testExternalSortInSeveralMergePasses(self):
+        sorter = self._sort(self._records, 4000, fan_in=3)
+        self._assert_sorted(sorter, self._records)
+        self.assertTrue(1 < len(sorter._runs) <= 3)
+
+    def testSortObjectColumns(self):
+        records = numpy.empty(len(self._records), dtype=[('chr', object), ('start', object), ('end', object),
+                                                         ('id', object)])
+        for column in ['chr', 'start', 'end']:
+            records[column] = self._records[column].tolist()
+        records['start'][::7] = None
+        records['id'] = [str(i) * 5 for i in xrange(len(records))]
+
+        sorter = self._sort(records, 100000)
+        self._assert_sorted(sorter, records)
+        self.assertTrue(len(sorter._runs) > 1)
+
+    def testSortNoRecords(self):
+        sorter = self._sort(self._records[:0], 1000)
+        self.assertEqual([], list(sorter))
+        self.assertEqual(0, len(sorter))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from gtrackcore.core.Config import Config
+from gtrackcore.util.pytables.StoragePolicy import StoragePolicy
+
+
+class TestStoragePolicy(unittest.TestCase):
+    def testNoCompression(self):
+        storage_policy = StoragePolicy()
+        self.assertEqual(None, storage_policy.get_filters())
+        self.assertEqual(None, storage_policy.get_chunkshape((1000,)))
+
+        self.assertEqual(None, StoragePolicy(complib='zlib', complevel=0).get_filters())
+
+    def testCompression(self):
+        filters = StoragePolicy(complib='blosc', complevel=5, shuffle=False).get_filters()
+        self.assertEqual(('blosc', 5, False), (filters.complib, filters.complevel, filters.shuffle))
+
+        self.assertRaises(ValueError, StoragePolicy, complib='unknown', complevel=5)
+
+    def testChunkshape(self):
+        storage_policy = StoragePolicy(chunk_length=100)
+        self.assertEqual((100,), storage_policy.get_chunkshape((1000,)))
+        self.assertEqual((10, 3), storage_policy.get_chunkshape((10, 3)))
+        self.assertEqual((1,), storage_policy.get_chunkshape((0,)))
+
+    def testCreateFromConfig(self):
+        prev_config = Config.COMPRESSION_LIB, Config.COMPRESSION_LEVEL, Config.CHUNK_LENGTH
+        try:
+            Config.COMPRESSION_LIB, Config.COMPRESSION_LEVEL, Config.CHUNK_LENGTH = 'zlib', 3, 0
+            storage_policy = StoragePolicy.create_from_config()
+            self.assertEqual(('zlib', 3, None),
+                             (storage_policy.complib, storage_policy.complevel, storage_policy.chunk_length))
+
+            Config.COMPRESSION_LIB = 'none'
+            self.assertEqual(None, StoragePolicy.create_from_config().get_filters())
+        finally:
+            Config.COMPRESSION_LIB, Config.COMPRESSION_LEVEL, Config.CHUNK_LENGTH = prev_config
+
+
+if __name__ == "__main__":
+    unittest.main()
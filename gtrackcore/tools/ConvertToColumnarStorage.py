@@ -0,0 +1,45 @@
+import os
+import sys
+
+import tables
+
+from gtrackcore.preprocess.pytables.CommonTableFunctions import convert_to_columnar_storage
+from gtrackcore.util.CommonFunctions import get_dir_path
+from gtrackcore.util.pytables.Constants import GTRACKCORE_FORMAT_SUFFIX
+from gtrackcore.util.pytables.NameFunctions import get_genome_and_trackname
+
+
+def convert_tracks_to_columnar_storage(genome, track_name=[]):
+    """
+    Converts the preprocessed tracks of the genome under track_name to columnar-only storage,
+    removing the track tables that duplicate the column arrays. Returns the converted track names.
+    """
+    converted_track_names = []
+    for h5_filename in _get_h5_filenames(get_dir_path(genome, track_name)):
+        _, file_track_name = get_genome_and_trackname(h5_filename)
+        size_before = os.path.getsize(h5_filename)
+        if convert_to_columnar_storage(genome, file_track_name):
+            print 'Converted %s: %.1f MB -> %.1f MB' % (':'.join(file_track_name), size_before / 1e6,
+                                                        os.path.getsize(h5_filename) / 1e6)
+            converted_track_names.append(file_track_name)
+    return converted_track_names
+
+
+def _get_h5_filenames(directory):
+    filenames = []
+    for dirpath, dirnames, dir_filenames in os.walk(directory):
+        for filename in sorted(dir_filenames):
+            filename = os.path.join(dirpath, filename)
+            if filename.endswith('.' + GTRACKCORE_FORMAT_SUFFIX) and tables.is_pytables_file(filename):
+                filenames.append(filename)
+    return filenames
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in [2, 3]:
+        print 'Syntax: python ConvertToColumnarStorage.py genome [trackName]'
+        sys.exit(0)
+
+    genome = sys.argv[1]
+    track_name = sys.argv[2].split(':') if len(sys.argv) == 3 else []
+    convert_tracks_to_columnar_storage(genome, track_name)
@@ -11,6 +11,13 @@ from gtrackcore.track.core.Track import Track
 from gtrackcore.track.format.TrackFormat import TrackFormatReq
 from gtrackcore.track.graph.GraphView import LazyProtoGraphView
 from gtrackcore.track.pytables.BoundingRegionHandler import BoundingRegionHandler
+from gtrackcore.track.pytables.SummaryPyramids import SUMMARY_DTYPE, choose_bin_sizes, get_summary_bin_sizes, \
+    read_summaries, summarize
+from gtrackcore.track.pytables.TrackSource import TrackSource
+from gtrackcore.track.pytables.TrackViewLoader import TrackViewLoader
+from gtrackcore.track.pytables.database.Database import DatabaseReader
+from gtrackcore.track.pytables.database.Queries import BoundingRegionQueries
+from gtrackcore.util.pytables.NameFunctions import get_database_filename, get_array_group_node_names
 
 
 def get_track_format(track_name, allow_overlaps, genome_regions):
@@ -23,6 +30,12 @@ def get_track_view(track_name, allow_overlaps, genome_region):
     return track.getTrackView(genome_region)
 
 
+def get_track_views(track_name, allow_overlaps, genome_regions):
+    track = Track(track_name)
+    track.addFormatReq(TrackFormatReq(allowOverlaps=allow_overlaps, borderHandling='crop'))
+    return track.getTrackViews(genome_regions)
+
+
 def get_graph_view(track_name, allow_overlaps, genome_regions):
     proto_graph_views = []
 
@@ -53,6 +66,79 @@ def sum_of_values(track_name, allow_overlaps, genome_regions):
     return value_sum
 
 
+def sums_and_counts_of_values(track_name, allow_overlaps, genome_regions):
+    """
+    Returns arrays of the sum and the number of non-NaN values in each of the regions. Each region
+    takes two lookups if the track has been preprocessed with prefix sums of the values (see
+    Config.STORE_VAL_PREFIX_SUMS).
+    """
+    genome_regions = list(genome_regions)
+    if len(genome_regions) > 0:
+        track_data = TrackSource().get_track_data(genome_regions[0].genome, track_name, allow_overlaps)
+        result = TrackViewLoader.loadValsSumsAndCounts(track_data, genome_regions, allow_overlaps, track_name)
+        if result is not None:
+            return result
+
+    sums_and_counts = [get_track_view(track_name, allow_overlaps, region).valsSumAndCount()
+                       for region in genome_regions]
+    return numpy.array([s for s, _ in sums_and_counts], dtype='float64'), \
+        numpy.array([c for _, c in sums_and_counts], dtype='int64')
+
+
+def means_of_values(track_name, allow_overlaps, genome_regions):
+    sums, counts = sums_and_counts_of_values(track_name, allow_overlaps, genome_regions)
+    means = numpy.empty(len(sums))
+    means.fill(numpy.nan)
+    numpy.divide(sums, counts, out=means, where=counts > 0)
+    return means
+
+
+def summaries_of_values(track_name, genome_regions, bin_size=None):
+    """
+    Returns an array of SUMMARY_DTYPE with the min, max, sum, count and sum of squares of the values
+    of a function or step function track in each of the regions, counting each base pair once.
+
+    If the track has been preprocessed with summary pyramids (Config.STORE_SUMMARY_PYRAMIDS), each
+    region is summarized from the coarsest zoom level whose bins the region is aligned to, and whose
+    bin size divides bin_size if given (e.g. the bin length of an AutoBinner), without reading the
+    base pair values. The other regions are summarized from the values.
+    """
+    genome_regions = list(genome_regions)
+    summaries = numpy.zeros(len(genome_regions), dtype=SUMMARY_DTYPE)
+    is_summarized = numpy.zeros(len(genome_regions), dtype=bool)
+
+    if len(genome_regions) > 0:
+        genome = genome_regions[0].genome
+        column_node_names = get_array_group_node_names(genome, track_name, False) + ['val']
+        db_reader = DatabaseReader(get_database_filename(genome, track_name, allow_overlaps=False))
+        level_bin_sizes = get_summary_bin_sizes(db_reader, column_node_names)
+
+        if len(level_bin_sizes) > 0:
+            br_index = BoundingRegionQueries(genome, track_name, False).get_index()
+            bounding_regions = [br_index.enclosing(region.chr, region.start, region.end)
+                                for region in genome_regions]
+            is_enclosed = numpy.array([len(brs) > 0 for brs in bounding_regions], dtype=bool)
+
+            for level_bin_size in choose_bin_sizes(level_bin_sizes, bin_size) if bin_size is not None \
+                    else sorted(level_bin_sizes, reverse=True):
+                positions = numpy.flatnonzero(is_enclosed & ~is_summarized)
+                level_summaries, is_aligned = \
+                    read_summaries(db_reader, column_node_names, level_bin_size,
+                                   [bounding_regions[i][0] for i in positions],
+                                   [genome_regions[i].start for i in positions],
+                                   [genome_regions[i].end for i in positions])
+                summaries[positions[is_aligned]] = level_summaries[is_aligned].view(SUMMARY_DTYPE).reshape(-1)
+                is_summarized[positions[is_aligned]] = True
+
+    for i in numpy.flatnonzero(~is_summarized):
+        track_view = get_track_view(track_name, False, genome_regions[i])
+        weights = track_view.endsAsNumpyArray() - track_view.startsAsNumpyArray() \
+            if track_view.trackFormat.isInterval() else None
+        summaries[i] = summarize(track_view.valsAsNumpyArray(), weights)[0]
+
+    return summaries
+
+
 def sum_of_values_iter(track_name, allow_overlaps, genome_regions):
     value_sum = numpy.float128(0)
     for region in genome_regions:
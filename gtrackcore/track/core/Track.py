@@ -29,6 +29,10 @@ class Track(object):
         trackData = self._trackSource.get_track_data(region.genome, self.trackName, allowOverlaps)
         return TrackViewLoader.loadTrackView(trackData, region, borderHandling, allowOverlaps, self.trackName)
     
+    def _getRawTrackViews(self, regions, borderHandling, allowOverlaps):
+        trackData = self._trackSource.get_track_data(regions[0].genome, self.trackName, allowOverlaps)
+        return TrackViewLoader.loadTrackViews(trackData, regions, borderHandling, allowOverlaps, self.trackName)
+
     def getTrackView(self, region):
         allowOverlaps = self._trackFormatReq.allowOverlaps()
         borderHandling = self._trackFormatReq.borderHandling()
@@ -36,7 +40,25 @@ class Track(object):
         assert(borderHandling is not None) 
         
         origTrackView = self._getRawTrackView(region, borderHandling, allowOverlaps)
-        
+        return self._convertTrackView(origTrackView)
+
+    def getTrackViews(self, regions):
+        """
+        Returns one TrackView per region, in the same order as the regions. Loads all regions in one
+        batch, which is much faster than calling getTrackView for each of many small regions.
+        """
+        allowOverlaps = self._trackFormatReq.allowOverlaps()
+        borderHandling = self._trackFormatReq.borderHandling()
+        assert(allowOverlaps is not None)
+        assert(borderHandling is not None)
+
+        if len(regions) == 0:
+            return []
+
+        origTrackViews = self._getRawTrackViews(regions, borderHandling, allowOverlaps)
+        return [self._convertTrackView(origTrackView) for origTrackView in origTrackViews]
+
+    def _convertTrackView(self, origTrackView):
         if self.formatConverters is None:
             self.formatConverters = getFormatConverters(origTrackView.trackFormat, self._trackFormatReq)
         
@@ -161,6 +183,9 @@ class VirtualMinimalTrack(Track):
         
         return TrackView(region, startList, endList, valList, strandList, idList, edgesList, weightsList, borderHandling, allowOverlaps, extraLists)
 
+    def _getRawTrackViews(self, regions, borderHandling, allowOverlaps):
+        return [self._getRawTrackView(region, borderHandling, allowOverlaps) for region in regions]
+
 class VirtualMinimalPlainTrack(VirtualMinimalTrack, PlainTrack):
     def __new__(cls):
         return object.__new__(cls)
\ No newline at end of file
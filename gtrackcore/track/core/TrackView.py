@@ -6,11 +6,9 @@ import numpy
 
 from gtrackcore.track.core.VirtualPointEnd import VirtualPointEnd
 from gtrackcore.track.format.TrackFormat import TrackFormat
-from gtrackcore.track.pytables.database.Database import DatabaseReader
 from gtrackcore.track.pytables.VirtualTrackColumn import VirtualTrackColumn
-from gtrackcore.track.pytables.database.IndexRetrieval import start_and_end_indices
 from gtrackcore.util.CustomExceptions import ShouldNotOccurError
-from gtrackcore.util.pytables.NameFunctions import get_database_filename, get_track_table_node_names
+from gtrackcore.util.pytables.Constants import ITERATION_BLOCK_SIZE
 
 numpy.seterr(all='raise', under='ignore', invalid='ignore')
 
@@ -19,6 +17,12 @@ def noneFunc():
     return None
 
 
+def _read_block(list, block_start, block_end):
+    if isinstance(list, VirtualTrackColumn):
+        return list.read_block(block_start, block_end)
+    return list[block_start:block_end]
+
+
 class TrackElement(object):
     def __init__(self, trackView, index=-1):
         # Weak proxy is used to remove memory leak caused by circular reference when TrackView is deleted
@@ -70,43 +74,36 @@ class TrackElement(object):
 
 class PytablesTrackElement(object):
     """
-    TrackElements are relative to genome_anchor.start
+    TrackElements are relative to genome_anchor.start. The values are served from blocks of
+    columns read by the TrackView, where start and end are already relative to and clipped by the
+    genome anchor.
     """
     def __init__(self, trackView):
         # Weak proxy is used to remove memory leak caused by circular reference when TrackView is deleted
         self._trackView = weakref.proxy(trackView)
-        self.row = None
-        self.partition_start = -1
+        self._block = {}
+        self._index = -1
 
     def start(self):
-        candidate = self.row['start'] - self._trackView.genomeAnchor.start
-        return candidate if candidate > 0 else 0
+        return self._block['start'][self._index]
 
     def end(self):
-        raw_end = self.row['end']
-        anchor_end = self._trackView.genomeAnchor.end
-
-        if raw_end < anchor_end:
-            end_relative_to_anchor_start = raw_end - self._trackView.genomeAnchor.start
-        else:
-            end_relative_to_anchor_start = anchor_end - self._trackView.genomeAnchor.start
-
-        return end_relative_to_anchor_start
+        return self._block['end'][self._index]
 
     def val(self):
-        return self.row['val']
+        return self._block['val'][self._index]
 
     def strand(self):
-        return self.row['strand']
+        return self._block['strand'][self._index]
 
     def id(self):
-        return self.row['id']
+        return self._block['id'][self._index]
 
     def edges(self):
-        return self.row['edges']
+        return self._block['edges'][self._index]
 
     def weights(self):
-        return self.row['weights']
+        return self._block['weights'][self._index]
 
     def getAllExtraKeysInOrder(self):
         return self._trackView._extraLists.keys()
@@ -114,7 +111,7 @@ class PytablesTrackElement(object):
     def __getattr__(self, key):
         if key in self._trackView._extraLists:
             def extra():
-                return self.row[key]
+                return self._block[key][self._index]
             return extra
         else:
             raise AttributeError
@@ -127,12 +124,6 @@ class PytablesTrackElement(object):
     def none(self):
         return None
 
-    def points_end_func(self):
-        return self.start() + 1
-
-    def partition_start_func(self):
-        return self.partition_start
-
 
 class AutonomousTrackElement(TrackElement):
 
@@ -220,8 +211,6 @@ class TrackView(object):
 
     def _handle_points_and_partitions_for_pytables(self):
         if self.trackFormat.isPartition():
-            self._pytables_track_element.start = self._pytables_track_element.partition_start_func  # iteration
-
             self._startList = copy(self._endList)
             self._startList.update_offset(stop=-1)
             self._endList.update_offset(start=1)
@@ -240,8 +229,6 @@ class TrackView(object):
                     extraList.update_offset(start=1)
 
         elif self.trackFormat.isPoint():
-            self._pytables_track_element.end = self._pytables_track_element.points_end_func  # iteration
-
             self._endList = copy(self._startList)
             self._endList.as_numpy_array = self._endList.ends_as_numpy_array_points_func
 
@@ -270,7 +257,9 @@ class TrackView(object):
         self._weightsList = weightsList
         self._extraLists = copy(extraLists)
 
-        if not self._should_use_pytables:
+        if self._should_use_pytables:
+            self._handle_points_and_partitions_for_pytables()
+        else:
             self._handlePointsAndPartitions()
 
         if self._startList is None:
@@ -295,11 +284,6 @@ class TrackView(object):
             self._trackElement.weights = noneFunc
             self._pytables_track_element.weights = noneFunc
 
-        if self._should_use_pytables:
-            database_filename = get_database_filename(genomeAnchor.genome, track_name, allow_overlaps=allowOverlaps)
-            self._db_handler = DatabaseReader(database_filename)
-            self._track_node_names = get_track_table_node_names(self.genomeAnchor.genome, self._track_name, self.allowOverlaps)
-            self._handle_points_and_partitions_for_pytables()
 
         self._updateNumListElements()
 
@@ -308,40 +292,41 @@ class TrackView(object):
                 assert list is None or len(list) == self._numListElements, 'List (%s): ' % i + str(list) + ' (expected %s elements, found %s)' % (self._numListElements, len(list))
 
     def _generate_pytables_track_elements(self):
+        for block_start in xrange(0, self._numListElements, ITERATION_BLOCK_SIZE):
+            block = self._read_pytables_block(block_start, block_start + ITERATION_BLOCK_SIZE)
 
-        if self.cached_start_and_end_indices is None:
-            self.cached_start_and_end_indices = start_and_end_indices(self.genomeAnchor, self._track_name,
-                                                                       self.allowOverlaps, self.trackFormat)
-
-        start_index, end_index = self.cached_start_and_end_indices
-        if start_index == end_index:
-            return
-
-        with self._db_handler as db_reader:
-
-            track_table = db_reader.get_table(self._track_node_names)
-
-            rows = track_table.iterrows(start=start_index, stop=end_index)
-
-            if self.trackFormat.isPartition():
-                self._pytables_track_element.row = rows.next()
-                self._pytables_track_element.partition_start = self._pytables_track_element.row['end']
-                for row in rows:
-                    self._pytables_track_element.row = row
-                    yield self._pytables_track_element
-                    self._pytables_track_element.partition_start = self._pytables_track_element.row['end']
+            #  Remove blind passengers
+            if self._has_blind_passengers():
+                indices = numpy.flatnonzero(block['end'] > 0)
             else:
-                for row in rows:
-                    #  Remove blind passengers
-                    if self.allowOverlaps and not self.trackFormat.reprIsDense():
-                        if 'end' in track_table.colnames and (row['end'] <= self.genomeAnchor.start):
-                            continue
-                    self._pytables_track_element.row = row
-                    yield self._pytables_track_element
+                indices = xrange(len(block.values()[0]))
+
+            self._pytables_track_element._block = block
+            for index in indices:
+                self._pytables_track_element._index = index
+                yield self._pytables_track_element
+
+    def _read_pytables_block(self, block_start, block_end):
+        lists = [('start', self._startList), ('val', self._valList), ('strand', self._strandList),
+                 ('id', self._idList), ('edges', self._edgesList), ('weights', self._weightsList)] + \
+            self._extraLists.items()
+        if not self.trackFormat.isPoint():
+            lists.append(('end', self._endList))
+        block = dict((name, _read_block(list, block_start, block_end)) for name, list in lists if list is not None)
+
+        if 'start' in block:
+            block['start'] = numpy.maximum(block['start'] - self.genomeAnchor.start, 0)
+        if self.trackFormat.isPoint():
+            block['end'] = block['start'] + 1
+        elif 'end' in block:
+            block['end'] = numpy.minimum(block['end'], self.genomeAnchor.end) - self.genomeAnchor.start
+        return block
+
+    def _has_blind_passengers(self):
+        return self.allowOverlaps and self.trackFormat.isInterval() and not self.trackFormat.reprIsDense()
 
     def __iter__(self):
         if self._should_use_pytables:
-            self._pytables_track_element.row = None
             return self._generate_pytables_track_elements()
         else:
             self._trackElement._index = -1
@@ -374,23 +359,16 @@ class TrackView(object):
 
     def _substract_blindpassengers_from_number_of_elements(self):
         number_of_elements = self._numListElements
-
-        if self.cached_start_and_end_indices is None:
-            self.cached_start_and_end_indices = start_and_end_indices(self.genomeAnchor, self._track_name,
-                                                                      self.allowOverlaps, self.trackFormat)
-
-        start_index, end_index = self.cached_start_and_end_indices
-        if start_index == end_index:
+        if not self._has_blind_passengers():
             return number_of_elements
 
-        with self._db_handler as db_reader:
-            track_table = db_reader.get_table(self._track_node_names)
-            rows = track_table.iterrows(start=start_index, stop=end_index)
-            for row in rows:
-                if 'end' in track_table.colnames and (row['end'] <= self.genomeAnchor.start):
-                    number_of_elements -= 1
-                if row['start'] > self.genomeAnchor.start:
-                    break
+        for block_start in xrange(0, self._numListElements, ITERATION_BLOCK_SIZE):
+            block_end = block_start + ITERATION_BLOCK_SIZE
+            ends = _read_block(self._endList, block_start, block_end)
+            number_of_elements -= numpy.count_nonzero(ends <= self.genomeAnchor.start)
+            starts = _read_block(self._startList, block_start, block_end)
+            if starts[-1] > self.genomeAnchor.start:
+                break
 
         return number_of_elements
 
@@ -629,7 +607,24 @@ class TrackView(object):
         
     def hasExtra(self, key):
         return key in self._extraLists
-    
+
+    def valsSumAndCount(self):
+        '''
+        Returns the sum and the number of the non-NaN values of the TrackView. If the track has been
+        preprocessed with prefix sums of the values (Config.STORE_VAL_PREFIX_SUMS), these are found
+        by two lookups instead of by reading all the values.
+        '''
+        assert self._valList is not None
+
+        if self._should_use_pytables and self._numIterElements == self._numListElements:
+            sumAndCount = self._valList.sum_and_count_by_prefix_sums()
+            if sumAndCount is not None:
+                return sumAndCount
+
+        vals = self.valsAsNumpyArray()
+        isValid = ~numpy.isnan(vals) if vals.dtype.kind == 'f' else numpy.ones(len(vals), dtype=bool)
+        return numpy.float64(vals[isValid].sum(dtype='float64')), int(isValid.sum())
+
 class TrackViewSlider(object):
     def __init__(self, fullTV):
         self._fullTV = fullTV
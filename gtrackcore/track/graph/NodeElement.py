@@ -3,7 +3,7 @@ import weakref
 from gtrackcore.track.graph.Edge import Edge
 from gtrackcore.track.core.TrackView import TrackElement, AutonomousTrackElement, noneFunc
 from gtrackcore.track.pytables.database.Database import DatabaseReader
-from gtrackcore.util.pytables.NameFunctions import get_database_filename, get_track_table_node_names
+from gtrackcore.util.pytables.NameFunctions import get_database_filename, get_array_group_node_names
 
 
 class NodeElement(TrackElement):
@@ -51,17 +51,20 @@ class PytablesNodeElement(object):
 
         db_filename = get_database_filename(genome, track_name, allow_overlaps)
         db_reader = DatabaseReader(db_filename)
-        table_node_names = get_track_table_node_names(genome, track_name, allow_overlaps)
-        table = db_reader.get_table(table_node_names)
+        db_reader.open()
+        array_group_node_names = get_array_group_node_names(genome, track_name, allow_overlaps)
 
         # offset must be set to start of track_view since we work directly on the db.
         index = index + track_view.cached_start_and_end_indices[0]
-        self._row = table[index]
+        self._id = db_reader.get_node(array_group_node_names + ['id'])[index]
+        self._edges = db_reader.get_node(array_group_node_names + ['edges'])[index]
+        self._weights = db_reader.get_node(array_group_node_names + ['weights'])[index] if self._has_weights else None
+        db_reader.close()
 
     def getNeighborIter(self):
         'Allows iteration through neighbors in the form of Edge objects'
-        edges = self._row['edges']
-        weights = self._row['weights'] if self._has_weights else None
+        edges = self._edges
+        weights = self._weights
         #numNeighbors = len(edgeList)
 
         for i, neighbor_id in enumerate(edges[edges != '']):          
@@ -70,7 +73,7 @@ class PytablesNodeElement(object):
                 yield Edge(self, to_node, weights[i] if weights is not None else None, self._graph_view.isDirected())
 
     def __repr__(self):
-        return self._row['id']
+        return self._id
 
     def __hash__(self):
-        return hash(self._row['id'])
+        return hash(self._id)
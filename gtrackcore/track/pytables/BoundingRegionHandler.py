@@ -55,6 +55,8 @@ class BoundingRegionHandler(object):
         table.flush()
         db_writer.close()
 
+        BoundingRegionQueries.clear_cached_indexes()
+
     def _create_bounding_regions_triples(self, bounding_region_tuples, genome_element_chr_list, sparse):
         last_region = None
         total_elements = 0
@@ -0,0 +1,96 @@
+from collections import OrderedDict
+
+import numpy
+
+from gtrackcore.core.Config import Config
+from gtrackcore.util.pytables.Constants import COLUMN_CHUNK_LENGTH
+from gtrackcore.util.pytables.NameFunctions import get_node_path
+
+
+class ColumnChunkCache(object):
+    """
+    Process-wide LRU cache of fixed-size chunks of column arrays, keyed by (filename, node path,
+    chunk number). The total size of the cached chunks is kept below Config.COLUMN_CHUNK_CACHE_SIZE
+    bytes. Reads larger than the budget go directly to the file.
+    """
+
+    _chunks = OrderedDict()  # in least recently used order
+    _size_in_bytes = 0
+    _hits = 0
+    _misses = 0
+    _evictions = 0
+
+    @classmethod
+    def read(cls, db_reader, node_names, start_index, end_index):
+        """
+        Returns rows [start_index:end_index] of the array at node_names, which must be open in db_reader.
+        Rows within a single chunk are returned as a read-only view of the cached chunk.
+        """
+        array = db_reader.get_node(node_names)
+        start_index, end_index = max(start_index, 0), min(end_index, len(array))
+        if start_index >= end_index:
+            return array[0:0]
+
+        first_chunk = start_index // COLUMN_CHUNK_LENGTH
+        last_chunk = (end_index - 1) // COLUMN_CHUNK_LENGTH
+        chunk_size_in_bytes = COLUMN_CHUNK_LENGTH * array.dtype.itemsize * max(1, numpy.prod(array.shape[1:]))
+        if (last_chunk - first_chunk + 1) * chunk_size_in_bytes > cls._get_max_size_in_bytes():
+            return array[start_index:end_index]
+
+        node_path = get_node_path(node_names)
+        chunks = [cls._get_chunk(db_reader.filename, node_path, array, chunk_number)
+                  for chunk_number in xrange(first_chunk, last_chunk + 1)]
+
+        offset = first_chunk * COLUMN_CHUNK_LENGTH
+        if len(chunks) == 1:
+            return chunks[0][start_index - offset:end_index - offset]
+        return numpy.concatenate(chunks)[start_index - offset:end_index - offset]
+
+    @classmethod
+    def _get_chunk(cls, filename, node_path, array, chunk_number):
+        key = (filename, node_path, chunk_number)
+        try:
+            chunk = cls._chunks.pop(key)
+            cls._hits += 1
+        except KeyError:
+            chunk = array[chunk_number * COLUMN_CHUNK_LENGTH:(chunk_number + 1) * COLUMN_CHUNK_LENGTH]
+            chunk.flags.writeable = False
+            cls._misses += 1
+            cls._size_in_bytes += chunk.nbytes
+            cls._evict_least_recently_used_chunks()
+
+        cls._chunks[key] = chunk
+        return chunk
+
+    @classmethod
+    def _evict_least_recently_used_chunks(cls):
+        max_size_in_bytes = cls._get_max_size_in_bytes()
+        while cls._size_in_bytes > max_size_in_bytes and len(cls._chunks) > 0:
+            _, chunk = cls._chunks.popitem(last=False)
+            cls._size_in_bytes -= chunk.nbytes
+            cls._evictions += 1
+
+    @classmethod
+    def _get_max_size_in_bytes(cls):
+        return Config.COLUMN_CHUNK_CACHE_SIZE
+
+    @classmethod
+    def invalidate(cls, filename):
+        for key in [key for key in cls._chunks if key[0] == filename]:
+            cls._size_in_bytes -= cls._chunks.pop(key).nbytes
+
+    @classmethod
+    def clear(cls):
+        cls._chunks.clear()
+        cls._size_in_bytes = 0
+        cls._hits = cls._misses = cls._evictions = 0
+
+    @classmethod
+    def get_statistics(cls):
+        num_reads = cls._hits + cls._misses
+        return {'hits': cls._hits,
+                'misses': cls._misses,
+                'hit_rate': float(cls._hits) / num_reads if num_reads > 0 else 0.0,
+                'evictions': cls._evictions,
+                'num_chunks': len(cls._chunks),
+                'size_in_bytes': cls._size_in_bytes}
@@ -0,0 +1,142 @@
+import ctypes
+import ctypes.util
+import glob
+import mmap
+import os
+import sys
+
+import numpy
+import tables
+
+from gtrackcore.util.pytables.NameFunctions import get_node_path
+
+
+HADDR_UNDEF = 2 ** 64 - 1
+
+
+def _load_get_offset_function():
+    """
+    Returns H5Dget_offset() from the HDF5 library that PyTables is linked against, or None if that
+    library cannot be found. PyTables does not expose the file offsets of datasets itself.
+    """
+    tables_dir = os.path.dirname(tables.__file__)
+    lib_filenames = glob.glob(os.path.join(tables_dir, '.libs', 'libhdf5-*')) + \
+        glob.glob(os.path.join(tables_dir + '.libs', 'libhdf5-*'))
+    if len(lib_filenames) == 0:
+        lib_filenames = [ctypes.util.find_library('hdf5')]
+
+    try:
+        lib = ctypes.CDLL(lib_filenames[0])
+        major, minor, release = ctypes.c_uint(), ctypes.c_uint(), ctypes.c_uint()
+        lib.H5get_libversion(ctypes.byref(major), ctypes.byref(minor), ctypes.byref(release))
+    except (OSError, TypeError, AttributeError):
+        return None
+
+    # A different HDF5 library than the one used by PyTables would not know its dataset ids
+    if '%s.%s.%s' % (major.value, minor.value, release.value) != tables.which_lib_version('hdf5')[1]:
+        return None
+
+    get_offset = lib.H5Dget_offset
+    get_offset.restype = ctypes.c_uint64
+    get_offset.argtypes = [ctypes.c_int if (major.value, minor.value) < (1, 10) else ctypes.c_int64]
+    return get_offset
+
+
+class ColumnMemmaps(object):
+    """
+    Read-only memory maps of the column arrays that are stored contiguously and unfiltered in the
+    HDF5 file. Slicing them does not copy, and the pages are shared with other processes through
+    the OS page cache. The file offset of each array is looked up once. For chunked or compressed
+    arrays, get() returns None, and the arrays must be read through PyTables.
+
+    Each file is mapped once, and the columns are arrays over that mapping. A mapping is only kept
+    while DatabaseReader keeps the file open (see invalidate()), so that the number of open files
+    stays within Config.MAX_OPEN_DATABASE_FILES. The mapping is of the file that DatabaseReader
+    opened, as identified by its file_signature, so that reads need no system calls. A file that has
+    been replaced, e.g. by another process, is mapped again when DatabaseReader reopens it.
+    """
+
+    _file_maps = {}
+    _get_offset = None
+    _get_offset_loaded = False
+
+    @classmethod
+    def get(cls, db_reader, node_names):
+        filename = db_reader.filename
+        node_path = get_node_path(node_names)
+        file_map = cls._file_maps.get(filename)
+        if file_map is not None and node_path in file_map.arrays:
+            return file_map.arrays[node_path]
+
+        db_reader.open()
+        try:
+            file_map = cls._file_maps.get(filename)
+            if file_map is None:
+                file_map = _FileMap(filename, db_reader.file_signature)
+            memmap = cls._create_memmap(file_map, db_reader.get_node(node_names))
+        finally:
+            db_reader.close()
+
+        # Not kept if DatabaseReader closed the file on close(), as when preprocessing
+        if db_reader.is_file_open():
+            file_map.arrays[node_path] = memmap
+            cls._file_maps[filename] = file_map
+        return memmap
+
+    @classmethod
+    def _create_memmap(cls, file_map, array):
+        if not cls._get_offset_loaded:
+            cls._get_offset = _load_get_offset_function()
+            cls._get_offset_loaded = True
+
+        if cls._get_offset is None or array is None or array.byteorder not in [sys.byteorder, 'irrelevant']:
+            return None
+
+        offset = cls._get_offset(array._v_objectid)
+        if offset == HADDR_UNDEF:
+            return None
+
+        file_mmap = file_map.get_mmap()
+        if file_mmap is None:
+            return None
+
+        count = int(numpy.prod(array.shape))
+        return numpy.frombuffer(file_mmap, dtype=array.dtype, count=count, offset=offset).reshape(array.shape)
+
+    @classmethod
+    def invalidate(cls, filename):
+        file_map = cls._file_maps.pop(filename, None)
+        if file_map is not None:
+            file_map.close()
+
+    @classmethod
+    def get_mapped_filenames(cls):
+        return [filename for filename, file_map in cls._file_maps.iteritems() if file_map.is_mapped()]
+
+
+class _FileMap(object):
+    def __init__(self, filename, signature):
+        self.filename = filename
+        self.signature = signature
+        self.arrays = {}
+        self._mmap = None
+
+    def get_mmap(self):
+        # None if the file has been changed since DatabaseReader opened it
+        if self._mmap is None:
+            with open(self.filename, 'rb') as h5_file:
+                stat = os.fstat(h5_file.fileno())
+                if (stat.st_ino, stat.st_size, stat.st_mtime) == self.signature:
+                    self._mmap = mmap.mmap(h5_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def is_mapped(self):
+        return self._mmap is not None
+
+    def close(self):
+        file_mmap, self._mmap = self._mmap, None
+        self.arrays.clear()
+        # Unmapping while arrays over the mapping are still in use would make them invalid. Such a
+        # mapping is instead released together with the last of the arrays.
+        if file_mmap is not None and sys.getrefcount(file_mmap) == 2:
+            file_mmap.close()
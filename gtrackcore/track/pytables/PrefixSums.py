@@ -0,0 +1,99 @@
+import numpy
+import tables
+
+PREFIX_SUM_SUFFIX = '_prefix_sum'
+PREFIX_COUNT_SUFFIX = '_prefix_count'
+
+
+def get_prefix_sum_node_names(column_node_names):
+    """
+    The prefix sums of a column are stored next to the column, in the same group.
+    """
+    group_node_names, column_name = column_node_names[:-1], column_node_names[-1]
+    return group_node_names + ['_' + column_name + PREFIX_SUM_SUFFIX], \
+        group_node_names + ['_' + column_name + PREFIX_COUNT_SUFFIX]
+
+
+def has_prefix_sums(column):
+    return len(column.shape) == 1 and column.dtype.kind in 'biuf'
+
+
+def create_prefix_sums(column, initial_sum=0.0, initial_count=0):
+    """
+    Returns the cumulative sums and counts of the non-NaN values of the column, each with a leading
+    initial value (default 0), so that the sum and count of column[i:j] are sums[j] - sums[i] and
+    counts[j] - counts[i]. The initial values let the prefix sums of a column be created in blocks.
+    """
+    is_valid = ~numpy.isnan(column) if column.dtype.kind == 'f' else numpy.ones(len(column), dtype=bool)
+
+    sums = numpy.empty(len(column) + 1, dtype='float64')
+    sums[0] = initial_sum
+    sums[1:] = numpy.where(is_valid, column, 0)
+    numpy.cumsum(sums, out=sums)
+    counts = numpy.empty(len(column) + 1, dtype='int64')
+    counts[0] = initial_count
+    counts[1:] = is_valid
+    numpy.cumsum(counts, out=counts)
+    return sums, counts
+
+
+def store_prefix_sums(db_writer, column_node_names, column, filters=None):
+    sum_node_names, count_node_names = get_prefix_sum_node_names(column_node_names)
+    sums, counts = create_prefix_sums(column)
+    db_writer.create_c_array_from_array(sum_node_names, sums, filters=filters)
+    db_writer.create_c_array_from_array(count_node_names, counts, filters=filters)
+
+
+class PrefixSumWriter(object):
+    """
+    Stores the prefix sums of a column of num_rows values given in consecutive blocks, in arrays
+    created at their final size. The sums are the same as when created from the whole column.
+    """
+
+    def __init__(self, db_writer, column_node_names, num_rows, filters=None):
+        sum_node_names, count_node_names = get_prefix_sum_node_names(column_node_names)
+        self._sums = db_writer.create_c_array(sum_node_names, tables.Float64Atom(), (num_rows + 1,), filters=filters)
+        self._counts = db_writer.create_c_array(count_node_names, tables.Int64Atom(), (num_rows + 1,),
+                                                filters=filters)
+        self._sums[0] = 0.0
+        self._counts[0] = 0
+        self._last_sum = 0.0
+        self._last_count = 0
+        self._num_rows_written = 0
+
+    def append(self, column_block):
+        sums, counts = create_prefix_sums(column_block, self._last_sum, self._last_count)
+        start = self._num_rows_written + 1
+        self._sums[start:start + len(column_block)] = sums[1:]
+        self._counts[start:start + len(column_block)] = counts[1:]
+        self._last_sum, self._last_count = sums[-1], counts[-1]
+        self._num_rows_written += len(column_block)
+
+
+def read_sums_and_counts(db_reader, column_node_names, start_indices, end_indices):
+    """
+    Returns arrays of the sums and counts of the non-NaN values of the column for each row range
+    [start_indices[i]:end_indices[i]], using two lookups per range in each of the prefix sum arrays.
+    Returns None if no prefix sums are stored for the column.
+    """
+    if len(start_indices) == 0:
+        return numpy.zeros(0, dtype='float64'), numpy.zeros(0, dtype='int64')
+
+    sum_node_names, count_node_names = get_prefix_sum_node_names(column_node_names)
+
+    db_reader.open()
+    prefix_sums = db_reader.get_node(sum_node_names)
+    prefix_counts = db_reader.get_node(count_node_names)
+    if prefix_sums is None or prefix_counts is None:
+        db_reader.close()
+        return None
+
+    start_indices = numpy.asarray(start_indices, dtype='int64')
+    end_indices = numpy.asarray(end_indices, dtype='int64')
+    lookup_indices, positions = numpy.unique(numpy.concatenate((start_indices, end_indices)), return_inverse=True)
+    sums = prefix_sums[lookup_indices][positions]
+    counts = prefix_counts[lookup_indices][positions]
+    db_reader.close()
+
+    num_ranges = len(start_indices)
+    return sums[num_ranges:] - sums[:num_ranges], counts[num_ranges:] - counts[:num_ranges]
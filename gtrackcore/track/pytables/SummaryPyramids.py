@@ -0,0 +1,201 @@
+import numpy
+
+MIN, MAX, SUM, COUNT, SUM_OF_SQUARES = range(5)
+SUMMARY_DTYPE = numpy.dtype([('min', 'float64'), ('max', 'float64'), ('sum', 'float64'), ('count', 'float64'),
+                             ('sum_of_squares', 'float64')])
+
+SUMMARY_SUFFIX = '_summary'
+
+
+def get_summary_node_names(column_node_names, bin_size=None, suffix=''):
+    """
+    The summary pyramid of a column is stored next to the column, in the same group: one array of
+    summaries and one array of bounding region offsets per zoom level, and two arrays listing the bin
+    sizes of the zoom levels and the start indices of the bounding regions.
+    """
+    group_node_names, column_name = column_node_names[:-1], column_node_names[-1]
+    level_name = '' if bin_size is None else '_%d' % bin_size
+    return group_node_names + ['_' + column_name + SUMMARY_SUFFIX + level_name + suffix]
+
+
+def has_summary_pyramids(column_dtypes):
+    """
+    Summary pyramids are made for function and step function tracks, i.e. tracks without starts
+    and with numerical values.
+    """
+    val_dtype = column_dtypes.get('val')
+    return 'start' not in column_dtypes and val_dtype is not None and val_dtype.shape == () and \
+        val_dtype.kind in 'biuf'
+
+
+def summarize(vals, weights=None):
+    """
+    Returns the summary of the non-NaN values, where each value is counted the number of base pairs
+    given by weights (default 1), as a one-element array of SUMMARY_DTYPE.
+    """
+    if len(vals) == 0:
+        return numpy.array([(numpy.nan, numpy.nan, 0.0, 0.0, 0.0)], dtype=SUMMARY_DTYPE)
+    return _reduce_values(numpy.asarray(vals, dtype='float64'), weights, numpy.zeros(1, dtype='int64')) \
+        .view(SUMMARY_DTYPE).reshape(-1)
+
+
+def create_summary_pyramid(bounding_regions, vals, ends, base_bin_size, zoom_factor):
+    """
+    Returns a list of (bin_size, summaries, offsets) per zoom level, from base_bin_size and up by
+    zoom_factor until one bin covers the longest bounding region. Bins are aligned to multiples of
+    the bin size on the chromosome and cut at the bounding region borders. The summaries of bounding
+    region i are found in summaries[offsets[i]:offsets[i+1]], with bounding regions in the order of
+    their start index. If ends is None, the track is a function track, else a step function track.
+    """
+    bounding_regions = sorted(bounding_regions, key=lambda br: br['start_index'])
+    vals = numpy.asarray(vals, dtype='float64')
+
+    level_summaries = [[_summarize_bounding_region(br, vals, ends, base_bin_size) for br in bounding_regions]]
+    bin_sizes = [base_bin_size]
+    max_br_len = max([br['end'] - br['start'] for br in bounding_regions] + [0])
+
+    while bin_sizes[-1] < max_br_len:
+        level_summaries.append([_merge_bins(summaries, br['start'] // bin_sizes[-1], zoom_factor)
+                                for br, summaries in zip(bounding_regions, level_summaries[-1])])
+        bin_sizes.append(bin_sizes[-1] * zoom_factor)
+
+    pyramid = []
+    for bin_size, summaries_per_br in zip(bin_sizes, level_summaries):
+        offsets = numpy.zeros(len(summaries_per_br) + 1, dtype='int64')
+        numpy.cumsum([len(summaries) for summaries in summaries_per_br], out=offsets[1:])
+        summaries = numpy.concatenate(summaries_per_br) if summaries_per_br else numpy.zeros((0, 5))
+        pyramid.append((bin_size, summaries, offsets))
+    return pyramid
+
+
+def store_summary_pyramid(db_writer, column_node_names, bounding_regions, vals, ends,
+                          base_bin_size, zoom_factor, filters=None):
+    pyramid = create_summary_pyramid(bounding_regions, vals, ends, base_bin_size, zoom_factor)
+
+    br_start_indices = numpy.array(sorted(br['start_index'] for br in bounding_regions), dtype='int64')
+    db_writer.create_c_array_from_array(get_summary_node_names(column_node_names, suffix='_br_start_indices'),
+                                        br_start_indices)
+    db_writer.create_c_array_from_array(get_summary_node_names(column_node_names, suffix='_bin_sizes'),
+                                        numpy.array([bin_size for bin_size, _, _ in pyramid], dtype='int64'))
+    for bin_size, summaries, offsets in pyramid:
+        db_writer.create_c_array_from_array(get_summary_node_names(column_node_names, bin_size), summaries,
+                                            filters=filters)
+        db_writer.create_c_array_from_array(get_summary_node_names(column_node_names, bin_size, '_offsets'),
+                                            offsets)
+
+
+def get_summary_bin_sizes(db_reader, column_node_names):
+    db_reader.open()
+    bin_sizes = db_reader.get_node(get_summary_node_names(column_node_names, suffix='_bin_sizes'))
+    bin_sizes = [] if bin_sizes is None else bin_sizes.read().tolist()
+    db_reader.close()
+    return bin_sizes
+
+
+def choose_bin_sizes(bin_sizes, bin_size):
+    """
+    Returns the zoom levels that can make up bins of bin_size, i.e. whose bin sizes divide it,
+    coarsest first.
+    """
+    return sorted([level for level in bin_sizes if bin_size % level == 0], reverse=True)
+
+
+def read_summaries(db_reader, column_node_names, level_bin_size, bounding_regions, region_starts, region_ends):
+    """
+    Returns an array of the summaries of the regions from the zoom level with bin size
+    level_bin_size, and a boolean array telling which regions are aligned to the bins of the zoom
+    level. The summaries of the other regions are not valid. Region i must be enclosed by
+    bounding_regions[i].
+    """
+    summaries = numpy.zeros((len(region_starts), 5))
+    if len(region_starts) == 0:
+        return summaries, numpy.zeros(0, dtype=bool)
+
+    br_starts = numpy.array([br['start'] for br in bounding_regions], dtype='int64')
+    br_ends = numpy.array([br['end'] for br in bounding_regions], dtype='int64')
+    region_starts = numpy.asarray(region_starts, dtype='int64')
+    region_ends = numpy.asarray(region_ends, dtype='int64')
+
+    is_aligned = ((region_starts % level_bin_size == 0) | (region_starts == br_starts)) & \
+                 ((region_ends % level_bin_size == 0) | (region_ends == br_ends))
+
+    db_reader.open()
+    br_start_indices = db_reader.get_node(get_summary_node_names(column_node_names, suffix='_br_start_indices'))
+    offsets = db_reader.get_node(get_summary_node_names(column_node_names, level_bin_size, '_offsets'))
+    br_offsets = offsets[br_start_indices.read().searchsorted([br['start_index'] for br in bounding_regions])]
+
+    first_bins = br_offsets + region_starts // level_bin_size - br_starts // level_bin_size
+    last_bins = br_offsets + (region_ends + level_bin_size - 1) // level_bin_size - br_starts // level_bin_size
+    last_bins = numpy.maximum(first_bins, last_bins)
+
+    # only the bins spanned by the regions are read
+    first_read_bin = first_bins.min()
+    level_summaries = db_reader.get_node(get_summary_node_names(column_node_names, level_bin_size))
+    level_summaries = level_summaries[first_read_bin:max(last_bins.max(), first_read_bin + 1)]
+    db_reader.close()
+    first_bins -= first_read_bin
+    last_bins -= first_read_bin
+
+    cumulative = numpy.zeros((len(level_summaries) + 1, 3))
+    numpy.cumsum(level_summaries[:, [SUM, COUNT, SUM_OF_SQUARES]], axis=0, out=cumulative[1:])
+    summaries[:, [SUM, COUNT, SUM_OF_SQUARES]] = cumulative[last_bins] - cumulative[first_bins]
+
+    # reduceat on the interleaved first and last bins reduces each [first, last) range
+    padded = numpy.concatenate((level_summaries, numpy.zeros((1, 5))))
+    interleaved = numpy.column_stack((first_bins, last_bins)).reshape(-1)
+    is_empty = first_bins == last_bins
+    summaries[:, MIN] = numpy.where(is_empty, numpy.nan, numpy.fmin.reduceat(padded[:, MIN], interleaved)[::2])
+    summaries[:, MAX] = numpy.where(is_empty, numpy.nan, numpy.fmax.reduceat(padded[:, MAX], interleaved)[::2])
+
+    return summaries, is_aligned
+
+
+def _summarize_bounding_region(br, vals, ends, bin_size):
+    br_start, br_end = br['start'], br['end']
+    start_index, end_index = br['start_index'], br['end_index']
+
+    if ends is None:
+        br_vals = vals[start_index:end_index]
+        weights = None
+        positions = numpy.arange(br_start // bin_size + 1, (br_end - 1) // bin_size + 1) * bin_size - br_start
+        group_indices = numpy.concatenate(([0], positions))
+    else:
+        piece_ends = numpy.asarray(ends[start_index:end_index], dtype='int64')
+        piece_starts = numpy.concatenate(([br_start], piece_ends[:-1]))
+        is_nonempty = piece_ends > piece_starts
+        piece_starts, piece_ends = piece_starts[is_nonempty], piece_ends[is_nonempty]
+
+        bin_edges = numpy.arange(br_start // bin_size + 1, (br_end - 1) // bin_size + 1) * bin_size
+        boundaries = numpy.union1d(numpy.concatenate((piece_starts, piece_ends[-1:])), bin_edges)
+        br_vals = vals[start_index:end_index][is_nonempty][piece_starts.searchsorted(boundaries[:-1], side='right') - 1]
+        weights = numpy.diff(boundaries)
+        bin_numbers = boundaries[:-1] // bin_size
+        group_indices = numpy.flatnonzero(numpy.concatenate(([True], bin_numbers[1:] != bin_numbers[:-1])))
+
+    return _reduce_values(br_vals, weights, group_indices)
+
+
+def _reduce_values(vals, weights, group_indices):
+    is_valid = ~numpy.isnan(vals)
+    weights = is_valid.astype('float64') if weights is None else numpy.where(is_valid, weights, 0)
+    valid_vals = numpy.where(is_valid, vals, 0)
+
+    summaries = numpy.empty((len(group_indices), 5))
+    summaries[:, MIN] = numpy.fmin.reduceat(vals, group_indices)
+    summaries[:, MAX] = numpy.fmax.reduceat(vals, group_indices)
+    summaries[:, SUM] = numpy.add.reduceat(valid_vals * weights, group_indices)
+    summaries[:, COUNT] = numpy.add.reduceat(weights, group_indices)
+    summaries[:, SUM_OF_SQUARES] = numpy.add.reduceat(valid_vals * valid_vals * weights, group_indices)
+    return summaries
+
+
+def _merge_bins(summaries, first_bin_number, zoom_factor):
+    bin_numbers = (first_bin_number + numpy.arange(len(summaries))) // zoom_factor
+    group_indices = numpy.flatnonzero(numpy.concatenate(([True], bin_numbers[1:] != bin_numbers[:-1])))
+
+    merged = numpy.empty((len(group_indices), 5))
+    merged[:, MIN] = numpy.fmin.reduceat(summaries[:, MIN], group_indices)
+    merged[:, MAX] = numpy.fmax.reduceat(summaries[:, MAX], group_indices)
+    for column in [SUM, COUNT, SUM_OF_SQUARES]:
+        merged[:, column] = numpy.add.reduceat(summaries[:, column], group_indices)
+    return merged
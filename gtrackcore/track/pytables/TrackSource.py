@@ -1,6 +1,8 @@
 from gtrackcore.track.pytables.database.Database import DatabaseReader
+from gtrackcore.track.pytables.PrefixSums import PREFIX_SUM_SUFFIX, PREFIX_COUNT_SUFFIX
+from gtrackcore.track.pytables.SummaryPyramids import SUMMARY_SUFFIX
 from gtrackcore.track.pytables.VirtualTrackColumn import VirtualTrackColumn
-from gtrackcore.util.pytables.NameFunctions import get_database_filename, get_track_table_node_names, get_array_group_node_names
+from gtrackcore.util.pytables.NameFunctions import get_database_filename, get_array_group_node_names
 
 
 class TrackData(dict):
@@ -18,17 +20,16 @@ class TrackSource:
 
     def get_track_data(self, genome, trackName, allowOverlaps):
         database_filename = get_database_filename(genome, trackName, allow_overlaps=allowOverlaps)
-        table_node_names = get_track_table_node_names(genome, trackName, allowOverlaps)
+        array_group_node_names = get_array_group_node_names(genome, trackName, allowOverlaps)
 
+        # the columns are found from the column arrays, as the track table is not kept in columnar-only storage
         db_reader = DatabaseReader(database_filename)
         db_reader.open()
-        table = db_reader.get_table(table_node_names)
-        column_names = table.colnames
-        num_of_elements = table.nrows
+        column_names = get_column_names(db_reader.get_leaf_names(array_group_node_names))
+        num_of_elements = len(db_reader.get_node(array_group_node_names + [column_names[0]])) \
+            if len(column_names) > 0 else 0
         db_reader.close()
 
-        array_group_node_names = get_array_group_node_names(genome, trackName, allowOverlaps)
-
         for column_name in column_names:
             if column_name not in self.track_data[allowOverlaps]:
                 array_node_names = array_group_node_names + [column_name]
@@ -36,3 +37,10 @@ class TrackSource:
                                                                                  start_index=0, end_index=num_of_elements)
 
         return self.track_data[allowOverlaps]
+
+
+def get_column_names(array_names):
+    # leaves out the prefix sums and summary pyramids of the columns, which are named '_<column><suffix>...'
+    auxiliary_prefixes = tuple('_' + name + suffix for name in array_names
+                               for suffix in [PREFIX_SUM_SUFFIX, PREFIX_COUNT_SUFFIX, SUMMARY_SUFFIX])
+    return [name for name in array_names if not name.startswith(auxiliary_prefixes)]
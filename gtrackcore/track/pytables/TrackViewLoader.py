@@ -1,8 +1,10 @@
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
+
+import numpy
 
 from gtrackcore.track.core.TrackView import TrackView
 from gtrackcore.track.format.TrackFormat import TrackFormat
-from gtrackcore.track.pytables.database.IndexRetrieval import start_and_end_indices
+from gtrackcore.track.pytables.database.IndexRetrieval import start_and_end_indices, start_and_end_indices_for_regions
 from gtrackcore.util.CommonConstants import RESERVED_PREFIXES
 
 
@@ -10,21 +12,94 @@ class TrackViewLoader:
 
     @staticmethod
     def loadTrackView(trackData, region, borderHandling, allowOverlaps, trackName):
-        extra_column_names = [column_name for column_name in trackData if column_name not in RESERVED_PREFIXES.keys()]
-        reserved_columns = [trackData[column_name] if column_name in trackData else None
-                            for column_name in RESERVED_PREFIXES]
-        extra_columns = [trackData[column_name] if column_name in trackData else None
-                         for column_name in extra_column_names]
-
-        track_format = TrackFormat(*(reserved_columns + [OrderedDict(zip(extra_column_names, extra_columns))]))
+        reserved_columns, extra_columns = TrackViewLoader._get_columns(trackData)
+        track_format = TrackViewLoader._get_track_format(reserved_columns, extra_columns)
 
         start_index, end_index = start_and_end_indices(region, trackName, allowOverlaps, track_format)
 
-        for column in reserved_columns + extra_columns:
+        for column in reserved_columns + extra_columns.values():
             if column is not None:
                 column.offset = (start_index, end_index)
 
-        arg_list = [region] + reserved_columns + [borderHandling, allowOverlaps] + \
-                   [OrderedDict(zip(extra_column_names, extra_columns))]
+        arg_list = [region] + reserved_columns + [borderHandling, allowOverlaps] + [extra_columns]
 
         return TrackView(* arg_list, track_name=trackName, start_index=start_index, end_index=end_index)
+
+    @staticmethod
+    def loadTrackViews(trackData, regions, borderHandling, allowOverlaps, trackName):
+        """
+        Loads one TrackView per region, in the order of the regions. The row ranges of all regions are
+        resolved in one pass, and each column is read once per chromosome as a slice covering all the
+        regions in that chromosome. The TrackViews are backed by numpy views into these slices.
+        """
+        reserved_columns, extra_columns = TrackViewLoader._get_columns(trackData)
+        track_format = TrackViewLoader._get_track_format(reserved_columns, extra_columns)
+
+        indices = start_and_end_indices_for_regions(regions, trackName, allowOverlaps, track_format)
+
+        positions_per_chr = defaultdict(list)
+        for i, region in enumerate(regions):
+            positions_per_chr[region.chr].append(i)
+
+        track_views = [None] * len(regions)
+        for positions in positions_per_chr.values():
+            non_empty = [indices[i] for i in positions if indices[i][0] != indices[i][1]]
+            cover_start = min(start for start, end in non_empty) if non_empty else 0
+            cover_end = max(end for start, end in non_empty) if non_empty else 0
+
+            reserved_arrays = [column.read_slice(cover_start, cover_end) if column is not None else None
+                               for column in reserved_columns]
+            extra_arrays = OrderedDict((name, column.read_slice(cover_start, cover_end))
+                                       for name, column in extra_columns.iteritems())
+
+            for i in positions:
+                start_index, end_index = indices[i]
+                if start_index == end_index:
+                    rel_start = rel_end = 0
+                else:
+                    rel_start, rel_end = start_index - cover_start, end_index - cover_start
+
+                arg_list = [regions[i]] + \
+                           [array[rel_start:rel_end] if array is not None else None for array in reserved_arrays] + \
+                           [borderHandling, allowOverlaps] + \
+                           [OrderedDict((name, array[rel_start:rel_end]) for name, array in extra_arrays.iteritems())]
+
+                track_views[i] = TrackView(* arg_list, track_name=trackName,
+                                           start_index=start_index, end_index=end_index)
+
+        return track_views
+
+    @staticmethod
+    def loadValsSumsAndCounts(trackData, regions, allowOverlaps, trackName):
+        """
+        Returns arrays of the sum and the number of non-NaN values of each region, found by two
+        lookups per region in the prefix sums of the values. Returns None if no prefix sums are
+        stored, or if the regions may contain blind passengers (overlapping segments starting before
+        the region), which the prefix sums cannot leave out.
+        """
+        reserved_columns, extra_columns = TrackViewLoader._get_columns(trackData)
+        track_format = TrackViewLoader._get_track_format(reserved_columns, extra_columns)
+
+        if 'val' not in trackData or (allowOverlaps and track_format.isInterval() and not track_format.reprIsDense()):
+            return None
+
+        indices = numpy.array(start_and_end_indices_for_regions(regions, trackName, allowOverlaps, track_format),
+                              dtype='int64').reshape(-1, 2)
+        start_indices, end_indices = indices[:, 0], indices[:, 1]
+        if track_format.isPartition():
+            # the first row only holds the start of the first partition
+            start_indices = numpy.where(start_indices < end_indices, start_indices + 1, start_indices)
+
+        return trackData['val'].sums_and_counts_by_prefix_sums(start_indices, end_indices)
+
+    @staticmethod
+    def _get_columns(trackData):
+        extra_column_names = [column_name for column_name in trackData if column_name not in RESERVED_PREFIXES.keys()]
+        reserved_columns = [trackData[column_name] if column_name in trackData else None
+                            for column_name in RESERVED_PREFIXES]
+        extra_columns = OrderedDict((column_name, trackData[column_name]) for column_name in extra_column_names)
+        return reserved_columns, extra_columns
+
+    @staticmethod
+    def _get_track_format(reserved_columns, extra_columns):
+        return TrackFormat(*(reserved_columns + [extra_columns]))
@@ -1,4 +1,8 @@
+from gtrackcore.core.Config import Config
 from gtrackcore.track.core.VirtualNumpyArray import VirtualNumpyArray
+from gtrackcore.track.pytables.ColumnChunkCache import ColumnChunkCache
+from gtrackcore.track.pytables.ColumnMemmaps import ColumnMemmaps
+from gtrackcore.track.pytables.PrefixSums import read_sums_and_counts
 
 
 class VirtualTrackColumn(VirtualNumpyArray):
@@ -84,18 +88,55 @@ class VirtualTrackColumn(VirtualNumpyArray):
         return self._end_index - self._start_index
 
     def as_numpy_array(self):
+        return self.read_slice(self._start_index, self._end_index)[::self._step]
+
+    def read_slice(self, start_index, end_index):
+        """
+        Reads rows [start_index:end_index] of the column, independently of the current offset. If
+        Config.USE_MEMMAPPED_COLUMNS is set and the column is stored contiguously, a read-only view of
+        the memory-mapped column is returned instead of a copy. Reads through the ColumnChunkCache may
+        also return read-only views.
+        """
+        if Config.USE_MEMMAPPED_COLUMNS:
+            memmap = ColumnMemmaps.get(self._db_reader, self._array_node_names)
+            if memmap is not None:
+                return memmap[max(start_index, 0):end_index]
+
         self._db_reader.open()
-        array = self._db_reader.get_node(self._array_node_names)
-        result = array[self._start_index:self._end_index:self._step]
+        result = ColumnChunkCache.read(self._db_reader, self._array_node_names, start_index, end_index)
         self._db_reader.close()
         return result
 
+    def read_block(self, start, stop):
+        """
+        Reads rows [start:stop] of the column, relative to the current offset.
+        """
+        start_index = self._start_index + start
+        end_index = min(self._start_index + stop, self._end_index)
+        return self.read_slice(start_index, max(start_index, end_index))
+
+    def sum_and_count_by_prefix_sums(self):
+        """
+        Returns the sum and count of the non-NaN values within the current offset, using the prefix
+        sums stored for the column. Returns None if no prefix sums are stored.
+        """
+        if self._step != 1:
+            return None
+
+        result = self.sums_and_counts_by_prefix_sums([self._start_index], [self._end_index])
+        if result is None:
+            return None
+        return result[0][0], int(result[1][0])
+
+    def sums_and_counts_by_prefix_sums(self, start_indices, end_indices):
+        """
+        Vectorized variant of sum_and_count_by_prefix_sums for the row ranges
+        [start_indices[i]:end_indices[i]], independently of the current offset.
+        """
+        return read_sums_and_counts(self._db_reader, self._array_node_names, start_indices, end_indices)
+
     def ends_as_numpy_array_points_func(self):
         """
         Used for points tracks for ends (== starts + 1)
         """
-        self._db_reader.open()
-        array = self._db_reader.get_node(self._array_node_names)
-        result = array[self._start_index:self._end_index:self._step] + 1
-        self._db_reader.close()
-        return result
+        return self.read_slice(self._start_index, self._end_index)[::self._step] + 1
@@ -1,13 +1,18 @@
 from abc import abstractmethod, ABCMeta
+from collections import OrderedDict
 import os
+import time
 
 import tables
 from tables.exceptions import ClosedFileError, NodeError
 
 import gtrackcore.preprocess
+from gtrackcore.core.Config import Config
 from gtrackcore.third_party.portalocker import portalocker
+from gtrackcore.track.pytables.ColumnChunkCache import ColumnChunkCache
+from gtrackcore.track.pytables.ColumnMemmaps import ColumnMemmaps
 from gtrackcore.util.CustomExceptions import DBNotOpenError, DBNotExistError
-from gtrackcore.util.pytables.Constants import GTRACKCORE_FORMAT_SUFFIX
+from gtrackcore.util.pytables.Constants import GTRACKCORE_FORMAT_SUFFIX, MAX_CACHED_ARRAYS
 from gtrackcore.util.pytables.NameFunctions import get_node_path
 
 
@@ -19,6 +24,7 @@ class Database(object):
         self._db_name = h5_filename.split(os.sep)[-1][:-len(GTRACKCORE_FORMAT_SUFFIX)]
         self._h5_file = None
         self._cached_nodes = {}
+        self._cached_arrays = OrderedDict()
 
     def __enter__(self):
         self.open()
@@ -31,6 +37,10 @@ class Database(object):
     def h5_file(self):
         return self._h5_file
 
+    @property
+    def filename(self):
+        return self._h5_filename
+
     @abstractmethod
     def open(self, mode='r', lock_type=portalocker.LOCK_SH):
         try:
@@ -41,6 +51,7 @@ class Database(object):
 
     def close(self):
         self._cached_nodes = {}
+        self._cached_arrays = OrderedDict()
         self._h5_file.close()
 
     def table_exists(self, node_names):
@@ -65,6 +76,31 @@ class Database(object):
         except tables.group.NoSuchNodeError:
             return None
 
+    def get_leaf_names(self, group_node_names):
+        """
+        Returns the names of the tables and arrays in the group, or an empty list if there is no such group.
+        """
+        group = self.get_node(group_node_names)
+        if group is None:
+            return []
+        return sorted(leaf._v_name for leaf in group._f_list_nodes(classname='Leaf'))
+
+    def get_cached_array(self, key, create_func):
+        """
+        Returns the array cached under key, creating it with create_func() on a miss. At most
+        MAX_CACHED_ARRAYS arrays are kept, the least recently used being dropped first. The cache
+        lives as long as the file is open.
+        """
+        try:
+            array = self._cached_arrays.pop(key)
+        except KeyError:
+            array = create_func()
+            while len(self._cached_arrays) >= MAX_CACHED_ARRAYS:
+                self._cached_arrays.popitem(last=False)
+
+        self._cached_arrays[key] = array
+        return array
+
     def copy_node(self, node, target_node=None, recursive=True):
         self._h5_file.copy_node(node, newparent=target_node, recursive=recursive)
 
@@ -78,24 +114,47 @@ class DatabaseWriter(Database):
     def open(self):
         super(DatabaseWriter, self).open(mode='a', lock_type=portalocker.LOCK_EX)
 
-    def create_table(self, node_names, table_description, expectedrows):
+    def close(self):
+        super(DatabaseWriter, self).close()
+        _invalidate_cached_columns(self._h5_filename)
+
+    def create_table(self, node_names, table_description, expectedrows, filters=None, chunkshape=None):
         table_name = node_names[-1]
         group = self.create_groups(node_names[:-1])
 
         try:
             table = self._h5_file.create_table(group, table_name,
                                                table_description, table_name,
-                                               expectedrows=expectedrows)
+                                               expectedrows=expectedrows, filters=filters,
+                                               chunkshape=chunkshape)
         except ClosedFileError, e:
             raise DBNotOpenError(e)
 
         return table
 
-    def create_c_array_from_array(self, node_names, array):
+    def create_c_array_from_array(self, node_names, array, filters=None, chunkshape=None):
         c_array_name = node_names[-1]
         group = self.create_groups(node_names[:-1])
 
-        self._h5_file.create_carray(group, c_array_name, obj=array, filters=None)
+        if filters is None and chunkshape is None:
+            # contiguous storage, which allows the column to be memory-mapped when read
+            self._h5_file.create_array(group, c_array_name, obj=array)
+        else:
+            self._h5_file.create_carray(group, c_array_name, obj=array, filters=filters, chunkshape=chunkshape)
+
+    def create_c_array(self, node_names, atom, shape, filters=None, chunkshape=None):
+        """
+        Creates an empty array of the given atom and shape, to be filled in blocks. As for
+        create_c_array_from_array, the storage is contiguous if no filters or chunkshape are given.
+        """
+        c_array_name = node_names[-1]
+        group = self.create_groups(node_names[:-1])
+
+        if filters is None and chunkshape is None:
+            return self._h5_file.create_array(group, c_array_name, atom=atom, shape=shape)
+        else:
+            return self._h5_file.create_carray(group, c_array_name, atom=atom, shape=shape, filters=filters,
+                                               chunkshape=chunkshape)
 
     def remove_table(self, node_names):
         table_name = node_names[-1]
@@ -120,11 +179,18 @@ class DatabaseWriter(Database):
 
 
 class DatabaseReader(Database):
+    """
+    One reader per filename. The readers share a pool of at most Config.MAX_OPEN_DATABASE_FILES open
+    files. When the pool is full, the least recently used file that is not between an open() and a
+    close() is closed, and is transparently reopened on its next open(). The files that have been
+    closed this way, and not reopened since, are listed by get_evicted_filenames().
+    """
 
-    def __new__(cls, h5_filename):
-        if not hasattr(cls, '_db_readers'):
-            cls._db_readers = {}
+    _db_readers = {}
+    _open_db_readers = OrderedDict()  # in least recently used order
+    _evicted_filenames = set()
 
+    def __new__(cls, h5_filename):
         try:
             return cls._db_readers[h5_filename]
         except KeyError:
@@ -135,11 +201,90 @@ class DatabaseReader(Database):
     def __init__(self, h5_filename):
         if not hasattr(self, '_h5_file'):
             super(DatabaseReader, self).__init__(h5_filename)
+            self._usage_count = 0
+            self._hits = 0
+            self._misses = 0
+            self._open_time = 0.0
+            self._file_signature = None
+
+    @property
+    def file_signature(self):
+        # (st_ino, st_size, st_mtime) of the file when it was opened
+        return self._file_signature
+
+    def is_file_open(self):
+        return self._h5_file is not None and self._h5_file.isopen
 
     def open(self):
         if self._h5_file is None or not self._h5_file.isopen:
+            start_time = time.time()
             super(DatabaseReader, self).open(mode='r', lock_type=portalocker.LOCK_SH)
+            stat = os.stat(self._h5_filename)
+            self._file_signature = (stat.st_ino, stat.st_size, stat.st_mtime)
+            self._open_time += time.time() - start_time
+            self._misses += 1
+            # an open file has its metadata persisted at exit as any other open file
+            DatabaseReader._evicted_filenames.discard(self._h5_filename)
+            self._evict_least_recently_used_files()
+        else:
+            self._hits += 1
+
+        self._usage_count += 1
+        DatabaseReader._open_db_readers.pop(self._h5_filename, None)
+        DatabaseReader._open_db_readers[self._h5_filename] = self
 
     def close(self):
+        self._usage_count = max(0, self._usage_count - 1)
         if gtrackcore.preprocess.is_preprocessing:
+            self._usage_count = 0
+            self._close_file()
+            _invalidate_cached_columns(self._h5_filename)
+
+    def _close_file(self):
+        DatabaseReader._open_db_readers.pop(self._h5_filename, None)
+        if self._h5_file is not None and self._h5_file.isopen:
             super(DatabaseReader, self).close()
+        # the memory map of the file is released with it
+        ColumnMemmaps.invalidate(self._h5_filename)
+
+    def _evict_least_recently_used_files(self):
+        num_to_evict = len(DatabaseReader._open_db_readers) + 1 - Config.MAX_OPEN_DATABASE_FILES
+        if num_to_evict <= 0:
+            return
+
+        evictable = [db_reader for db_reader in DatabaseReader._open_db_readers.values()
+                     if db_reader is not self and db_reader._usage_count == 0]
+        for db_reader in evictable[:num_to_evict]:
+            db_reader._close_file()
+            DatabaseReader._evicted_filenames.add(db_reader._h5_filename)
+
+    @classmethod
+    def close_unused_files(cls):
+        for db_reader in cls._open_db_readers.values():
+            if db_reader._usage_count == 0:
+                db_reader._close_file()
+
+    @classmethod
+    def get_open_filenames(cls):
+        return [filename for filename, db_reader in cls._open_db_readers.iteritems()
+                if db_reader.h5_file is not None and db_reader.h5_file.isopen]
+
+    @classmethod
+    def get_evicted_filenames(cls):
+        return set(cls._evicted_filenames)
+
+    @classmethod
+    def get_file_handle_statistics(cls):
+        """
+        Per filename: the number of open() calls served by an already open file ('hits'), the number
+        of times the file had to be (re)opened ('misses') and the total time spent opening it.
+        """
+        return dict((filename, {'hits': db_reader._hits,
+                                'misses': db_reader._misses,
+                                'open_time': db_reader._open_time})
+                    for filename, db_reader in cls._db_readers.iteritems())
+
+
+def _invalidate_cached_columns(h5_filename):
+    ColumnChunkCache.invalidate(h5_filename)
+    ColumnMemmaps.invalidate(h5_filename)
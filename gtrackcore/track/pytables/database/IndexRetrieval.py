@@ -1,15 +1,33 @@
+from collections import defaultdict
+from functools import partial
+
+import numpy
 from tables.parameters import ITERSEQ_MAX_ELEMENTS
 
 from gtrackcore.track.pytables.database.Database import DatabaseReader
 from gtrackcore.track.pytables.database.Queries import BoundingRegionQueries
 from gtrackcore.util.CustomExceptions import ShouldNotOccurError
-from gtrackcore.util.pytables.NameFunctions import get_database_filename, get_track_table_node_names
+from gtrackcore.util.pytables.NameFunctions import get_database_filename, get_array_group_node_names
 
 
 ITERATION_THRESHOLD = ITERSEQ_MAX_ELEMENTS  # the critical region length where iteration is better performance-wise
 
 
 def start_and_end_indices(genome_region, track_name, allow_overlaps, track_format):
+    return _start_and_end_indices(genome_region, track_name, allow_overlaps, track_format,
+                                  _get_region_start_and_end_indices)
+
+
+def start_and_end_indices_by_iteration(genome_region, track_name, allow_overlaps, track_format):
+    """
+    Row-iterating variant of start_and_end_indices, kept as a reference for testing and benchmarking.
+    The rows are iterated over the start and end column arrays.
+    """
+    return _start_and_end_indices(genome_region, track_name, allow_overlaps, track_format,
+                                  _get_region_start_and_end_indices_by_iteration)
+
+
+def _start_and_end_indices(genome_region, track_name, allow_overlaps, track_format, sparse_index_func):
     br_queries = BoundingRegionQueries(genome_region.genome, track_name, allow_overlaps)
     bounding_region = br_queries.enclosing_bounding_region_for_region(genome_region)
 
@@ -25,34 +43,205 @@ def start_and_end_indices(genome_region, track_name, allow_overlaps, track_forma
         database_filename = get_database_filename(genome_region.genome, track_name, allow_overlaps=allow_overlaps)
         db_reader = DatabaseReader(database_filename)
         db_reader.open()
-        track_table_node_names = get_track_table_node_names(genome_region.genome, track_name, allow_overlaps)
-        table = db_reader.get_table(track_table_node_names)
-        start_index, end_index = _get_region_start_and_end_indices(genome_region, table, br_start_index,
-                                                                   br_end_index, track_format)
+        start_index, end_index = sparse_index_func(genome_region, db_reader, track_name, allow_overlaps,
+                                                   br_start_index, br_end_index, track_format)
         db_reader.close()
 
     return start_index, end_index
 
 
-def _get_region_start_and_end_indices(genome_region, table, br_start, br_stop, track_format):
+def start_and_end_indices_for_regions(genome_regions, track_name, allow_overlaps, track_format):
+    """
+    Resolves the row ranges of many regions of the same genome at once. Returns a list of
+    (start_index, end_index) tuples in the order of genome_regions.
+    """
+    indices = [(0, 0)] * len(genome_regions)
+    if len(genome_regions) == 0:
+        return indices
+
+    genome = genome_regions[0].genome
+    br_index = BoundingRegionQueries(genome, track_name, allow_overlaps).get_index()
+
+    region_positions_per_chr = defaultdict(list)
+    for i, region in enumerate(genome_regions):
+        assert region.genome == genome
+        region_positions_per_chr[region.chr].append(i)
+
+    db_reader = None
+    if not track_format.reprIsDense():
+        database_filename = get_database_filename(genome, track_name, allow_overlaps=allow_overlaps)
+        db_reader = DatabaseReader(database_filename)
+        db_reader.open()
+        array_group_node_names = get_array_group_node_names(genome, track_name, allow_overlaps)
+
+    for chr, positions in region_positions_per_chr.iteritems():
+        br_columns = br_index.get_columns(chr)
+        if br_columns is None:
+            continue
+
+        positions = numpy.array(positions)
+        region_starts = numpy.array([genome_regions[i].start for i in positions], dtype='int64')
+        region_ends = numpy.array([genome_regions[i].end for i in positions], dtype='int64')
+        br_positions = br_index.enclosing_positions(chr, region_starts, region_ends)
+
+        for br_position in numpy.unique(br_positions[br_positions >= 0]):
+            in_br = br_positions == br_position
+            br = dict((column, br_columns[column][br_position]) for column in ['start', 'start_index', 'end_index'])
+
+            if track_format.reprIsDense():
+                start_indices = br['start_index'] + (region_starts[in_br] - br['start'])
+                end_indices = start_indices + (region_ends[in_br] - region_starts[in_br])
+            else:
+                start_indices, end_indices = \
+                    _get_region_start_and_end_indices_for_bounding_region(db_reader, array_group_node_names,
+                                                                           allow_overlaps, br['start_index'],
+                                                                           br['end_index'], track_format,
+                                                                           region_starts[in_br], region_ends[in_br])
+
+            for position, start_index, end_index in zip(positions[in_br], start_indices, end_indices):
+                indices[position] = (int(start_index), int(end_index))
+
+    if db_reader is not None:
+        db_reader.close()
+
+    return indices
+
+
+def _get_region_start_and_end_indices_for_bounding_region(db_reader, array_group_node_names, allow_overlaps,
+                                                          br_start, br_stop, track_format, region_starts, region_ends):
+    get_column = partial(_get_bounding_region_column, db_reader, array_group_node_names, br_start, br_stop)
+
+    if track_format.isSegment():
+        end_column = get_column('max_end' if allow_overlaps else 'end')
+        start_indices, end_indices = segment_index_ranges(get_column('start'), end_column, region_starts, region_ends)
+    elif track_format.isPoint():
+        start_indices, end_indices = point_index_ranges(get_column('start'), region_starts, region_ends)
+    elif track_format.isPartition():
+        start_indices, end_indices = partition_index_ranges(get_column('end'), region_starts, region_ends)
+    else:
+        raise ShouldNotOccurError
+
+    is_empty = start_indices == end_indices
+    return numpy.where(is_empty, 0, start_indices + br_start), numpy.where(is_empty, 0, end_indices + br_start)
+
+
+def _get_region_start_and_end_indices(genome_region, db_reader, track_name, allow_overlaps,
+                                      br_start, br_stop, track_format):
+    array_group_node_names = get_array_group_node_names(genome_region.genome, track_name, allow_overlaps)
+    get_column = partial(_get_bounding_region_column, db_reader, array_group_node_names, br_start, br_stop)
+
     if track_format.isSegment():
-        start_index = _start_index_for_segments(table, genome_region, br_start, br_stop)
+        # ends are only sorted when overlaps have been clustered away
+        end_column = get_column('max_end' if allow_overlaps else 'end')
+        start_index, end_index = segment_index_range(get_column('start'), end_column,
+                                                     genome_region.start, genome_region.end)
+    elif track_format.isPoint():
+        start_index, end_index = point_index_range(get_column('start'), genome_region.start, genome_region.end)
+    elif track_format.isPartition():
+        start_index, end_index = partition_index_range(get_column('end'), genome_region.start, genome_region.end)
+    else:
+        raise ShouldNotOccurError
+
+    if start_index == end_index:
+        return 0, 0
+
+    return br_start + start_index, br_start + end_index
+
+
+def _get_bounding_region_column(db_reader, array_group_node_names, br_start, br_stop, column_name):
+    key = (tuple(array_group_node_names), column_name, br_start, br_stop)
+    return db_reader.get_cached_array(key, partial(_read_bounding_region_column, db_reader, array_group_node_names,
+                                                   br_start, br_stop, column_name))
+
+
+def _read_bounding_region_column(db_reader, array_group_node_names, br_start, br_stop, column_name):
+    if column_name == 'max_end':
+        ends = _get_bounding_region_column(db_reader, array_group_node_names, br_start, br_stop, 'end')
+        return numpy.maximum.accumulate(ends) if len(ends) > 0 else ends
+
+    return db_reader.get_node(array_group_node_names + [column_name])[br_start:br_stop]
+
+
+def segment_index_range(starts, max_ends, region_start, region_end):
+    """
+    Returns the range of rows, relative to the given columns, of the segments touching the region.
+    The segments must be sorted on start, and max_ends must be non-decreasing (the ends themselves
+    for tracks without overlaps, otherwise their running maximum). Rows ending before the region
+    (blind passengers) may be included when overlaps are allowed.
+    """
+    start_index = max_ends.searchsorted(region_start, side='right')
+    end_index = starts.searchsorted(region_end, side='left')
+    return (int(start_index), int(end_index)) if start_index < end_index else (0, 0)
+
+
+def point_index_range(starts, region_start, region_end):
+    start_index = starts.searchsorted(region_start, side='left')
+    end_index = starts.searchsorted(region_end, side='left')
+    return (int(start_index), int(end_index)) if start_index < end_index else (0, 0)
+
+
+def partition_index_range(ends, region_start, region_end):
+    """
+    Includes the row of the first partition border at or after region_end, which TrackView needs
+    as the end of the last partition.
+    """
+    start_index = ends.searchsorted(region_start, side='left')
+    end_index = ends.searchsorted(region_end, side='left')
+    return (int(start_index), int(min(end_index + 1, len(ends)))) if start_index < end_index else (0, 0)
+
+
+def segment_index_ranges(starts, max_ends, region_starts, region_ends):
+    """
+    Vectorized version of segment_index_range. Returns arrays of start and end indices.
+    """
+    start_indices = max_ends.searchsorted(region_starts, side='right')
+    end_indices = starts.searchsorted(region_ends, side='left')
+    return _zero_empty_ranges(start_indices, end_indices, start_indices >= end_indices)
+
+
+def point_index_ranges(starts, region_starts, region_ends):
+    start_indices = starts.searchsorted(region_starts, side='left')
+    end_indices = starts.searchsorted(region_ends, side='left')
+    return _zero_empty_ranges(start_indices, end_indices, start_indices >= end_indices)
+
+
+def partition_index_ranges(ends, region_starts, region_ends):
+    start_indices = ends.searchsorted(region_starts, side='left')
+    end_indices = ends.searchsorted(region_ends, side='left')
+    is_empty = start_indices >= end_indices
+    return _zero_empty_ranges(start_indices, numpy.minimum(end_indices + 1, len(ends)), is_empty)
+
+
+def _zero_empty_ranges(start_indices, end_indices, is_empty):
+    start_indices[is_empty] = 0
+    end_indices[is_empty] = 0
+    return start_indices, end_indices
+
+
+def _get_region_start_and_end_indices_by_iteration(genome_region, db_reader, track_name, allow_overlaps,
+                                                   br_start, br_stop, track_format):
+    array_group_node_names = get_array_group_node_names(genome_region.genome, track_name, allow_overlaps)
+    columns = dict((column_name, db_reader.get_node(array_group_node_names + [column_name]))
+                   for column_name in ['start', 'end'])
+
+    if track_format.isSegment():
+        start_index = _start_index_for_segments(columns, genome_region, br_start, br_stop)
         if start_index is not None:
-            end_index = _end_index_for_segments_and_points(table, genome_region, start_index, br_stop)
+            end_index = _end_index_for_segments_and_points(columns, genome_region, start_index, br_stop)
         else:
             return 0, 0
 
     elif track_format.isPoint():
-        start_index = _start_index_for_points(table, genome_region, br_start, br_stop)
+        start_index = _start_index_for_points(columns, genome_region, br_start, br_stop)
         if start_index is not None:
-            end_index = _end_index_for_segments_and_points(table, genome_region, start_index, br_stop)
+            end_index = _end_index_for_segments_and_points(columns, genome_region, start_index, br_stop)
         else:
             return 0, 0
 
     elif track_format.isPartition():
-        start_index = _start_index_for_partitions(table, genome_region, br_start, br_stop)
+        start_index = _start_index_for_partitions(columns, genome_region, br_start, br_stop)
         if start_index is not None:
-            end_index = _end_index_for_partitions(table, genome_region, start_index, br_stop)
+            end_index = _end_index_for_partitions(columns, genome_region, start_index, br_stop)
         else:
             return 0, 0
 
@@ -65,57 +254,68 @@ def _get_region_start_and_end_indices(genome_region, table, br_start, br_stop, t
     return start_index, end_index
 
 
-def _start_index_for_segments(table, genome_region, min_index, max_index):
-    min_index, max_index = _improve_min_and_max_index(table, min_index, max_index, 'start', genome_region.start)
+def _iter_rows(columns, column_names, min_index, max_index):
+    """
+    Yields the index and the values of the given columns for each row from min_index to max_index,
+    reading the column arrays in blocks.
+    """
+    for block_start in xrange(min_index, max_index, ITERATION_THRESHOLD):
+        block_stop = min(block_start + ITERATION_THRESHOLD, max_index)
+        blocks = [columns[column_name][block_start:block_stop] for column_name in column_names]
+        for i, values in enumerate(zip(*blocks)):
+            yield (block_start + i,) + values
+
+
+def _start_index_for_segments(columns, genome_region, min_index, max_index):
+    min_index, max_index = _improve_min_and_max_index(columns, min_index, max_index, 'start', genome_region.start)
 
-    for row in table.iterrows(start=min_index, stop=max_index):
-        if (row['start'] < genome_region.start < row['end']) or (genome_region.start <= row['start'] < genome_region.end):
-            return row.nrow
+    for index, start, end in _iter_rows(columns, ['start', 'end'], min_index, max_index):
+        if (start < genome_region.start < end) or (genome_region.start <= start < genome_region.end):
+            return index
     return None
 
 
-def _start_index_for_points(table, genome_region, min_index, max_index):
-    min_index, max_index = _improve_min_and_max_index(table, min_index, max_index, 'start', genome_region.start)
+def _start_index_for_points(columns, genome_region, min_index, max_index):
+    min_index, max_index = _improve_min_and_max_index(columns, min_index, max_index, 'start', genome_region.start)
 
-    for row in table.iterrows(start=min_index, stop=max_index):
-        if genome_region.start <= row['start'] < genome_region.end:
-            return row.nrow
+    for index, start in _iter_rows(columns, ['start'], min_index, max_index):
+        if genome_region.start <= start < genome_region.end:
+            return index
     return None
 
 
-def _start_index_for_partitions(table, genome_region, min_index, max_index):
-    min_index, max_index = _improve_min_and_max_index(table, min_index, max_index, 'end', genome_region.start)
+def _start_index_for_partitions(columns, genome_region, min_index, max_index):
+    min_index, max_index = _improve_min_and_max_index(columns, min_index, max_index, 'end', genome_region.start)
 
-    for row in table.iterrows(start=min_index, stop=max_index):
-        if genome_region.start <= row['end'] < genome_region.end:
-            return row.nrow
+    for index, end in _iter_rows(columns, ['end'], min_index, max_index):
+        if genome_region.start <= end < genome_region.end:
+            return index
     return None
 
 
-def _end_index_for_segments_and_points(table, genome_region, min_index, max_index):
-    min_index, max_index = _improve_min_and_max_index(table, min_index, max_index, 'start', genome_region.end)
+def _end_index_for_segments_and_points(columns, genome_region, min_index, max_index):
+    min_index, max_index = _improve_min_and_max_index(columns, min_index, max_index, 'start', genome_region.end)
 
-    for row in table.iterrows(start=min_index, stop=max_index):
-        if row['start'] >= genome_region.end:
-            return row.nrow
+    for index, start in _iter_rows(columns, ['start'], min_index, max_index):
+        if start >= genome_region.end:
+            return index
     return None
 
 
-def _end_index_for_partitions(table, genome_region, min_index, max_index):
-    min_index, max_index = _improve_min_and_max_index(table, min_index, max_index, 'end', genome_region.end)
+def _end_index_for_partitions(columns, genome_region, min_index, max_index):
+    min_index, max_index = _improve_min_and_max_index(columns, min_index, max_index, 'end', genome_region.end)
 
-    for row in table.iterrows(start=min_index, stop=max_index):
-        if row['end'] >= genome_region.end:
-            return row.nrow + 1
+    for index, end in _iter_rows(columns, ['end'], min_index, max_index):
+        if end >= genome_region.end:
+            return index + 1
     return None
 
 
-def _improve_min_and_max_index(table, min_index, max_index, column, region_side):
+def _improve_min_and_max_index(columns, min_index, max_index, column, region_side):
     while max_index - min_index > ITERATION_THRESHOLD:
         mid_index = min_index + ((max_index - min_index) / 2)
-        row = table[mid_index]
 
-        if row[column] < region_side:
+        if columns[column][mid_index] < region_side:
             min_index = mid_index + 1
         else:
             max_index = mid_index
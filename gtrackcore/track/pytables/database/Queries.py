@@ -1,3 +1,7 @@
+import os
+
+import numpy
+
 from gtrackcore.track.pytables.database.Database import DatabaseReader
 from gtrackcore.util.pytables.NameFunctions import get_database_filename, get_br_table_node_names
 
@@ -9,70 +13,133 @@ class DatabaseQueries(object):
         self._track_name = track_name
         self._allow_overlaps = allow_overlaps
 
-        database_filename = get_database_filename(genome, track_name, allow_overlaps=allow_overlaps)
-        self._db_reader = DatabaseReader(database_filename)
+        self._database_filename = get_database_filename(genome, track_name, allow_overlaps=allow_overlaps)
+        self._db_reader = DatabaseReader(self._database_filename)
+
+
+class BoundingRegionIndex(object):
+    """
+    The bounding region table of a track, held in memory as NumPy arrays per chromosome, sorted by
+    start. As bounding regions of a chromosome never overlap, the ends are sorted as well.
+
+    The rows of the table are grouped by chromosome and sorted by start within each chromosome, as
+    checked when the bounding regions are stored, so the arrays of a chromosome are slices of the
+    columns of the table.
+    """
+    COLUMNS = ['start', 'end', 'start_index', 'end_index', 'element_count']
+
+    def __init__(self, table):
+        rows = table.read()
+        columns = dict((column, rows[column].astype('int64')) for column in self.COLUMNS)
+
+        chrs, first_indices = numpy.unique(rows['chr'], return_index=True)
+        chr_order = numpy.argsort(first_indices)
+        self._chrs = chrs[chr_order].tolist()
+        group_bounds = numpy.append(first_indices[chr_order], len(rows))
+
+        self._columns_per_chr = {}
+        for chr, start, end in zip(self._chrs, group_bounds[:-1], group_bounds[1:]):
+            self._columns_per_chr[chr] = dict((column, columns[column][start:end]) for column in self.COLUMNS)
+
+    def get_columns(self, chr):
+        return self._columns_per_chr.get(chr)
+
+    def element_count_for_chr(self, chr):
+        columns = self.get_columns(chr)
+        return int(columns['element_count'].sum()) if columns is not None else 0
+
+    def enclosing(self, chr, region_start, region_end):
+        columns = self.get_columns(chr)
+        if columns is None:
+            return []
+        i = columns['start'].searchsorted(region_start, side='right') - 1
+        if i >= 0 and columns['end'][i] >= region_end:
+            return self._bounding_regions(chr, i, i + 1)
+        return []
+
+    def enclosing_positions(self, chr, region_starts, region_ends):
+        """
+        Vectorized variant of enclosing(). Returns the positions of the enclosing bounding regions
+        within get_columns(chr), or -1 for regions not enclosed by any bounding region.
+        """
+        columns = self.get_columns(chr)
+        if columns is None:
+            return numpy.zeros(len(region_starts), dtype='int64') - 1
+        positions = columns['start'].searchsorted(region_starts, side='right') - 1
+        is_enclosed = (positions >= 0) & (columns['end'][positions.clip(min=0)] >= region_ends)
+        return numpy.where(is_enclosed, positions, -1)
+
+    def enclosed_by(self, chr, region_start, region_end):
+        columns = self.get_columns(chr)
+        if columns is None:
+            return []
+        return self._bounding_regions(chr, columns['start'].searchsorted(region_start, side='left'),
+                                      columns['end'].searchsorted(region_end, side='left'))
+
+    def touched_by(self, chr, region_start, region_end):
+        columns = self.get_columns(chr)
+        if columns is None:
+            return []
+        return self._bounding_regions(chr, columns['end'].searchsorted(region_start, side='right'),
+                                      columns['start'].searchsorted(region_end, side='left'))
+
+    def all(self):
+        return [br for chr in self._chrs
+                for br in self._bounding_regions(chr, 0, len(self._columns_per_chr[chr]['start']))]
+
+    def _bounding_regions(self, chr, start, stop):
+        columns = self._columns_per_chr[chr]
+        return [{'chr': chr,
+                 'start': columns['start'][i],
+                 'end': columns['end'][i],
+                 'start_index': columns['start_index'][i],
+                 'end_index': columns['end_index'][i]}
+                for i in xrange(start, stop)]
 
 
 class BoundingRegionQueries(DatabaseQueries):
+    _br_indexes = {}
 
     def __init__(self, genome, track_name, allow_overlaps):
         super(BoundingRegionQueries, self).__init__(genome, track_name, allow_overlaps)
         self._table_node_names = get_br_table_node_names(genome, track_name, allow_overlaps)
 
-    def total_element_count_for_chr(self, chromosome):
-        self._db_reader.open()
-        table = self._db_reader.get_table(self._table_node_names)
+    @classmethod
+    def clear_cached_indexes(cls):
+        cls._br_indexes.clear()
+
+    def get_index(self):
+        """
+        Returns the in-memory BoundingRegionIndex of the track. The index is reloaded whenever the
+        database file has been changed or replaced, e.g. when the track is preprocessed again.
+        """
+        key = (self._database_filename, tuple(self._table_node_names))
+        stat = os.stat(self._database_filename)
+        signature = (stat.st_ino, stat.st_size, stat.st_mtime)
 
-        result = [row['element_count'] for row in table.where('(chr == region_chr)',
-                                                              condvars={'region_chr': chromosome})]
+        if key in self._br_indexes:
+            cached_signature, br_index = self._br_indexes[key]
+            if cached_signature == signature:
+                return br_index
 
+        self._db_reader.open()
+        br_index = BoundingRegionIndex(self._db_reader.get_table(self._table_node_names))
         self._db_reader.close()
 
-        return sum(result) if len(result) > 0 else 0
+        self._br_indexes[key] = (signature, br_index)
+        return br_index
+
+    def total_element_count_for_chr(self, chromosome):
+        return self.get_index().element_count_for_chr(chromosome)
 
     def enclosing_bounding_region_for_region(self, genome_region):
-        query = '(chr == region_chr) & (start <= region_start) & (end >= region_end)'
-        return self._all_bounding_regions_for_region(genome_region, query)
+        return self.get_index().enclosing(genome_region.chr, genome_region.start, genome_region.end)
 
     def all_bounding_regions_enclosed_by_region(self, genome_region):
-        query = '(chr == region_chr) & (start >= region_start) & (end < region_end)'
-        return self._all_bounding_regions_for_region(genome_region, query)
+        return self.get_index().enclosed_by(genome_region.chr, genome_region.start, genome_region.end)
 
     def all_bounding_regions_touched_by_region(self, genome_region):
-        query = '(chr == region_chr) & (start < region_end) & (end > region_start)'
-        return self._all_bounding_regions_for_region(genome_region, query)
+        return self.get_index().touched_by(genome_region.chr, genome_region.start, genome_region.end)
 
     def all_bounding_regions(self):
-        self._db_reader.open()
-        table = self._db_reader.get_table(self._table_node_names)
-
-        bounding_regions = [{'chr': row['chr'],
-                             'start': row['start'],
-                             'end': row['end'],
-                             'start_index': row['start_index'],
-                             'end_index': row['end_index']}
-                            for row in table]
-
-        self._db_reader.close()
-
-        return bounding_regions
-
-    def _all_bounding_regions_for_region(self, genome_region, query):
-        self._db_reader.open()
-        table = self._db_reader.get_table(self._table_node_names)
-
-        bounding_regions = [{'chr': row['chr'],
-                             'start': row['start'],
-                             'end': row['end'],
-                             'start_index': row['start_index'],
-                             'end_index': row['end_index']}
-                            for row in table.where(query,
-                                                   condvars={
-                                                       'region_chr': genome_region.chr,
-                                                       'region_start': genome_region.start,
-                                                       'region_end': genome_region.end
-                                                   })]
-
-        self._db_reader.close()
-
-        return bounding_regions
+        return self.get_index().all()
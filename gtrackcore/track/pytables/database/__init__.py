@@ -2,6 +2,7 @@ import tables
 import atexit
 from gtrackcore.metadata.TrackInfo import DynamicTrackInfo
 from gtrackcore.util.CustomExceptions import DBNotExistError
+from gtrackcore.track.pytables.database.Database import DatabaseReader
 from gtrackcore.track.pytables.database.MetadataHandler import MetadataHandler
 from gtrackcore.util.pytables.NameFunctions import get_genome_and_trackname
 
@@ -32,7 +33,8 @@ def close_pytables_files():
             if filename in tables.file._open_files:
                 del tables.file._open_files[filename]
 
-    _persist_metadata(filenames)
+    # files closed by the DatabaseReader file handle pool must also have their metadata persisted
+    _persist_metadata(set(filenames) | DatabaseReader.get_evicted_filenames())
 
 
 def _persist_metadata(filenames):
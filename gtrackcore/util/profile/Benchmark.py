@@ -0,0 +1,620 @@
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy
+import tables
+
+from gtrackcore.track.core.GenomeRegion import GenomeRegion
+from gtrackcore.track.pytables.BoundingRegionHandler import BoundingRegionHandler
+
+
+def time_call(func, *args, **kwArgs):
+    start_time = time.time()
+    result = func(*args, **kwArgs)
+    return time.time() - start_time, result
+
+
+def print_timings(title, timings):
+    print title
+    for name, seconds in timings:
+        print '\t%-40s %10.4f s' % (name, seconds)
+
+
+def get_random_regions(genome, track_name, allow_overlaps, num_regions, region_len, seed=0):
+    rand = random.Random(seed)
+    bounding_regions = [br for br in BoundingRegionHandler(genome, track_name, allow_overlaps).get_all_bounding_regions()
+                        if len(br) >= region_len]
+    assert len(bounding_regions) > 0, 'No bounding regions are longer than %s bps' % region_len
+
+    regions = []
+    for _ in xrange(num_regions):
+        br = rand.choice(bounding_regions)
+        start = rand.randint(br.start, br.end - region_len)
+        regions.append(GenomeRegion(genome, br.chr, start, start + region_len))
+    return regions
+
+
+def benchmark_index_retrieval(genome, track_name, allow_overlaps, track_format, num_regions=1000, region_len=10000):
+    """
+    Compares the searchsorted-based region-to-row resolution with the row-iterating one. Meant to be
+    run on a large sparse track, e.g. one with 10M rows.
+    """
+    from gtrackcore.track.pytables.database.IndexRetrieval import start_and_end_indices, \
+        start_and_end_indices_by_iteration
+
+    regions = get_random_regions(genome, track_name, allow_overlaps, num_regions, region_len)
+
+    def resolve_all(index_func):
+        return [index_func(region, track_name, allow_overlaps, track_format) for region in regions]
+
+    iteration_time, iteration_result = time_call(resolve_all, start_and_end_indices_by_iteration)
+    vectorized_time, vectorized_result = time_call(resolve_all, start_and_end_indices)
+    cached_time, cached_result = time_call(resolve_all, start_and_end_indices)
+
+    print_timings('Index retrieval for %s regions of %s bps:' % (num_regions, region_len),
+                  [('by iteration', iteration_time),
+                   ('vectorized', vectorized_time),
+                   ('vectorized, cached columns', cached_time)])
+
+    if iteration_result != vectorized_result:
+        print 'Note: the results differ for %s regions (the iterating version may skip long overlapping segments)' \
+              % sum(1 for x, y in zip(iteration_result, vectorized_result) if x != y)
+
+
+def benchmark_track_view_iteration(genome, track_name, allow_overlaps, track_format):
+    """
+    Compares iterating the elements of a TrackView covering each bounding region block-wise over
+    the column arrays with iterating the corresponding rows of the track table.
+    """
+    from gtrackcore.track.pytables.database.Database import DatabaseReader
+    from gtrackcore.track.pytables.database.IndexRetrieval import start_and_end_indices
+    from gtrackcore.tools.TrackOperations import get_track_view
+    from gtrackcore.util.pytables.NameFunctions import get_database_filename, get_track_table_node_names
+
+    regions = list(BoundingRegionHandler(genome, track_name, allow_overlaps).get_all_bounding_regions())
+
+    def iterate_track_views():
+        return sum(el.start() + el.end() for region in regions
+                   for el in get_track_view(track_name, allow_overlaps, region))
+
+    def iterate_table_rows():
+        db_reader = DatabaseReader(get_database_filename(genome, track_name, allow_overlaps=allow_overlaps))
+        db_reader.open()
+        table = db_reader.get_table(get_track_table_node_names(genome, track_name, allow_overlaps))
+        result = 0
+        for region in regions:
+            start_index, end_index = start_and_end_indices(region, track_name, allow_overlaps, track_format)
+            for row in table.iterrows(start=start_index, stop=end_index):
+                result += max(row['start'] - region.start, 0) + min(row['end'], region.end) - region.start
+        db_reader.close()
+        return result
+
+    row_time, row_result = time_call(iterate_table_rows)
+    block_time, block_result = time_call(iterate_track_views)
+
+    print_timings('Iteration over %s bounding regions:' % len(regions),
+                  [('table rows', row_time),
+                   ('TrackView, column blocks', block_time)])
+
+    if row_result != block_result:
+        print 'Note: the results differ (the table row reference only handles segment tracks)'
+
+
+def benchmark_storage_policies(storage_policies=None, num_rows=10 ** 7, num_regions=1000, region_len=10000, seed=0):
+    """
+    Prints the on-disk size and the region read latency of synthetic points, segments and function
+    columns stored with each of the storage policies. Reads go directly to PyTables, bypassing the
+    column chunk cache.
+    """
+    from gtrackcore.track.pytables.database.Database import DatabaseWriter
+    from gtrackcore.util.pytables.StoragePolicy import StoragePolicy
+
+    if storage_policies is None:
+        storage_policies = [StoragePolicy(),
+                            StoragePolicy(chunk_length=2 ** 16),
+                            StoragePolicy(complib='zlib', complevel=1),
+                            StoragePolicy(complib='zlib', complevel=5),
+                            StoragePolicy(complib='blosc', complevel=5),
+                            StoragePolicy(complib='blosc:lz4', complevel=5),
+                            StoragePolicy(complib='blosc:lz4', complevel=5, shuffle=False)]
+
+    rand = numpy.random.RandomState(seed)
+    starts = numpy.cumsum(rand.randint(0, 200, size=num_rows)).astype('int32')
+    ends = starts + rand.randint(1, 500, size=num_rows).astype('int32')
+    track_columns = [('points', {'start': starts}),
+                     ('segments', {'start': starts, 'end': ends}),
+                     ('function', {'val': rand.normal(size=num_rows).astype('float32')})]
+
+    region_starts = rand.randint(0, starts[-1] - region_len, size=num_regions)
+    sparse_row_ranges = zip(starts.searchsorted(region_starts), starts.searchsorted(region_starts + region_len))
+    dense_row_ranges = [(start, start + region_len) for start in rand.randint(0, num_rows - region_len,
+                                                                              size=num_regions)]
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        print 'Storage of %s rows, read latency of %s regions of %s bps:' % (num_rows, num_regions, region_len)
+        print '\t%-102s %-10s %12s %14s' % ('storage policy', 'track', 'size (MB)', 'latency (ms)')
+        for i, storage_policy in enumerate(storage_policies):
+            for track_type, columns in track_columns:
+                filename = os.path.join(temp_dir, '%s_%s.h5' % (track_type, i))
+                db_writer = DatabaseWriter(filename)
+                db_writer.open()
+                for column_name, column in columns.iteritems():
+                    db_writer.create_c_array_from_array(['columns', column_name], column,
+                                                        filters=storage_policy.get_filters(),
+                                                        chunkshape=storage_policy.get_chunkshape(column.shape))
+                db_writer.close()
+
+                row_ranges = dense_row_ranges if track_type == 'function' else sparse_row_ranges
+                h5_file = tables.open_file(filename, mode='r')
+                arrays = [h5_file.get_node('/columns/' + column_name) for column_name in columns]
+                read_time, _ = time_call(lambda: [array[start:end] for start, end in row_ranges for array in arrays])
+                h5_file.close()
+
+                print '\t%-102s %-10s %12.1f %14.3f' % (storage_policy, track_type,
+                                                       os.path.getsize(filename) / 1e6, 1000 * read_time / num_regions)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def benchmark_single_pass_preprocessing(genome, num_elements=10 ** 6, seed=0):
+    """
+    Compares the wall time and the number of bytes read when preprocessing a synthetic BED track of
+    the genome with and without the extra statistics pass over the input (see
+    Config.SINGLE_PASS_PREPROCESSING). The bytes read are taken from /proc/self/io, where available.
+    """
+    from gtrackcore.core.Config import Config
+    from gtrackcore.preprocess.PreProcessTracksJob import PreProcessAllTracksJob
+
+    track_names = [['benchmark', 'two_passes'], ['benchmark', 'single_pass']]
+    prev_single_pass = Config.SINGLE_PASS_PREPROCESSING
+    results = []
+    try:
+        for single_pass, track_name in zip([False, True], track_names):
+            _create_synthetic_bed_track(genome, track_name, num_elements, seed)
+
+            Config.SINGLE_PASS_PREPROCESSING = single_pass
+            bytes_read_before = _get_bytes_read()
+            seconds, _ = time_call(PreProcessAllTracksJob(genome, track_name).process)
+            bytes_read = _get_bytes_read() - bytes_read_before if bytes_read_before is not None else float('nan')
+            results.append(('single pass' if single_pass else 'statistics pass + writing pass',
+                            seconds, bytes_read / 1e6))
+    finally:
+        Config.SINGLE_PASS_PREPROCESSING = prev_single_pass
+        _remove_benchmark_tracks(genome, track_names)
+
+    print 'Preprocessing of a BED track of %s elements:' % num_elements
+    print '\t%-40s %12s %12s' % ('mode', 'time (s)', 'read (MB)')
+    for mode, seconds, megabytes_read in results:
+        print '\t%-40s %12.2f %12.1f' % (mode, seconds, megabytes_read)
+
+
+def benchmark_preprocessing_throughput(genome, num_elements=10 ** 6, seed=0):
+    """
+    Prints the preprocessing throughput in rows per second for a synthetic BED track of the genome,
+    counting the rows written for both overlap rules.
+    """
+    from gtrackcore.preprocess.PreProcessTracksJob import PreProcessAllTracksJob
+
+    track_name = ['benchmark', 'throughput']
+    try:
+        _create_synthetic_bed_track(genome, track_name, num_elements, seed)
+        seconds, _ = time_call(PreProcessAllTracksJob(genome, track_name).process)
+    finally:
+        _remove_benchmark_tracks(genome, [track_name])
+
+    print 'Preprocessing of a BED track of %s elements:' % num_elements
+    print '\t%-40s %10.2f s' % ('time', seconds)
+    print '\t%-40s %10.0f' % ('rows per second', 2 * num_elements / seconds)
+
+
+def benchmark_parallel_preprocessing(genome, num_tracks=8, num_elements=10 ** 5, worker_counts=(1, 2, 4), seed=0):
+    """
+    Prints the wall time of preprocessing num_tracks synthetic BED tracks of the genome with
+    different numbers of worker processes (see Config.PREPROCESSING_WORKERS).
+    """
+    from gtrackcore.preprocess.PreProcessTracksJob import PreProcessAllTracksJob
+
+    parent_track_name = ['benchmark', 'parallel']
+    track_names = [parent_track_name + ['track%d' % i] for i in xrange(num_tracks)]
+    results = []
+    try:
+        for num_workers in worker_counts:
+            for i, track_name in enumerate(track_names):
+                _create_synthetic_bed_track(genome, track_name, num_elements, seed + i)
+            seconds, _ = time_call(PreProcessAllTracksJob(genome, parent_track_name, numWorkers=num_workers).process)
+            results.append((num_workers, seconds))
+            _remove_benchmark_tracks(genome, track_names + [parent_track_name])
+    finally:
+        _remove_benchmark_tracks(genome, track_names + [parent_track_name])
+
+    print 'Preprocessing of %s BED tracks of %s elements (%s cpus):' % (num_tracks, num_elements,
+                                                                       multiprocessing.cpu_count())
+    print '\t%-40s %12s %12s' % ('workers', 'time (s)', 'speedup')
+    for num_workers, seconds in results:
+        print '\t%-40s %12.2f %12.2f' % (num_workers, seconds, results[0][1] / seconds)
+
+
+def benchmark_chromosome_sharded_preprocessing(genome, num_elements=10 ** 6, worker_counts=(1, 2, 4), seed=0):
+    """
+    Prints the wall time of preprocessing a synthetic BED track of the genome with the rows sharded
+    by chromosome between different numbers of worker processes (see Config.CHROMOSOME_SHARD_WORKERS).
+    One worker means no sharding. The time used for writing and for merging the shards, summed over
+    both overlap rules, is read from the ChromosomeShards of the preprocessing.
+    """
+    from gtrackcore.core.Config import Config
+    from gtrackcore.preprocess.PreProcessTracksJob import PreProcessAllTracksJob
+    from gtrackcore.preprocess.pytables.ChromosomeShards import ChromosomeShards
+
+    shard_timings = []
+    orig_remove = ChromosomeShards.remove
+
+    def remove_and_record_timings(shards):
+        shard_timings.append((shards.shard_time, shards.merge_time))
+        orig_remove(shards)
+
+    track_name = ['benchmark', 'sharded']
+    prev_shard_workers = Config.CHROMOSOME_SHARD_WORKERS
+    results = []
+    ChromosomeShards.remove = remove_and_record_timings
+    try:
+        for num_workers in worker_counts:
+            _create_synthetic_bed_track(genome, track_name, num_elements, seed)
+            Config.CHROMOSOME_SHARD_WORKERS = num_workers
+            del shard_timings[:]
+            seconds, _ = time_call(PreProcessAllTracksJob(genome, track_name).process)
+            results.append((num_workers, seconds, sum(timing[0] for timing in shard_timings),
+                            sum(timing[1] for timing in shard_timings)))
+            _remove_benchmark_tracks(genome, [track_name])
+    finally:
+        ChromosomeShards.remove = orig_remove
+        Config.CHROMOSOME_SHARD_WORKERS = prev_shard_workers
+        _remove_benchmark_tracks(genome, [track_name])
+
+    print 'Preprocessing of a BED track of %s elements, sharded by chromosome (%s cpus):' % \
+        (num_elements, multiprocessing.cpu_count())
+    print '\t%-40s %12s %12s %12s %12s' % ('shard workers', 'time (s)', 'speedup', 'sharding (s)', 'merging (s)')
+    for num_workers, seconds, shard_seconds, merge_seconds in results:
+        print '\t%-40s %12.2f %12.2f %12.2f %12.2f' % \
+            (num_workers, seconds, results[0][1] / seconds, shard_seconds, merge_seconds)
+
+
+def benchmark_c_array_creation(genome, num_rows=10 ** 8, block_rows=10 ** 6, seed=0):
+    """
+    Prints the wall time and the increase of the peak resident set size when creating the c-arrays
+    of synthetic segment tracks of num_rows / 10 and num_rows rows. As the c-arrays are filled block
+    by block, the memory use should not grow with the number of rows. Each measurement is made in a
+    fresh process.
+    """
+    from gtrackcore.track.pytables.database.Database import DatabaseWriter
+    from gtrackcore.util.pytables.NameFunctions import get_database_filename, get_track_table_node_names
+
+    track_name = ['benchmark', 'c_arrays']
+    rand = numpy.random.RandomState(seed)
+    results = []
+    try:
+        for track_rows in [num_rows // 10, num_rows]:
+            db_writer = DatabaseWriter(get_database_filename(genome, track_name, allow_overlaps=False,
+                                                             create_path=True))
+            db_writer.open()
+            rows = numpy.zeros(min(block_rows, track_rows),
+                               dtype=[('start', 'int32'), ('end', 'int32'), ('val', 'float64'), ('id', 'S16')])
+            table = db_writer.create_table(get_track_table_node_names(genome, track_name, False), rows.dtype,
+                                           track_rows)
+            for block_start in xrange(0, track_rows, len(rows)):
+                block = rows[:min(len(rows), track_rows - block_start)]
+                block['start'] = block_start + numpy.arange(len(block))
+                block['end'] = block['start'] + 1
+                block['val'] = rand.random_sample(len(block))
+                table.append(block)
+            db_writer.close()
+
+            pool = multiprocessing.Pool(1)
+            results.append((track_rows,) + pool.apply(_measure_c_array_creation, (genome, track_name)))
+            pool.close()
+            pool.join()
+            _remove_benchmark_tracks(genome, [track_name])
+    finally:
+        _remove_benchmark_tracks(genome, [track_name])
+
+    print 'Creation of c-arrays from track tables:'
+    print '\t%-40s %12s %16s' % ('rows', 'time (s)', 'peak RSS (MB)')
+    for track_rows, seconds, peak_rss_increase in results:
+        print '\t%-40s %12.2f %16.1f' % (track_rows, seconds, peak_rss_increase / 1e6)
+
+
+def benchmark_columnar_storage(genome, num_elements=10 ** 6, seed=0):
+    """
+    Prints the wall time of preprocessing a synthetic BED track of the genome and the size of the
+    preprocessed file, with the track table kept next to the column arrays and with columnar-only
+    storage (see Config.COLUMNAR_STORAGE_ONLY).
+    """
+    from gtrackcore.core.Config import Config
+    from gtrackcore.preprocess.PreProcessTracksJob import PreProcessAllTracksJob
+    from gtrackcore.util.pytables.NameFunctions import get_database_filename
+
+    track_name = ['benchmark', 'columnar']
+    prev_columnar_only = Config.COLUMNAR_STORAGE_ONLY
+    results = []
+    try:
+        for columnar_only in [False, True]:
+            _create_synthetic_bed_track(genome, track_name, num_elements, seed)
+            Config.COLUMNAR_STORAGE_ONLY = columnar_only
+            seconds, _ = time_call(PreProcessAllTracksJob(genome, track_name).process)
+            file_size = os.path.getsize(get_database_filename(genome, track_name))
+            results.append(('column arrays only' if columnar_only else 'track table + column arrays',
+                            seconds, file_size))
+            _remove_benchmark_tracks(genome, [track_name])
+    finally:
+        Config.COLUMNAR_STORAGE_ONLY = prev_columnar_only
+        _remove_benchmark_tracks(genome, [track_name])
+
+    print 'Preprocessing of a BED track of %s elements:' % num_elements
+    print '\t%-40s %12s %12s' % ('layout', 'time (s)', 'size (MB)')
+    for layout, seconds, file_size in results:
+        print '\t%-40s %12.2f %12.1f' % (layout, seconds, file_size / 1e6)
+
+
+def benchmark_column_batches(genome, num_elements=10 ** 6, seed=0):
+    """
+    Prints the wall time of iterating over a synthetic BED track of the genome through a stack of
+    input wrappers element by element and in column batches, and of preprocessing the track with
+    and without column batches (see Config.COLUMN_BATCH_PARSING).
+    """
+    from gtrackcore.core.Config import Config
+    from gtrackcore.input.core.GenomeElementSource import GenomeElementSource, BoundingRegionTuple
+    from gtrackcore.input.wrappers.GEBoundingRegionElementCounter import GEBoundingRegionElementCounter
+    from gtrackcore.input.wrappers.GERegionBoundaryFilter import GERegionBoundaryFilter
+    from gtrackcore.metadata.GenomeInfo import GenomeInfo
+    from gtrackcore.preprocess.PreProcessTracksJob import PreProcessAllTracksJob
+    from gtrackcore.util.CommonFunctions import createOrigPath
+
+    track_name = ['benchmark', 'column_batches']
+    prev_column_batch_parsing = Config.COLUMN_BATCH_PARSING
+    results = []
+    try:
+        _create_synthetic_bed_track(genome, track_name, num_elements, seed)
+        bed_filename = os.path.join(createOrigPath(genome, track_name), 'elements.bed')
+        regions = GenomeInfo.getStdChrRegionList(genome)
+
+        def get_wrapped_source():
+            return GEBoundingRegionElementCounter(GERegionBoundaryFilter(GenomeElementSource(bed_filename, genome),
+                                                                         regions),
+                                                  [BoundingRegionTuple(region, 0) for region in regions])
+
+        results.append(('wrapper stack, elements', time_call(lambda: sum(1 for ge in get_wrapped_source()))[0]))
+        results.append(('wrapper stack, column batches',
+                        time_call(lambda: sum(len(columns['chr'])
+                                              for columns in get_wrapped_source().iterColumnBatches()))[0]))
+
+        for column_batch_parsing in [False, True]:
+            if column_batch_parsing:
+                _create_synthetic_bed_track(genome, track_name, num_elements, seed)
+            Config.COLUMN_BATCH_PARSING = column_batch_parsing
+            seconds, _ = time_call(PreProcessAllTracksJob(genome, track_name).process)
+            results.append(('preprocessing, column batches' if column_batch_parsing else 'preprocessing, elements',
+                            seconds))
+            _remove_benchmark_tracks(genome, [track_name])
+    finally:
+        Config.COLUMN_BATCH_PARSING = prev_column_batch_parsing
+        _remove_benchmark_tracks(genome, [track_name])
+
+    print 'Iteration and preprocessing of a BED track of %s elements:' % num_elements
+    print '\t%-40s %12s %12s' % ('mode', 'time (s)', 'speedup')
+    for i in xrange(0, len(results), 2):
+        for mode, seconds in results[i:i + 2]:
+            print '\t%-40s %12.2f %12.2f' % (mode, seconds, results[i][1] / seconds)
+
+
+def benchmark_overlap_clustering(genome, num_elements=10 ** 6, seed=0):
+    """
+    Prints the wall time of clustering the overlapping elements of a sorted synthetic BED track of
+    the genome with GEOverlapClusterer, element by element and in column batches.
+    """
+    from gtrackcore.input.core.GenomeElementSource import GenomeElementSource
+    from gtrackcore.input.wrappers.GEOverlapClusterer import GEOverlapClusterer
+    from gtrackcore.util.CommonFunctions import createOrigPath
+
+    track_name = ['benchmark', 'overlap_clustering']
+    try:
+        _create_synthetic_bed_track(genome, track_name, num_elements, seed, sort_starts=True)
+        bed_filename = os.path.join(createOrigPath(genome, track_name), 'elements.bed')
+        get_clusterer = lambda: GEOverlapClusterer(GenomeElementSource(bed_filename, genome))
+
+        el_seconds, num_clusters = time_call(lambda: sum(1 for ge in get_clusterer()))
+        batch_seconds, _ = time_call(lambda: sum(len(columns['chr'])
+                                                 for columns in get_clusterer().iterColumnBatches()))
+    finally:
+        _remove_benchmark_tracks(genome, [track_name])
+
+    print 'Overlap clustering of a BED track of %s elements into %s clusters:' % (num_elements, num_clusters)
+    print '\t%-40s %12s %12s' % ('mode', 'time (s)', 'speedup')
+    for mode, seconds in [('elements', el_seconds), ('column batches', batch_seconds)]:
+        print '\t%-40s %12.2f %12.2f' % (mode, seconds, el_seconds / seconds)
+
+
+def benchmark_no_overlaps_from_column_arrays(genome, num_elements=10 ** 6, seed=0):
+    """
+    Prints the wall time of preprocessing a synthetic BED track of the genome, with the no overlaps
+    rows clustered from the elements of the with overlaps track and from its column arrays (see
+    Config.NO_OVERLAPS_FROM_COLUMN_ARRAYS).
+    """
+    from gtrackcore.core.Config import Config
+    from gtrackcore.preprocess.PreProcessTracksJob import PreProcessAllTracksJob
+
+    track_name = ['benchmark', 'no_overlaps_from_column_arrays']
+    prev_no_overlaps_from_column_arrays = Config.NO_OVERLAPS_FROM_COLUMN_ARRAYS
+    results = []
+    try:
+        for no_overlaps_from_column_arrays in [False, True]:
+            _create_synthetic_bed_track(genome, track_name, num_elements, seed)
+            Config.NO_OVERLAPS_FROM_COLUMN_ARRAYS = no_overlaps_from_column_arrays
+            seconds, _ = time_call(PreProcessAllTracksJob(genome, track_name).process)
+            results.append(('column arrays' if no_overlaps_from_column_arrays else 'elements', seconds))
+            _remove_benchmark_tracks(genome, [track_name])
+    finally:
+        Config.NO_OVERLAPS_FROM_COLUMN_ARRAYS = prev_no_overlaps_from_column_arrays
+        _remove_benchmark_tracks(genome, [track_name])
+
+    print 'Preprocessing of a BED track of %s elements, clustering the no overlaps rows from:' % num_elements
+    print '\t%-40s %12s %12s' % ('mode', 'time (s)', 'speedup')
+    for mode, seconds in results:
+        print '\t%-40s %12.2f %12.2f' % (mode, seconds, results[0][1] / seconds)
+
+
+def benchmark_fasta_reading(num_bases=10 ** 8, line_len=60, num_regions=1000, region_len=1000, seed=0):
+    """
+    Prints the wall time of reading a synthetic FASTA file line by line, as the FASTA source did
+    before, and in blocks by FastaGenomeElementSource, and of reading random regions through the
+    index of the file.
+    """
+    from gtrackcore.input.fileformats.FastaGenomeElementSource import FastaGenomeElementSource
+
+    rand = numpy.random.RandomState(seed)
+    bases = numpy.frombuffer('acgt', dtype='uint8')[rand.randint(0, 4, size=num_bases)]
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        fasta_filename = os.path.join(tmp_dir, 'seq.fa')
+        with open(fasta_filename, 'wb') as fasta_file:
+            fasta_file.write('>chr1\n')
+            for start in xrange(0, num_bases, line_len):
+                fasta_file.write(bases[start:start + line_len].tostring() + '\n')
+
+        def read_lines():
+            with open(fasta_filename) as fasta_file:
+                fasta_file.readline()
+                return numpy.concatenate([numpy.fromstring(line.rstrip('\n'), dtype='S1') for line in fasta_file])
+
+        line_seconds, line_seq = time_call(read_lines)
+        block_seconds, ges = time_call(lambda: [ge.val for ge in FastaGenomeElementSource(fasta_filename, None)])
+        assert (line_seq == ges[0]).all()
+        del line_seq, ges
+
+        fasta_source = FastaGenomeElementSource(fasta_filename, None)
+        fasta_source.getFastaIndex()
+        starts = rand.randint(0, num_bases - region_len, size=num_regions)
+        region_seconds, _ = time_call(lambda: [fasta_source.readRegion('chr1', start, start + region_len)
+                                               for start in starts])
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    print 'Reading a FASTA file of %s bps:' % num_bases
+    print '\t%-40s %12s %12s' % ('mode', 'time (s)', 'speedup')
+    for mode, seconds in [('lines', line_seconds), ('blocks', block_seconds)]:
+        print '\t%-40s %12.2f %12.2f' % (mode, seconds, line_seconds / seconds)
+    print '\t%-40s %12.4f' % ('%s indexed regions of %s bps' % (num_regions, region_len), region_seconds)
+
+
+def _measure_c_array_creation(genome, track_name):
+    import resource
+    import gtrackcore.preprocess
+    from gtrackcore.preprocess.pytables.CommonTableFunctions import create_c_arrays_from_table
+
+    # as when preprocessing, so that reading the track info does not keep the file open
+    gtrackcore.preprocess.is_preprocessing = True
+    rss_before = _get_rss()
+    seconds, _ = time_call(create_c_arrays_from_table, genome, track_name, False)
+    return seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 - rss_before
+
+
+def _get_rss():
+    with open('/proc/self/status') as status_file:
+        status = dict(line.split(':', 1) for line in status_file.read().splitlines())
+    return int(status['VmRSS'].split()[0]) * 1024
+
+
+def _create_synthetic_bed_track(genome, track_name, num_elements, seed, sort_starts=False):
+    from gtrackcore.metadata.GenomeInfo import GenomeInfo
+    from gtrackcore.util.CommonFunctions import createOrigPath
+
+    rand = numpy.random.RandomState(seed)
+    chrs = GenomeInfo.getChrList(genome)
+    chr_lens = numpy.array([GenomeInfo.getChrLen(genome, chr) for chr in chrs], dtype='int64')
+    chr_indices = numpy.sort(rand.choice(len(chrs), size=num_elements, p=chr_lens / float(chr_lens.sum())))
+    lengths = rand.randint(1, 1000, size=num_elements)
+    starts = (rand.random_sample(num_elements) * numpy.maximum(chr_lens[chr_indices] - lengths, 1)).astype('int64')
+    if sort_starts:
+        order = numpy.lexsort((starts, chr_indices))
+        chr_indices, lengths, starts = chr_indices[order], lengths[order], starts[order]
+    scores = rand.randint(0, 1000, size=num_elements)
+    strands = numpy.array(['+', '-'])[rand.randint(0, 2, size=num_elements)]
+
+    orig_dir = createOrigPath(genome, track_name)
+    if not os.path.exists(orig_dir):
+        os.makedirs(orig_dir)
+    with open(os.path.join(orig_dir, 'elements.bed'), 'w') as bed_file:
+        for i in xrange(num_elements):
+            bed_file.write('%s\t%d\t%d\telement%d\t%d\t%s\n' % (chrs[chr_indices[i]], starts[i],
+                                                               starts[i] + lengths[i], i, scores[i], strands[i]))
+
+
+def _remove_benchmark_tracks(genome, track_names):
+    from gtrackcore.metadata.TrackInfo import TrackInfo
+    from gtrackcore.util.CommonFunctions import createOrigPath, get_dir_path
+
+    for track_name in track_names:
+        shutil.rmtree(createOrigPath(genome, track_name), ignore_errors=True)
+        shutil.rmtree(get_dir_path(genome, track_name), ignore_errors=True)
+        TrackInfo(genome, track_name).removeEntryFromShelve()
+    for parent_dir in [createOrigPath(genome, ['benchmark']), get_dir_path(genome, ['benchmark'])]:
+        if os.path.isdir(parent_dir) and not os.listdir(parent_dir):
+            os.rmdir(parent_dir)
+
+
+def _get_bytes_read():
+    try:
+        with open('/proc/self/io') as io_file:
+            io_counters = dict(line.split(': ') for line in io_file.read().splitlines())
+        return int(io_counters['rchar'])
+    except (IOError, KeyError):
+        return None
+
+
+def _get_track_format(genome, track_name, allow_overlaps):
+    from gtrackcore.track.pytables.TrackSource import TrackSource
+    from gtrackcore.track.format.TrackFormat import TrackFormat
+
+    track_data = TrackSource().get_track_data(genome, track_name, allow_overlaps)
+    return TrackFormat.createInstanceFromPrefixList(track_data.keys())
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['storage']:
+        benchmark_storage_policies()
+        sys.exit(0)
+
+    if sys.argv[1:] == ['fasta']:
+        benchmark_fasta_reading()
+        sys.exit(0)
+
+    if sys.argv[1:2] == ['preprocess'] and len(sys.argv) == 3:
+        benchmark_preprocessing_throughput(sys.argv[2])
+        benchmark_single_pass_preprocessing(sys.argv[2])
+        benchmark_parallel_preprocessing(sys.argv[2])
+        benchmark_chromosome_sharded_preprocessing(sys.argv[2])
+        benchmark_c_array_creation(sys.argv[2])
+        benchmark_columnar_storage(sys.argv[2])
+        benchmark_column_batches(sys.argv[2])
+        benchmark_overlap_clustering(sys.argv[2])
+        benchmark_no_overlaps_from_column_arrays(sys.argv[2])
+        sys.exit(0)
+
+    if len(sys.argv) != 3:
+        print 'Syntax: python Benchmark.py genome trackName'
+        print '        python Benchmark.py storage'
+        print '        python Benchmark.py fasta'
+        print '        python Benchmark.py preprocess genome'
+        sys.exit(0)
+
+    genome = sys.argv[1]
+    track_name = sys.argv[2].split(':')
+    allow_overlaps = False
+
+    track_format = _get_track_format(genome, track_name, allow_overlaps)
+    benchmark_index_retrieval(genome, track_name, allow_overlaps, track_format)
+    benchmark_track_view_iteration(genome, track_name, allow_overlaps, track_format)
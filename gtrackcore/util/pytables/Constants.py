@@ -1,3 +1,17 @@
 GTRACKCORE_FORMAT_SUFFIX = 'h5'
 
 FLUSH_LIMIT = 10000
+
+MAX_CACHED_ARRAYS = 32
+
+ITERATION_BLOCK_SIZE = 10000
+
+COLUMN_CHUNK_LENGTH = 2 ** 16
+
+SPILL_BLOCK_SIZE = 100000
+
+OUTPUT_BLOCK_SIZE = 10000
+
+EXTERNAL_SORT_FAN_IN = 16
+
+C_ARRAY_BLOCK_BYTES = 16 * 1024 * 1024
@@ -0,0 +1,212 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy
+
+from gtrackcore.util.pytables.Constants import EXTERNAL_SORT_FAN_IN
+
+
+class ExternalSorter(object):
+    """
+    External merge sort of NumPy structured records by the key columns, within a memory budget of
+    max_memory bytes. Records are added in blocks of the given dtype. When the buffered records fill
+    half of the budget, they are sorted and written as a run of block files to a temporary
+    directory, the other half being needed for sorting. The sorted records are read back by
+    iteration, in blocks, by merging the runs, at most fan_in runs at a time. Records with equal keys
+    keep the order they were added in. If all records fit in memory, nothing is written.
+
+    The size of objects in object columns is taken to be sys.getsizeof(), so object columns should
+    hold flat objects, e.g. strings. The largest memory use is kept in peak_memory.
+    """
+
+    def __init__(self, dtype, key_columns, max_memory, dir_path=None, fan_in=EXTERNAL_SORT_FAN_IN):
+        self._dtype = numpy.dtype(dtype)
+        self._key_columns = list(key_columns)
+        self._max_memory = max_memory
+        self._dir_path = dir_path
+        self._fan_in = max(2, fan_in)
+        self._object_columns = [column for column in self._dtype.names if self._dtype[column].hasobject]
+
+        self._sort_dir = None
+        self._runs = []
+        self._num_runs_written = 0
+        self._buffered_blocks = []
+        self._buffered_bytes = 0
+        self._sorted_records = None
+        self._num_records = 0
+        self.peak_memory = 0
+
+    def __len__(self):
+        return self._num_records
+
+    def __del__(self):
+        self.remove()
+
+    def add(self, records):
+        assert self._sorted_records is None and records.dtype == self._dtype
+
+        record_sizes = self._get_record_sizes(records)
+        start = 0
+        while start < len(records):
+            cumulative_sizes = numpy.cumsum(record_sizes[start:])
+            free_bytes = self._max_memory // 2 - self._buffered_bytes
+            num_fitting = int(cumulative_sizes.searchsorted(free_bytes, side='right'))
+            if num_fitting == 0:
+                if len(self._buffered_blocks) > 0:
+                    self._write_buffered_run()
+                    continue
+                num_fitting = 1
+
+            stop = start + num_fitting
+            self._buffered_blocks.append((records[start:stop].copy(), record_sizes[start:stop]))
+            self._buffered_bytes += int(cumulative_sizes[num_fitting - 1])
+            self._update_peak_memory(self._buffered_bytes)
+            start = stop
+
+        self._num_records += len(records)
+
+    def __iter__(self):
+        """
+        Yields the sorted records in blocks.
+        """
+        self._finish_runs()
+
+        if self._sorted_records is not None:
+            if len(self._sorted_records) > 0:
+                yield self._sorted_records
+        else:
+            for block in self._merge_runs(self._runs):
+                yield block
+
+    def remove(self):
+        if self._sort_dir is not None:
+            shutil.rmtree(self._sort_dir, ignore_errors=True)
+            self._sort_dir = None
+        self._runs = []
+
+    def _finish_runs(self):
+        if self._sorted_records is not None:
+            return
+
+        if len(self._runs) == 0:
+            if len(self._buffered_blocks) == 0:
+                self._sorted_records = numpy.empty(0, dtype=self._dtype)
+                return
+            records, record_sizes = self._pop_buffered_records()
+            self._sorted_records = records[self._get_sort_order(records)]
+            self._update_peak_memory(2 * int(record_sizes.sum()))
+            return
+
+        if len(self._buffered_blocks) > 0:
+            self._write_buffered_run()
+
+        while len(self._runs) > self._fan_in:
+            runs = self._runs
+            self._runs = []
+            for i in xrange(0, len(runs), self._fan_in):
+                self._write_run(self._merge_runs(runs[i:i + self._fan_in]))
+                for filename in sum(runs[i:i + self._fan_in], []):
+                    os.remove(filename)
+
+    def _pop_buffered_records(self):
+        records = numpy.concatenate([records for records, _ in self._buffered_blocks])
+        record_sizes = numpy.concatenate([record_sizes for _, record_sizes in self._buffered_blocks])
+        self._buffered_blocks = []
+        self._buffered_bytes = 0
+        return records, record_sizes
+
+    def _write_buffered_run(self):
+        records, record_sizes = self._pop_buffered_records()
+        sort_order = self._get_sort_order(records)
+        self._update_peak_memory(2 * int(record_sizes.sum()))
+        self._write_run([records[sort_order]], [record_sizes[sort_order]])
+
+    def _write_run(self, sorted_blocks, sorted_block_sizes=None):
+        # the blocks of a run are small enough for fan_in of them to fill half of the budget
+        if self._sort_dir is None:
+            self._sort_dir = tempfile.mkdtemp(prefix='.sort_', dir=self._dir_path)
+
+        max_block_bytes = max(1, self._max_memory // (2 * self._fan_in))
+        run = []
+        for i, records in enumerate(sorted_blocks):
+            record_sizes = sorted_block_sizes[i] if sorted_block_sizes is not None \
+                else self._get_record_sizes(records)
+            for start, stop in self._split_by_size(record_sizes, max_block_bytes):
+                filename = os.path.join(self._sort_dir, 'run_%d_%d.npy' % (self._num_runs_written, len(run)))
+                numpy.save(filename, records[start:stop])
+                run.append(filename)
+        self._runs.append(run)
+        self._num_runs_written += 1
+
+    @staticmethod
+    def _split_by_size(record_sizes, max_bytes):
+        cumulative_sizes = numpy.cumsum(record_sizes)
+        start = 0
+        while start < len(record_sizes):
+            offset = cumulative_sizes[start - 1] if start > 0 else 0
+            stop = max(start + 1, int(cumulative_sizes.searchsorted(offset + max_bytes, side='right')))
+            yield start, stop
+            start = stop
+
+    def _merge_runs(self, runs):
+        run_blocks = [self._load_block(run, 0) for run in runs]
+        block_indices = [0] * len(runs)
+        positions = [0] * len(runs)
+
+        while True:
+            for i, run in enumerate(runs):
+                if run_blocks[i] is not None and positions[i] == len(run_blocks[i]):
+                    block_indices[i] += 1
+                    positions[i] = 0
+                    run_blocks[i] = self._load_block(run, block_indices[i]) if block_indices[i] < len(run) else None
+
+            active = [i for i in xrange(len(runs)) if run_blocks[i] is not None]
+            if len(active) == 0:
+                break
+
+            # all records up to the smallest of the last records of the blocks can be merged. To keep
+            # records with equal keys in order, runs after the run of the cutoff record only give the
+            # records below it, as the run may have more records equal to it in its next block.
+            last_records = numpy.concatenate([run_blocks[i][-1:] for i in active])
+            cutoff_index = self._get_sort_order(last_records)[0]
+            cutoff, cutoff_run = last_records[cutoff_index], active[cutoff_index]
+
+            parts = []
+            for i in active:
+                stop = positions[i] + self._count_records_before(run_blocks[i][positions[i]:], cutoff,
+                                                                 inclusive=i <= cutoff_run)
+                parts.append(run_blocks[i][positions[i]:stop])
+                positions[i] = stop
+
+            merged = numpy.concatenate(parts)
+            self._update_peak_memory(sum(self._get_record_sizes(run_blocks[i]).sum() for i in active) +
+                                     self._get_record_sizes(merged).sum())
+            yield merged[self._get_sort_order(merged)]
+
+    def _load_block(self, run, block_index):
+        return numpy.load(run[block_index], allow_pickle=True)
+
+    def _count_records_before(self, sorted_records, cutoff, inclusive):
+        # narrows [start, stop) down to the records with keys equal to the cutoff, one key at a time
+        start, stop = 0, len(sorted_records)
+        for column in self._key_columns:
+            keys = sorted_records[column][start:stop]
+            start, stop = start + int(keys.searchsorted(cutoff[column], side='left')), \
+                start + int(keys.searchsorted(cutoff[column], side='right'))
+        return stop if inclusive else start
+
+    def _get_sort_order(self, records):
+        return numpy.lexsort([records[column] for column in reversed(self._key_columns)])
+
+    def _get_record_sizes(self, records):
+        record_sizes = numpy.empty(len(records), dtype='int64')
+        record_sizes.fill(self._dtype.itemsize)
+        for column in self._object_columns:
+            record_sizes += numpy.fromiter((sys.getsizeof(value) for value in records[column]),
+                                           dtype='int64', count=len(records))
+        return record_sizes
+
+    def _update_peak_memory(self, num_bytes):
+        self.peak_memory = max(self.peak_memory, int(num_bytes))
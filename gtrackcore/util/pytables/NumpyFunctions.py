@@ -21,3 +21,14 @@ def get_default_numpy_value(dtype):
         return False
 
     raise ValueError('%s is not a valid data type' % str(dtype))
+
+
+def split_columns_by_chr(columns):
+    """
+    Yields (chr, columns) for each run of consecutive rows with the same chr in a dict of column
+    arrays with a 'chr' column, in the order of the rows.
+    """
+    chrs = columns['chr']
+    run_bounds = numpy.concatenate([[0], numpy.flatnonzero(chrs[1:] != chrs[:-1]) + 1, [len(chrs)]])
+    for run_start, run_end in zip(run_bounds[:-1], run_bounds[1:]):
+        yield str(chrs[run_start]), dict((column, values[run_start:run_end]) for column, values in columns.iteritems())
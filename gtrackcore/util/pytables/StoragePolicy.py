@@ -0,0 +1,58 @@
+import tables
+
+from gtrackcore.core.Config import Config
+
+
+class StoragePolicy(object):
+    """
+    How the track table and column arrays of a track are stored: compression library and level,
+    whether to shuffle bytes before compressing, and the number of rows per chunk (None lets
+    PyTables choose). Without compression and chunk length, the column arrays are stored
+    contiguously, which allows them to be memory-mapped. With columnar_only, the track table is
+    removed once the column arrays have been written, so that the columns are only stored once.
+    """
+
+    def __init__(self, complib=None, complevel=0, shuffle=True, chunk_length=None, columnar_only=False):
+        if complib is not None and complib not in tables.filters.all_complibs:
+            raise ValueError("Compression library '%s' is not one of: %s" %
+                             (complib, ', '.join(tables.filters.all_complibs)))
+        self.complib = complib
+        self.complevel = complevel
+        self.shuffle = shuffle
+        self.chunk_length = chunk_length
+        self.columnar_only = columnar_only
+
+    @classmethod
+    def create_from_config(cls):
+        return cls(complib=Config.COMPRESSION_LIB if Config.COMPRESSION_LIB != 'none' else None,
+                   complevel=Config.COMPRESSION_LEVEL,
+                   shuffle=Config.COMPRESSION_SHUFFLE,
+                   chunk_length=Config.CHUNK_LENGTH if Config.CHUNK_LENGTH > 0 else None,
+                   columnar_only=Config.COLUMNAR_STORAGE_ONLY)
+
+    def get_filters(self):
+        if self.complib is None or self.complevel == 0:
+            return None
+        return tables.Filters(complevel=self.complevel, complib=self.complib, shuffle=self.shuffle)
+
+    def get_chunkshape(self, shape):
+        if self.chunk_length is None:
+            return None
+        return (max(1, min(self.chunk_length, shape[0])),) + tuple(shape[1:])
+
+    def __repr__(self):
+        return 'StoragePolicy(complib=%r, complevel=%r, shuffle=%r, chunk_length=%r, columnar_only=%r)' % \
+               (self.complib, self.complevel, self.shuffle, self.chunk_length, self.columnar_only)
+
+
+def get_storage_policy(genome, track_name):
+    """
+    Returns the storage policy of the track, as set by the 'storagePolicy' attribute of its
+    TrackInfo (a dict of StoragePolicy arguments), or else the global policy of the config.
+    """
+    from gtrackcore.metadata.TrackInfo import TrackInfo
+
+    storage_policy = TrackInfo(genome, track_name).storagePolicy
+    if storage_policy is not None:
+        return StoragePolicy(**storage_policy)
+    return StoragePolicy.create_from_config()